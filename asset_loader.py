@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+
+import mesh_loader as ml
+import texture_loader as tl
+
+
+class AssetLoader:
+    # reads and decodes model files and textures on worker threads, so a window does not freeze
+    # while they load, only uploading the results needs the GL thread (MeshRegistry.poll, upload_texture)
+    # threads, not processes - mesh caches are memory mapped and JPEG decoding releases the GIL,
+    # so nothing has to be copied between processes
+    def __init__(self, workers=4):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.futures = {}
+
+    def request(self, filepath, load):
+        # starts load(filepath) in the background unless the file is already being loaded
+        key = os.path.normpath(filepath)
+        if key not in self.futures:
+            self.futures[key] = self.pool.submit(load, filepath)
+
+    def request_mesh(self, filepath):
+        self.request(filepath, ml.load_vertices)
+
+    def request_texture(self, filepath, max_size=tl.MAX_SIZE):
+        self.request(filepath, lambda path: tl.decode_texture(path, max_size))
+
+    def preload_robot(self, robot):
+        # every model file the robot's links are drawn with
+        for link in robot.links:
+            self.request_mesh(link.model)
+
+    def take(self, filepath):
+        # result of a finished request, None while it is still loading or when it failed
+        # errors of the load (missing file, ...) are reported once and the request is dropped,
+        # whoever asked keeps drawing its placeholder
+        key = os.path.normpath(filepath)
+        future = self.futures.get(key)
+        if future is None or not future.done():
+            return None
+        del self.futures[key]
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"can not load {filepath}: {e}", file=sys.stderr)
+            return None
+
+    def loading(self, filepath):
+        # True until the request was taken, also when it failed
+        return os.path.normpath(filepath) in self.futures
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.futures.clear()
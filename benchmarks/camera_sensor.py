@@ -0,0 +1,94 @@
+# camera sensor on the body of differential_drive, offscreen - checks that nothing is drawn without
+# subscribers, that frames arrive at the sensor's rate while the view draws at its own, and saves the last one
+# (to the temporary directory unless --output is given)
+# run from the repository root: python -m benchmarks.camera_sensor [--output frame.png] [rate ...]
+
+import offscreen  # before OpenGL is imported by anything else
+
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from OpenGL.GL import glFinish
+from PIL import Image
+
+from asset_loader import AssetLoader
+from camera_sensor import CameraSensor
+from framebuffer import Framebuffer
+from renderer import Renderer
+from robot import Robot
+
+VIEW_FPS = 60
+
+
+def run(renderer, sensor, seconds):
+    # view frames drawn and sensor frames delivered in seconds of wall clock time
+    frames = 0
+    delivered = sensor.delivered
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        renderer.robot.move(1 / VIEW_FPS)
+        renderer.paint()
+        renderer.render_sensors(time.perf_counter())
+        glFinish()
+        frames += 1
+        # the view is limited to VIEW_FPS
+        time.sleep(max(0.0, start + frames / VIEW_FPS - time.perf_counter()))
+    return frames, sensor.delivered - delivered
+
+
+def main(rates, output):
+    context = offscreen.Context()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        robot = Robot("differential_drive.xacro")
+    robot.update_values([[0, 0, 0]] * 2, [2.0, 1.5])
+    framebuffer = Framebuffer(640, 480)
+    framebuffer.bind()
+    renderer = Renderer(robot, AssetLoader())
+    # front of the 0.4 m long body, a little above it
+    sensor = CameraSensor("telo", 320, 240, offset=(0.21, 0.0, 0.05))
+    renderer.add_sensor(sensor)
+    renderer.initialize()
+    renderer.resize(640, 480)
+    while renderer.paint():
+        time.sleep(0.01)
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        frames, delivered = run(renderer, sensor, 0.5)
+        print(f"without subscribers  {frames} view frames, {sensor.drawn} sensor frames drawn", file=sys.stderr)
+        if sensor.drawn:
+            sys.exit("sensor drew frames nobody subscribed to")
+
+        stamps = []
+        sensor.subscribe(lambda image, stamp: stamps.append(stamp))
+        for rate in rates:
+            sensor.rate = rate
+            stamps.clear()
+            frames, delivered = run(renderer, sensor, 2.0)
+            intervals = np.diff(stamps)
+            print(f"rate {rate:>5.1f} Hz  {frames} view frames, {delivered} sensor frames, "
+                  f"{1 / intervals.mean():.1f} Hz measured", file=sys.stderr)
+
+    image = sensor.latest()
+    if image is None or image.flags.writeable:
+        sys.exit("no read-only sensor frame")
+    Image.fromarray(image).save(output)
+    print(f"last frame saved to {output}", file=sys.stderr)
+    renderer.destroy()
+    framebuffer.destroy()
+    context.destroy()
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    output = os.path.join(tempfile.gettempdir(), "camera_sensor.png")
+    if "--output" in arguments:
+        i = arguments.index("--output")
+        if i + 1 >= len(arguments):
+            sys.exit("--output needs a value")
+        output = arguments[i + 1]
+        del arguments[i:i + 2]
+    main([float(rate) for rate in arguments] or [10.0, 30.0], output)
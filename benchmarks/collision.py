@@ -0,0 +1,152 @@
+# collisions - checks the broad phase against all pairs, the narrow phase against exact distances of spheres
+# and boxes, that the collision shapes of every robot in data/ lie where its links are drawn and that a driving
+# robot stops at a wall, then times whole steps of fleets of robots among obstacles
+# run from the repository root: python -m benchmarks.collision [robots ...]
+
+import contextlib
+import os
+import sys
+import timeit
+
+import numpy as np
+
+from collision import BOX, SPHERE, CollisionWorld, closest_points, narrow_phase, spatial_hash
+from fleet import Fleet
+from robot import Robot
+from simulation import Simulation
+
+
+def quiet_robot(name):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return Robot(name)
+
+
+def random_rotations(rng, count):
+    # orthonormal rows from QR of random matrices
+    q, r = np.linalg.qr(rng.normal(size=(count, 3, 3)))
+    return q * np.sign(np.diagonal(r, axis1=1, axis2=2))[:, None, :]
+
+
+def check_broad_phase(count=2000):
+    rng = np.random.default_rng(0)
+    lows = rng.uniform(0, 10, (count, 3))
+    highs = lows + rng.uniform(0, 0.5, (count, 3))
+    highs[:20] += rng.uniform(0, 5, (20, 3))  # a few boxes spanning many cells
+    first, second = spatial_hash(lows, highs)
+    found = {(min(a, b), max(a, b)) for a, b in zip(first.tolist(), second.tolist())}
+    overlap = ((lows[:, None] <= highs[None]) & (lows[None] <= highs[:, None])).all(axis=2)
+    expected = {(a, b) for a, b in zip(*np.nonzero(np.triu(overlap, 1)))}
+    print(f"spatial hash: {len(found)} pairs of {count} boxes, all pairs give {len(expected)}")
+    if found != expected or len(found) != len(first):
+        sys.exit("broad phase pairs differ")
+
+
+def check_narrow_phase(count=20000):
+    # spheres against spheres and boxes, whose overlap is known exactly from the closest points
+    rng = np.random.default_rng(1)
+    transforms = np.tile(np.identity(4), (2 * count, 1, 1))
+    transforms[:, :3, :3] = random_rotations(rng, 2 * count)
+    transforms[:, 3, :3] = rng.uniform(-1, 1, (2 * count, 3))
+    halves = rng.uniform(0.1, 0.6, (2 * count, 3))
+    kinds = np.full(2 * count, SPHERE)
+    kinds[count + count // 2:] = BOX
+    first, second = np.arange(count), np.arange(count, 2 * count)
+    _, depths, _ = narrow_phase(kinds, halves, transforms, first, second)
+
+    centers = transforms[first, 3, :3]
+    closest = closest_points(kinds[second], transforms[second, :3, :3], transforms[second, 3, :3], halves[second],
+                             centers)
+    gaps = np.linalg.norm(closest - centers, axis=1) - halves[first, 0]
+    inside = np.all(np.abs(np.einsum("pij,pj->pi", transforms[second, :3, :3], centers - transforms[second, 3, :3]))
+                    < halves[second], axis=1) & (kinds[second] == BOX)
+    spheres = kinds[second] == SPHERE
+    gaps[spheres] = (np.linalg.norm(transforms[second, 3, :3] - centers, axis=1) - halves[first, 0]
+                     - halves[second, 0])[spheres]
+    exact = ~inside  # a sphere whose center is inside a box overlaps it, by how much is not compared
+    wrong = np.count_nonzero((depths[exact] > 0) != (gaps[exact] < 0))
+    error = np.abs(depths[exact & spheres] + gaps[exact & spheres]).max()
+    print(f"narrow phase: {np.count_nonzero(depths > 0)} of {count} sphere-sphere and sphere-box pairs overlap, "
+          f"{wrong} wrong, sphere depth error {error:.2e}")
+    if wrong or error > 1e-9 or not np.all(depths[inside] > 0):
+        sys.exit("narrow phase differs from exact distances")
+
+
+def check_robot(name):
+    # links whose collision origin is their visual origin have to collide exactly where they are drawn
+    robot = quiet_robot(name)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        model = robot.load_model(name)
+    robot.set_pose(1.0, 2.0, 0.5)
+    world = CollisionWorld()
+    world.add_robot(robot)
+    world.update()
+    same = {link["name"] for link in model["links"]
+            if [(c["xyz"], c["rpy"]) for c in link["collisions"]] == [(link["xyz"], link["rpy"])]}
+    names = [link.name for link in robot.kinematics.links]
+    shapes = [shape for shape, name in enumerate(world.names) if name in same]
+    drawn = robot.kinematics.worlds[[names.index(world.names[shape]) for shape in shapes]]
+    error = np.abs(world.transforms[shapes] - drawn).max()
+    print(f"{name}: {len(world.kinds)} collision shapes, {len(shapes)} at their visual origin "
+          f"{error:.2e} from the drawn links")
+    if not shapes or error > 1e-9:
+        sys.exit(f"collision shapes of {name} are not where the links are drawn")
+
+
+def check_wall():
+    # the robot drives forward into a wall and has to stay in front of it
+    robot = quiet_robot("differential_drive.xacro")
+    robot.update_values([[0, 0, 0]] * 2, [5.0, 5.0])
+    world = CollisionWorld()
+    world.add_robot(robot)
+    world.add_obstacle({"shape": "box", "size": [0.1, 4.0, 1.0], "xyz": "1.0 0 0.5", "rpy": "0 0 0"}, "wall")
+    simulation = Simulation(robot, collisions=world)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        free = quiet_robot("differential_drive.xacro")
+        free.update_values([[0, 0, 0]] * 2, [5.0, 5.0])
+        for _ in range(180):
+            simulation.step()
+            free.move(simulation.dt)
+    touching = len(simulation.contacts)
+    print(f"wall at x 0.95: robot stopped at x {robot.base_link.xyz[0]:.3f}, {touching} contacts in the last step, "
+          f"without collisions at x {free.base_link.xyz[0]:.3f}")
+    if not free.base_link.xyz[0] > 1.05 > 0.95 > robot.base_link.xyz[0] > 0.5 or not touching:
+        sys.exit("robot was not stopped by the wall")
+
+
+def bench(count):
+    # robots on a grid with a box obstacle between every four of them, a little closer than they fit
+    robot = quiet_robot("differential_drive.xacro")
+    side = int(np.ceil(np.sqrt(count)))
+    fleet = Fleet.from_robot(robot, count)
+    fleet.x[:] = np.arange(count) % side * 0.45
+    fleet.y[:] = np.arange(count) // side * 0.45
+    fleet.theta[:] = np.random.default_rng(2).uniform(0, 2 * np.pi, count)
+    world = CollisionWorld()
+    world.add_fleet(fleet, robot)
+    for x in np.arange(side // 2) * 0.9 + 0.225:
+        for y in np.arange(side // 2) * 0.9 + 0.225:
+            world.add_obstacle({"shape": "box", "size": [0.1, 0.1, 0.3], "xyz": f"{x} {y} 0.15", "rpy": "0 0 0"})
+    world.update()
+    candidates = len(world.candidate_pairs()[0])
+    contacts = world.query()
+    robots = np.count_nonzero(~contacts.with_obstacles)
+
+    def step():
+        fleet.step(1 / 60)
+        world.step()
+
+    number, _ = timeit.Timer(step).autorange()
+    seconds = min(timeit.repeat(step, number=number, repeat=5)) / number
+    print(f"{count:>6} robots {len(world.kinds):>7} shapes  {candidates:>7} candidate pairs  "
+          f"{robots:>6} robot-robot {len(contacts) - robots:>6} robot-obstacle contacts  {seconds * 1e3:>8.2f} ms/step")
+
+
+if __name__ == '__main__':
+    check_broad_phase()
+    check_narrow_phase()
+    for name in sorted(os.listdir("data")):
+        if name.endswith(".xacro"):
+            check_robot(name)
+    check_wall()
+    for n in [int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000]:
+        bench(n)
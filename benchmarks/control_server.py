@@ -0,0 +1,162 @@
+# control server - an owner loop like the window's (commands applied between frames, 60 Hz steps, frames that
+# keep the interpreter busy) serves a client on the same machine; checks that commands are taken in while a
+# frame is being drawn, applied in order and reported back by telemetry, that the server stops while
+# controllers are connected, and measures command latency
+# run from the repository root: python -m benchmarks.control_server [count]
+
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from control_client import ControlClient, measure, summary
+from control_server import JOINT, SPEED, ControlServer
+from robot import Robot
+from simulation import Simulation
+
+
+def busy(seconds):
+    # drawing holds the interpreter most of the time, sleeping would not
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class Owner(threading.Thread):
+    # the window - applies commands every 2 ms, steps and draws a frame every 1/60 s
+    def __init__(self, server, simulation, draw):
+        super().__init__(daemon=True)
+        self.server = server
+        self.simulation = simulation
+        self.draw = draw  # seconds a frame takes
+        self.stall = threading.Event()  # one frame of 200 ms when set
+        self.stalled = threading.Event()
+        self.stopping = False
+
+    def run(self):
+        last = next_frame = time.perf_counter()
+        while not self.stopping:
+            if self.server.apply(self.simulation.robot) > 0:
+                self.server.publish(self.simulation.time, self.simulation.robot)
+            now = time.perf_counter()
+            if now >= next_frame:
+                if self.simulation.advance(now - last) > 0:
+                    self.server.publish(self.simulation.time, self.simulation.robot)
+                last = now
+                if self.stall.is_set():
+                    self.stalled.set()
+                    busy(0.2)
+                    self.stall.clear()
+                else:
+                    busy(self.draw)
+                next_frame = now + 1 / 60
+            time.sleep(0.002)
+
+
+def serve(address, draw):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        robot = Robot("differential_drive.xacro")
+    server = ControlServer(len(robot.wheels), address)
+    server.start()
+    server.publish(0.0, robot)
+    owner = Owner(server, Simulation(robot), draw)
+    owner.start()
+    return server, owner
+
+
+def stop(server, owner):
+    owner.stopping = True
+    owner.join()
+    server.stop()
+
+
+def check(address):
+    # a burst sent while the owner is stuck in a long frame is taken in before the frame ends
+    # and applied in order once it does
+    server, owner = serve(address, 0.005)
+    client = ControlClient(server.address)
+    client.subscribe(200.0)
+    owner.stall.set()
+    owner.stalled.wait()
+    applied = server.applied
+    sequences = [client.send([(SPEED, 0, [i / 10]), (SPEED, 1, [-i / 10]), (JOINT, 1, [0.0, 0.0, i / 1000])])
+                 for i in range(1000)]
+    deadline = time.perf_counter() + 0.1
+    while server.received < len(sequences) and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    received, during = server.received, server.applied - applied
+    times = [client.wait(sequence) for sequence in sequences]
+    in_order = times == sorted(times)
+    robot = owner.simulation.robot
+    speeds = [wheel.speed for wheel in robot.wheels]
+    # telemetry catches up with the last batch
+    deadline = time.perf_counter() + 1.0
+    while (client.state is None or list(client.state[4]) != speeds) and time.perf_counter() < deadline:
+        client.read()
+    bad = client.send([(SPEED, 7, [1.0])])
+    try:
+        client.wait(bad)
+        rejected = False
+    except ValueError:
+        rejected = True
+    client.close()
+    stop(server, owner)
+
+    print(f"{address.split(':')[0]}: {received} of {len(sequences)} batches taken in during a 200 ms frame, "
+          f"{during} applied in it, acknowledged {'in' if in_order else 'OUT OF'} order")
+    ok = (received == len(sequences) and during == 0 and in_order and speeds == [99.9, -99.9]
+          and robot.wheels[1].angles[2] == 0.999 and list(client.state[4]) == speeds and rejected)
+    if not ok:
+        sys.exit(f"commands were not taken in and applied as sent: speeds {speeds}, telemetry {client.state}, "
+                 f"bad wheel {'rejected' if rejected else 'accepted'}")
+
+
+def check_stop(address):
+    # controllers still connected, one of them subscribed, are disconnected by stop
+    server, owner = serve(address, 0.005)
+    clients = [ControlClient(server.address) for _ in range(3)]
+    clients[0].subscribe(100.0)
+    clients[1].wait(clients[1].set_speeds([1.0, 1.0]))
+    stopping = threading.Thread(target=stop, args=(server, owner), daemon=True)
+    start = time.perf_counter()
+    stopping.start()
+    stopping.join(2.0)
+    seconds = time.perf_counter() - start
+    closed = 0
+    for client in clients:
+        try:
+            while True:
+                client.read()
+        except ConnectionError:
+            closed += 1
+        client.close()
+    print(f"{address.split(':')[0]}: stopped in {seconds * 1e3:.1f} ms with {len(clients)} controllers connected, "
+          f"{closed} disconnected")
+    if stopping.is_alive() or closed != len(clients) or server.connections:
+        sys.exit("the server does not stop while controllers are connected")
+
+
+def bench(address, count):
+    for draw in (0.0, 0.012):
+        server, owner = serve(address, draw)
+        client = ControlClient(server.address)
+        client.subscribe(100.0)
+        start = time.perf_counter()
+        round_trips, to_applied = measure(client, count, 2)
+        elapsed = time.perf_counter() - start
+        client.close()
+        stop(server, owner)
+        print(f"{address.split(':')[0]}, frames drawn in {draw * 1e3:.0f} ms: {summary('round trip', round_trips)}")
+        print(f"{'':>26}{summary('sent to applied', to_applied)}")
+        print(f"{'':>26}telemetry {client.telemetry_frames / elapsed:.1f} frames/s of 100")
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with tempfile.TemporaryDirectory() as directory:
+        for address in ("127.0.0.1:0", f"unix:{os.path.join(directory, 'control.sock')}"):
+            check(address)
+            check_stop(address)
+            bench(address, count)
@@ -0,0 +1,89 @@
+# frustum culling - checks the frustum planes against clip space, that culled frames are identical to
+# unculled ones and times both on a synthetic robot whose links spread far beyond the view
+# run from the repository root: python -m benchmarks.culling [links ...]
+
+import offscreen  # before OpenGL is imported by anything else
+
+import contextlib
+import os
+import sys
+import time
+import timeit
+
+import numpy as np
+import pyrr
+from OpenGL.GL import glFinish
+
+import urdf_loader
+from asset_loader import AssetLoader
+from benchmarks.urdf_loader import synthetic_urdf
+from culling import Frustum
+from framebuffer import Framebuffer
+from renderer import Renderer
+from robot import Robot
+
+SIZE = (640, 480)
+
+
+def check_planes(count=100000):
+    # points inside the frustum are exactly those with -w <= x, y, z <= w in clip space
+    rng = np.random.default_rng(0)
+    view = pyrr.matrix44.create_look_at([0.5, 2.0, 3.0], [0.0, 0.0, 0.0], [0.0, 1.0, 0.0])
+    projection = pyrr.matrix44.create_perspective_projection(fovy=45.0, aspect=4 / 3, near=0.1, far=100.0)
+    points = rng.uniform(-30, 30, (count, 3))
+    clip = np.c_[points, np.ones(count)] @ view @ projection
+    inside = (np.abs(clip[:, :3]) <= clip[:, 3:]).all(axis=1)
+    visible = Frustum(view, projection).spheres_visible(points, np.zeros(count))
+    mismatches = np.count_nonzero(inside != visible)
+    print(f"frustum planes against clip space: {np.count_nonzero(inside)} of {count} points inside, "
+          f"{mismatches} mismatches")
+    # points within a rounding error of a plane may land on either side
+    if mismatches > count * 1e-4:
+        sys.exit("frustum planes do not match the projection")
+
+
+def best_of(func, repeat=5):
+    number, _ = timeit.Timer(func).autorange()
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def bench(count):
+    # a chain of links curling away from the camera, most of them out of view
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        robot = Robot("synthetic", model=urdf_loader.load(synthetic_urdf(count, branching=1)))
+    framebuffer = Framebuffer(*SIZE)
+    framebuffer.bind()
+    renderer = Renderer(robot, AssetLoader())
+    renderer.lod = False  # coarser meshes would change the culled image
+    renderer.initialize()
+    renderer.resize(*SIZE)
+    while renderer.paint():
+        time.sleep(0.01)
+
+    def frame():
+        renderer.paint()
+        glFinish()
+
+    results = {}
+    for culling in (False, True):
+        renderer.culling = culling
+        frame()
+        image = framebuffer.read().copy()
+        drawn = sum(batch.count for batch in renderer.render_list.batches)
+        results[culling] = (best_of(frame), drawn, image)
+    (t_all, all_drawn, all_image), (t_culled, drawn, image) = results[False], results[True]
+    identical = np.array_equal(all_image, image)
+    print(f"{count:>7} links  {all_drawn:>7} -> {drawn:>5} drawn  {t_all * 1e3:>9.3f} -> {t_culled * 1e3:>7.3f} ms"
+          f"  {t_all / t_culled:>5.1f}x  identical {identical}")
+    renderer.destroy()
+    framebuffer.destroy()
+    if not identical:
+        sys.exit("culling changed the image")
+
+
+if __name__ == '__main__':
+    check_planes()
+    context = offscreen.Context()
+    for n in [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]:
+        bench(n)
+    context.destroy()
@@ -0,0 +1,62 @@
+# steps fleets of differential drive robots headless and checks them against Robot.move
+# run from the repository root: python -m benchmarks.fleet [count ...]
+
+import math
+import sys
+import time
+
+import numpy as np
+
+from fleet import Fleet
+
+
+def move_reference(pose, speeds, radii, separation):
+    # scalar kinematics of Robot.move for one robot, without the Robot object
+    x, y, theta = pose
+    l1 = separation / 2
+    l2 = separation / 2
+    xR = 0.5 * radii[0] * speeds[0] + 0.5 * radii[1] * speeds[1]
+    omega = radii[0] * speeds[0] / (2 * l1) - radii[1] * speeds[1] / (2 * l2)
+    rotation_matrix = np.array([[np.cos(theta), -np.sin(theta), 0],
+                                [np.sin(theta), np.cos(theta), 0],
+                                [0, 0, 1]])
+    xiI = np.array([x, y, theta]) + rotation_matrix @ np.array([xR, 0, omega])
+    return xiI[0], xiI[1], xiI[2] % math.radians(360)
+
+
+def check(count=200, steps=50):
+    # fleet against the scalar reference, robot by robot
+    rng = np.random.default_rng(0)
+    fleet = Fleet(count, rng.uniform(0.05, 0.15, (count, 2)), rng.uniform(0.2, 0.4, count))
+    fleet.set_speeds(rng.uniform(-2, 2, (count, 2)))
+    poses = [(0.0, 0.0, 0.0)] * count
+    for _ in range(steps):
+        fleet.step()
+        poses = [move_reference(poses[i], fleet.speeds[i], fleet.wheel_radii[i], fleet.wheel_separation[i])
+                 for i in range(count)]
+    error = np.abs(fleet.poses() - np.array(poses)).max()
+    print(f"max difference to Robot.move kinematics after {steps} steps: {error:.3g}")
+    if error > 1e-9:
+        sys.exit("fleet does not match Robot.move")
+
+
+def bench(count, seconds=1.0):
+    fleet = Fleet(count)
+    fleet.set_speeds(np.random.default_rng(1).uniform(-2, 2, (count, 2)))
+    fleet.step()
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fleet.step()
+        steps += 1
+    elapsed = time.perf_counter() - start
+    print(f"{count:>9} robots  {elapsed / steps * 1e6:>10.1f} us/step  "
+          f"{count * steps / elapsed / 1e6:>8.2f} M robot-steps/s")
+
+
+if __name__ == '__main__':
+    check()
+    for n in [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]:
+        bench(n)
+    if "OpenGL" in sys.modules or "PyQt6" in sys.modules:
+        sys.exit("fleet imported OpenGL or Qt")
@@ -0,0 +1,98 @@
+# levels of detail - checks that sizes wavering around a threshold do not switch levels, then counts the
+# vertices drawn and times frames with and without levels of detail on a synthetic robot of spheres,
+# cylinders and boxes seen from near to far
+# run from the repository root: python -m benchmarks.lod [links ...]
+
+import offscreen  # before OpenGL is imported by anything else
+
+import contextlib
+import os
+import sys
+import time
+import timeit
+
+import numpy as np
+from OpenGL.GL import glFinish
+
+import urdf_loader
+from asset_loader import AssetLoader
+from benchmarks.urdf_loader import synthetic_urdf
+from framebuffer import Framebuffer
+from render_list import LOD_HYSTERESIS, LOD_SIZES, lod_levels
+from renderer import Renderer
+from robot import Robot
+
+SIZE = (640, 480)
+# camera positions, nearest first
+DISTANCES = (0.5, 1.0, 3.0, 8.0)
+
+
+def check_hysteresis(frames=100):
+    # sizes wavering by less than LOD_HYSTERESIS around every threshold keep their level,
+    # sizes moving well past a threshold change it
+    coarsest = len(LOD_SIZES)
+    thresholds = np.repeat(LOD_SIZES, 2)
+    rng = np.random.default_rng(0)
+    levels = lod_levels(thresholds, np.zeros(len(thresholds), dtype=np.int64), coarsest)
+    start = levels.copy()
+    switches = 0
+    for _ in range(frames):
+        sizes = thresholds * (1 + rng.uniform(-0.9, 0.9, len(thresholds)) * LOD_HYSTERESIS)
+        new = lod_levels(sizes, levels, coarsest)
+        switches += np.count_nonzero(new != levels)
+        levels = new
+    print(f"hysteresis: {switches} level switches in {frames} frames of sizes within "
+          f"{LOD_HYSTERESIS:.0%} of the thresholds")
+    if switches:
+        sys.exit("levels switched back and forth")
+    far = lod_levels(thresholds * (1 - 2 * LOD_HYSTERESIS), start, coarsest)
+    near = lod_levels(thresholds * (1 + 2 * LOD_HYSTERESIS), start, coarsest)
+    expected = np.arange(1, coarsest + 1).repeat(2)
+    if not (np.array_equal(far, expected) and np.array_equal(near, expected - 1)):
+        sys.exit("levels did not follow sizes well past the thresholds")
+
+
+def best_of(func, repeat=5):
+    number, _ = timeit.Timer(func).autorange()
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def bench(count):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        robot = Robot("synthetic", model=urdf_loader.load(synthetic_urdf(count)))
+    framebuffer = Framebuffer(*SIZE)
+    framebuffer.bind()
+    renderer = Renderer(robot, AssetLoader())
+    renderer.initialize()
+    renderer.resize(*SIZE)
+    while renderer.paint():
+        time.sleep(0.01)
+
+    def frame():
+        renderer.paint()
+        glFinish()
+
+    for distance in DISTANCES:
+        renderer.cam.pos[:] = [0.0, 0.6 * distance, distance]
+        results = {}
+        for lod in (False, True):
+            renderer.lod = lod
+            # counters are kept by the profiler's frame records
+            renderer.profiler.enabled = True
+            frame()
+            vertices = renderer.profiler.frames[-1]["vertices"]
+            renderer.profiler.enabled = False
+            results[lod] = (best_of(frame), vertices)
+        (t_full, full), (t_lod, vertices) = results[False], results[True]
+        print(f"{count:>6} links  camera at {distance:>4.1f} m  {full:>9} -> {vertices:>8} vertices"
+              f"  {t_full * 1e3:>8.3f} -> {t_lod * 1e3:>8.3f} ms")
+    renderer.destroy()
+    framebuffer.destroy()
+
+
+if __name__ == '__main__':
+    check_hysteresis()
+    context = offscreen.Context()
+    for n in [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]:
+        bench(n)
+    context.destroy()
@@ -0,0 +1,81 @@
+# compares the vectorized MeshLoader.load_mesh with the original per-vertex parser,
+# the color the original parser baked into every vertex is dropped before comparing
+# run from the repository root: python -m benchmarks.obj_parser [model.obj ...]
+
+import sys
+import timeit
+
+import numpy as np
+
+from mesh_loader import MeshLoader
+
+COLOR = [0.80078125, 0.12890625, 0.1328125, 1.0]
+
+
+def load_mesh_loops(filepath, color):
+    # the parser MeshLoader used before it was vectorized, kept as the reference output
+    v = []
+    vn = []
+    vt = []
+    vertices = []
+    with open(filepath, 'r') as f:
+        line = f.readline()
+        while line:
+            line = line.split(" ")
+            if line[0] == "v":
+                v.append([float(x) for x in line[1:4]])
+            if line[0] == "vt":
+                vt.append([float(x) for x in line[1:3]])
+            if line[0] == "vn":
+                vn.append([float(x) for x in line[1:4]])
+            if line[0] == "f":
+                line.remove("f")
+                f_vertices = []
+                f_textures = []
+                f_normals = []
+                for vertex in line:
+                    vertex = vertex.split("/")
+                    f_vertices.append(v[int(vertex[0]) - 1])
+                    f_textures.append(vt[int(vertex[1]) - 1])
+                    f_normals.append(vn[int(vertex[2]) - 1])
+                vertex_order = []
+                for i in range(len(line) - 2):
+                    vertex_order.append(0)
+                    vertex_order.append(i + 1)
+                    vertex_order.append(i + 2)
+                for i in vertex_order:
+                    for j in f_vertices[i]:
+                        vertices.append(j)
+                    for c in color:
+                        vertices.append(c)
+                    for n in f_normals[i]:
+                        vertices.append(n)
+                    for n in f_textures[i]:
+                        vertices.append(n)
+            line = f.readline()
+    return np.array(vertices, dtype=np.float32)
+
+
+def best_of(func, repeat=5):
+    # best time of one call in seconds
+    number, _ = timeit.Timer(func).autorange()
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main(models):
+    print(f"{'model':<22}{'vertices':>10}{'loops ms':>12}{'numpy ms':>12}{'speedup':>10}  identical")
+    for model in models:
+        reference = np.delete(load_mesh_loops(model, COLOR).reshape(-1, 12), np.s_[3:7], axis=1)
+        vectorized = MeshLoader.load_mesh(model)
+        identical = reference.tobytes() == vectorized.tobytes()
+
+        t_loops = best_of(lambda: load_mesh_loops(model, COLOR))
+        t_numpy = best_of(lambda: MeshLoader.load_mesh(model))
+        print(f"{model:<22}{len(vectorized):>10}{t_loops * 1e3:>12.3f}{t_numpy * 1e3:>12.3f}"
+              f"{t_loops / t_numpy:>9.1f}x  {identical}")
+        if not identical:
+            sys.exit(f"{model}: vectorized parser output differs from the reference parser")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or ["models/sphere.obj", "models/cylinder.obj", "models/cube.obj", "models/plane.obj"])
@@ -0,0 +1,112 @@
+# pose recorder - checks that a log holds exactly the recorded steps across ring wrap-arounds and appends,
+# that recording does not keep allocating memory, and times simulation steps with and without recording
+# run from the repository root: python -m benchmarks.recorder [steps]
+
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from recorder import PoseRecorder, open_log
+from robot import Robot
+from simulation import Simulation
+
+
+def quiet_robot():
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return Robot("differential_drive.xacro")
+
+
+def drive(simulation, steps):
+    # changing wheel speeds and joint angles, returns the states read from the robot after every step
+    robot = simulation.robot
+    expected = []
+    for i in range(steps):
+        if i % 50 == 0:
+            robot.update_values([[0.0, 0.0, i / 100], [0.1, 0.0, 0.0]], [np.sin(i / 300) * 3, 2.0])
+        simulation.step()
+        expected.append((simulation.time, robot.base_link.xyz[0], robot.base_link.xyz[1], robot.theta,
+                         robot.wheels[0].speed, robot.wheels[1].speed, robot.wheels[0].angles[2]))
+    return expected
+
+
+def check(directory):
+    path = os.path.join(directory, "check.robotlog")
+    expected = []
+    for run in range(2):
+        # a small ring wraps around many times, the second run is appended to the same log
+        recorder = PoseRecorder(quiet_robot(), path, capacity=1000, chunk=300, name="differential_drive.xacro")
+        states = drive(Simulation(recorder.robot, recorder=recorder), 7777)
+        if expected:
+            # times continue from the end of the first run
+            offset = expected[-1][0] - states[0][0]
+            states = [(t + offset, *state) for t, *state in states]
+        expected += states
+        recorder.close()
+    description, records = open_log(path)
+    logged = np.column_stack((records["t"], records["x"], records["y"], records["theta"], records["speeds"],
+                              records["angles"][:, 0, 2]))
+    same = len(records) == len(expected) and np.array_equal(logged, np.array(expected))
+    print(f"log of {description['robot']}: {len(records)} steps of {records.dtype.itemsize} bytes, "
+          f"{'same as' if same else 'DIFFERENT FROM'} the robot's states")
+    if not same:
+        sys.exit("log differs from the recorded steps")
+
+
+def check_memory(directory, steps=50000):
+    robot = quiet_robot()
+    recorder = PoseRecorder(robot, os.path.join(directory, "memory.robotlog"))
+    simulation = Simulation(robot)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(steps):
+        simulation.step()
+        recorder.record(simulation.time)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    recorder.close()
+    print(f"memory: {(after - before) / 1024:.1f} KiB more after {steps} steps, peak {(peak - before) / 1024:.1f} KiB")
+    if after - before > 64 * 1024:
+        sys.exit("recording keeps allocating memory")
+
+
+def bench(directory, steps):
+    results = {}
+    for name in ("no recorder", "ring only", "ring and log"):
+        robot = quiet_robot()
+        recorder = None
+        if name != "no recorder":
+            path = os.path.join(directory, "bench.robotlog") if name == "ring and log" else None
+            recorder = PoseRecorder(robot, path)
+        simulation = Simulation(robot, recorder=recorder)
+        robot.update_values([[0, 0, 0]] * 2, [2.0, 1.5])
+        start = time.perf_counter()
+        for _ in range(steps):
+            simulation.step()
+        if recorder is not None:
+            recorder.close()
+        results[name] = (time.perf_counter() - start) / steps
+    base = results["no recorder"]
+    for name, seconds in results.items():
+        print(f"{name:>13}  {seconds * 1e6:7.2f} us/step  {(seconds - base) * 1e6:+6.2f} us for recording")
+    size = os.path.getsize(os.path.join(directory, "bench.robotlog"))
+    print(f"log of {steps} steps: {size / 1e6:.1f} MB")
+
+    # recording alone, the steps above are mostly Robot.move
+    recorder = PoseRecorder(quiet_robot(), os.path.join(directory, "record.robotlog"))
+    start = time.perf_counter()
+    for i in range(steps):
+        recorder.record(i)
+    recorder.close()
+    print(f"record alone  {(time.perf_counter() - start) / steps * 1e6:7.2f} us/step")
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        check(directory)
+        check_memory(directory)
+        bench(directory, int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,100 @@
+# log replay - writes a long synthetic log with uneven steps, checks that seeking by time finds the same step
+# as a search over all times and that the end of a log shows its last step, and times opening and seeking
+# against reading the whole log into memory
+# run from the repository root: python -m benchmarks.replay [steps]
+
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from recorder import record_dtype, write_header
+from replay import LogReplay
+from robot import Robot
+
+
+def write_log(path, steps):
+    # 60 Hz steps with jitter, repeated times (single steps) and pauses
+    rng = np.random.default_rng(0)
+    records = np.zeros(steps, dtype=record_dtype(2))
+    dt = np.full(steps, 1 / 60) * rng.uniform(0.5, 1.5, steps)
+    dt[rng.random(steps) < 0.01] = 0.0
+    dt[rng.random(steps) < 1e-4] = 600.0
+    records["t"] = np.cumsum(dt)
+    records["x"] = np.cos(records["t"] / 100)
+    records["y"] = np.sin(records["t"] / 100)
+    records["theta"] = records["t"] % (2 * np.pi)
+    records["speeds"] = rng.uniform(-5, 5, (steps, 2))
+    with open(path, "wb") as f:
+        write_header(f, {"robot": "differential_drive.xacro", "wheels": ["lave_koleso", "prave_koleso"]})
+        records.tofile(f)
+
+
+def check_ends(directory, stride=16, logs=300):
+    # plain 60 Hz logs whose last record is one of the samples the index is built from
+    path = os.path.join(directory, "end.robotlog")
+    wrong = 0
+    for k in range(1, logs + 1):
+        records = np.zeros(k * stride + 1, dtype=record_dtype(2))
+        records["t"] = np.arange(len(records)) / 60
+        with open(path, "wb") as f:
+            write_header(f, {"robot": "differential_drive.xacro", "wheels": ["lave_koleso", "prave_koleso"]})
+            records.tofile(f)
+        replay = LogReplay(path, stride)
+        wrong += replay.index_at(replay.end) != replay.count - 1
+        replay.close()
+    print(f"end of {logs} logs of 60 Hz steps: {wrong} show another step than the last")
+    if wrong:
+        sys.exit("the end of a log does not show its last step")
+
+
+def main(steps):
+    with tempfile.TemporaryDirectory() as directory:
+        check_ends(directory)
+        path = os.path.join(directory, "long.robotlog")
+        write_log(path, steps)
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        replay = LogReplay(path)
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            whole = np.frombuffer(f.read(), dtype=np.uint8)
+        loaded = time.perf_counter() - start
+        del whole
+        print(f"{steps} steps, {size / 1e6:.0f} MB, {replay.duration / 3600:.1f} h: opened in {opened * 1e3:.2f} ms, "
+              f"reading it takes {loaded * 1e3:.0f} ms")
+
+        times = np.array(replay.times)
+        queries = np.concatenate((np.random.default_rng(1).uniform(replay.start - 1, replay.end + 1, 20000),
+                                  times[::max(1, steps // 5000)]))
+        expected = np.maximum(np.searchsorted(times, queries, side="right") - 1, 0)
+        start = time.perf_counter()
+        found = np.array([replay.index_at(t) for t in queries])
+        seek = (time.perf_counter() - start) / len(queries)
+        wrong = np.count_nonzero(found != expected)
+        # playback stops at the end, which has to show the last step
+        last = replay.index_at(replay.end)
+        print(f"end of the log: step {last + 1} of {replay.count}")
+        largest = (replay.upper - replay.lower).max()
+        print(f"seek: {seek * 1e6:.1f} us, {wrong} of {len(queries)} wrong, at most {largest} records searched")
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            robot = Robot("differential_drive.xacro")
+        start = time.perf_counter()
+        for t in queries[:2000]:
+            replay.apply(robot, replay.index_at(t))
+        print(f"seek and place the robot: {(time.perf_counter() - start) / 2000 * 1e6:.1f} us")
+        replay.close()
+        if wrong:
+            sys.exit("seeking found other steps than a full search")
+        if last != replay.count - 1:
+            sys.exit("the end of the log does not show its last step")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000000)
@@ -0,0 +1,214 @@
+# times the hot paths of loading, kinematics and drawing, stores the results as JSON and compares them
+# with an earlier run, frames are drawn offscreen (EGL, Mesa llvmpipe without a GPU)
+# run from the repository root:
+#   python -m benchmarks.suite [--output results.json] [--baseline baseline.json] [--threshold 0.15] [pattern ...]
+# patterns (fnmatch) select benchmarks by name, e.g. "frame/*" or "load_mesh/*"
+# the exit status is 1 when a benchmark is slower than in the baseline by more than the threshold
+
+import offscreen  # before OpenGL is imported by anything else
+
+import contextlib
+import datetime
+import fnmatch
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+import numpy as np
+from OpenGL.GL import glFinish
+
+import urdf_loader
+import xacro_expander
+from asset_loader import AssetLoader
+from framebuffer import Framebuffer
+from mesh_loader import MeshLoader
+from renderer import Renderer
+from robot import Robot
+
+MODELS = sorted(glob.glob("models/*.obj"))
+ROBOTS = sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob("data/*.xacro"))
+FRAME_SIZE = (640, 480)
+# a benchmark regresses when it takes this much longer than in the baseline
+THRESHOLD = 0.15
+
+
+def best_of(func, repeat=5):
+    # best time of one call in seconds
+    number, _ = timeit.Timer(func).autorange()
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+@contextlib.contextmanager
+def quiet():
+    # Robot and Robot.move print progress, which would be timed too and flood the output
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def drive(robot):
+    # wheel speeds so that move() turns and translates the robot
+    speeds = [1.0, 0.5, 0.0, 0.0][:robot.number_of_wheels]
+    robot.update_values([[0, 0, 0]] * robot.number_of_wheels, speeds)
+    return speeds
+
+
+def bench_load_mesh(model):
+    return best_of(lambda: MeshLoader.load_mesh(model))
+
+
+def bench_robot_expand(name):
+    # xacro expansion, URDF parsing and building the links, as on the first start
+    def construct():
+        model = urdf_loader.load(xacro_expander.expand(f"data/{name}.xacro"))
+        Robot(f"{name}.xacro", model=model)
+    with quiet():
+        return best_of(construct)
+
+
+def bench_robot_cached(name):
+    # model taken from .cache/robots, as on every later start
+    with quiet():
+        Robot(f"{name}.xacro")  # fills the cache
+        return best_of(lambda: Robot(f"{name}.xacro"))
+
+
+def bench_move(name):
+    with quiet():
+        robot = Robot(f"{name}.xacro")
+        drive(robot)
+        return best_of(lambda: robot.move(0.01))
+
+
+def bench_update_values(name):
+    with quiet():
+        robot = Robot(f"{name}.xacro")
+    pry = [[0, 0, 0]] * robot.number_of_wheels
+    speeds = drive(robot)
+    return best_of(lambda: robot.update_values(pry, speeds))
+
+
+def bench_frame(name):
+    # one frame of a driving robot - move, kinematics, instance upload and drawing, until the GPU is done
+    # drawn with the offscreen context run made current
+    with quiet():
+        robot = Robot(f"{name}.xacro")
+    drive(robot)
+    framebuffer = Framebuffer(*FRAME_SIZE)
+    framebuffer.bind()
+    renderer = Renderer(robot, AssetLoader())
+    renderer.initialize()
+    renderer.resize(*FRAME_SIZE)
+    # placeholders are cheaper to draw than the real meshes and textures
+    while renderer.paint():
+        time.sleep(0.01)
+
+    def frame():
+        robot.move(0.01)
+        renderer.paint()
+        glFinish()
+    try:
+        with quiet():
+            return best_of(frame)
+    finally:
+        renderer.destroy()
+        framebuffer.destroy()
+
+
+def benchmarks():
+    # name -> function returning seconds per call, frames need an offscreen context to be current
+    functions = {}
+    for model in MODELS:
+        functions[f"load_mesh/{os.path.basename(model)}"] = lambda model=model: bench_load_mesh(model)
+    for name in ROBOTS:
+        functions[f"robot/{name}/expand"] = lambda name=name: bench_robot_expand(name)
+        functions[f"robot/{name}/cached"] = lambda name=name: bench_robot_cached(name)
+        functions[f"move/{name}"] = lambda name=name: bench_move(name)
+        functions[f"update_values/{name}"] = lambda name=name: bench_update_values(name)
+    for name in ROBOTS:
+        functions[f"frame/{name}"] = lambda name=name: bench_frame(name)
+    return functions
+
+
+def run(patterns):
+    results = {}
+    context = None
+    for name, function in benchmarks().items():
+        if patterns and not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            continue
+        if name.startswith("frame/"):
+            if context is None:
+                try:
+                    context = offscreen.Context()
+                except offscreen.OffscreenError as e:
+                    print(f"{name:<40} skipped, {e}")
+                    continue
+        seconds = function()
+        results[name] = seconds
+        print(f"{name:<40}{format_time(seconds):>14}")
+    machine = {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+               "processor": platform.processor() or platform.machine()}
+    if context is not None:
+        machine["renderer"] = context.renderer()
+        context.destroy()
+    return {"created": datetime.datetime.now().isoformat(timespec="seconds"), "machine": machine,
+            "results": results}
+
+
+def compare(run_results, baseline, threshold=THRESHOLD):
+    # prints both runs side by side, returns the names of benchmarks that got slower than the threshold
+    regressions = []
+    print(f"\n{'benchmark':<40}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, seconds in run_results["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<40}{'-':>14}{format_time(seconds):>14}")
+            continue
+        change = seconds / before - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<40}{format_time(before):>14}{format_time(seconds):>14}{change:>+10.1%}{flag}")
+    machine = baseline.get("machine", {})
+    if any(machine.get(key, value) != value for key, value in run_results["machine"].items()):
+        print("baseline was recorded on a different machine or environment, differences may not be regressions")
+    return regressions
+
+
+def format_time(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.2f} us"
+
+
+def main(arguments):
+    options = {"--output": None, "--baseline": None, "--threshold": THRESHOLD}
+    patterns = []
+    while arguments:
+        argument = arguments.pop(0)
+        if argument in options:
+            if not arguments:
+                sys.exit(f"{argument} needs a value")
+            options[argument] = arguments.pop(0)
+        else:
+            patterns.append(argument)
+
+    run_results = run(patterns)
+    if options["--output"] is not None:
+        with open(options["--output"], 'w') as f:
+            json.dump(run_results, f, indent=2)
+        print(f"results written to {options['--output']}")
+    if options["--baseline"] is not None:
+        with open(options["--baseline"], 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(run_results, baseline, float(options["--threshold"]))
+        if regressions:
+            sys.exit(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,156 @@
+# generates synthetic URDF robots with thousands of links and times loading them
+# checks urdf_loader against the original Robot parser on the robots in data/reference
+# run from the repository root: python -m benchmarks.urdf_loader [count ...]
+
+import glob
+import random
+import sys
+import time
+import xml.etree.ElementTree as Et
+
+import urdf_loader
+from robot import Robot
+
+SHAPES = ("box", "cylinder", "sphere")
+
+
+def synthetic_urdf(count, branching=3, seed=0):
+    # URDF text of a robot with count links, every link has up to branching children
+    # branching=1 is a single chain count links deep
+    rng = random.Random(seed)
+    lines = ['<?xml version="1.0" ?>', '<robot name="synthetic">']
+    colors = ("0 0 0.8 1", "0.8 0 0 1", "0 0.8 0 1")
+    for i, rgba in enumerate(colors):
+        lines.append(f'  <material name="m{i}"><color rgba="{rgba}"/></material>')
+    for i in range(count):
+        shape = SHAPES[i % 3]
+        if shape == "box":
+            geometry = f'<box size="{rng.uniform(0.05, 0.2):.3f} {rng.uniform(0.05, 0.2):.3f} 0.05"/>'
+        elif shape == "cylinder":
+            geometry = f'<cylinder radius="{rng.uniform(0.02, 0.1):.3f}" length="0.05"/>'
+        else:
+            geometry = f'<sphere radius="{rng.uniform(0.02, 0.1):.3f}"/>'
+        lines.append(f'  <link name="link{i}"><visual><origin xyz="0 0 0" rpy="0 0 0"/>'
+                     f'<geometry>{geometry}</geometry><material name="m{i % 3}"/></visual></link>')
+    for i in range(1, count):
+        parent = (i - 1) // branching
+        lines.append(f'  <joint name="joint{i}" type="{"continuous" if i % 7 == 0 else "fixed"}">'
+                     f'<parent link="link{parent}"/><child link="link{i}"/>'
+                     f'<origin xyz="0.1 {rng.uniform(-0.1, 0.1):.3f} 0" rpy="0 0 {rng.uniform(-1, 1):.3f}"/></joint>')
+    lines.append('</robot>')
+    return "\n".join(lines)
+
+
+def load_legacy(urdf_text):
+    # the original Robot.read_urdf, describe_links and describe_joints, kept as the reference output
+    root = Et.fromstring(urdf_text)
+    urdf_links = list(root.iter("link"))
+    urdf_joints = list(root.iter("joint"))
+    materials = {}
+    for child in root:
+        if child.tag == "material":
+            materials[child.attrib["name"]] = child[0].attrib["rgba"]
+    links = []
+    for link in urdf_links:
+        visual = link.find("visual")
+        geometry = visual.find('geometry')[0]
+        description = {
+            "name": link.attrib.get("name"),
+            "shape": geometry.tag,
+            "xyz": visual.find("origin").attrib.get("xyz"),
+            "rpy": visual.find("origin").attrib.get("rpy"),
+            "color": materials[visual.find("material").attrib.get("name")],
+        }
+        if geometry.tag == 'box':
+            description["size"] = [float(item) for item in geometry.attrib.get("size").split()]
+        if geometry.tag == 'cylinder':
+            description["radius"] = float(geometry.attrib.get("radius"))
+            description["length"] = float(geometry.attrib.get("length"))
+        if geometry.tag == 'sphere':
+            description["radius"] = float(geometry.attrib.get("radius"))
+        links.append(description)
+    joints = [{
+        "name": joint.get("name"),
+        "type": joint.get("type"),
+        "parent": joint.find("parent").get("link"),
+        "child": joint.find("child").get("link"),
+        "xyz": joint.find("origin").get("xyz"),
+        "rpy": joint.find("origin").get("rpy"),
+    } for joint in urdf_joints]
+    return {"materials": materials, "links": links, "joints": joints}
+
+
+def connect_legacy(links, joints):
+    # the original find_base_link and connect_joints_links lookups, O(links * joints)
+    joint_children = [joint["child"] for joint in joints]
+    base_link = None
+    for link in links:
+        if link["name"] not in joint_children:
+            base_link = link["name"]
+    connected = {link["name"]: [] for link in links}
+    for link in links:
+        for joint in joints:
+            if link["name"] == joint["parent"] or link["name"] == joint["child"]:
+                connected[link["name"]].append(joint["name"])
+    return base_link, connected
+
+
+def check():
+    ok = True
+    for path in sorted(glob.glob("data/reference/*.urdf")):
+        with open(path, 'r') as f:
+            text = f.read()
+        model = urdf_loader.load(text)
+        legacy = load_legacy(text)
+        base_link, _ = connect_legacy(legacy["links"], legacy["joints"])
+        # the original parser did not read <collision>
+        model["links"] = [{key: value for key, value in link.items() if key != "collisions"} for link in model["links"]]
+        same = all(model[key] == legacy[key] for key in legacy) and model["base_link"] == base_link
+        print(f"{path}: {'same as' if same else 'DIFFERS FROM'} the original parser")
+        ok = ok and same
+
+    broken = {
+        "cycle": '<robot><link name="a"/><joint name="k"><parent link="b"/><child link="c"/></joint>'
+                 '<joint name="l"><parent link="c"/><child link="b"/></joint></robot>',
+        "two roots": '<robot><joint name="j"><parent link="a"/><child link="b"/></joint></robot>',
+        "undefined link": '<robot><joint name="j"><parent link="a"/><child link="b"/></joint></robot>',
+    }
+    shapes = '<link name="{}"><visual><geometry><sphere radius="1"/></geometry><material name="m">' \
+             '<color rgba="1 1 1 1"/></material></visual></link>'
+    broken["cycle"] = broken["cycle"].replace('<link name="a"/>', "".join(shapes.format(n) for n in "abc"))
+    broken["two roots"] = broken["two roots"].replace("<joint", "".join(shapes.format(n) for n in "abc") + "<joint", 1)
+    broken["undefined link"] = broken["undefined link"].replace("<joint", shapes.format("a") + "<joint", 1)
+    for name, text in broken.items():
+        try:
+            urdf_loader.load(text)
+            print(f"{name}: NOT REJECTED")
+            ok = False
+        except urdf_loader.UrdfError as e:
+            print(f"{name}: rejected - {e}")
+    return ok
+
+
+def bench(counts):
+    print(f"{'links':>7} {'branching':>9} {'legacy ms':>10} {'load ms':>9} {'robot ms':>9} {'us/link':>8}")
+    for count in counts:
+        for branching in (3, 1):
+            text = synthetic_urdf(count, branching)
+            legacy = ""
+            if count <= 2000:
+                start = time.perf_counter()
+                model = load_legacy(text)
+                connect_legacy(model["links"], model["joints"])
+                legacy = f"{(time.perf_counter() - start) * 1e3:.1f}"
+            start = time.perf_counter()
+            model = urdf_loader.load(text)
+            loaded = time.perf_counter()
+            Robot("synthetic", model=model)
+            built = time.perf_counter()
+            print(f"{count:>7} {branching:>9} {legacy:>10} {(loaded - start) * 1e3:>9.1f} "
+                  f"{(built - loaded) * 1e3:>9.1f} {(built - start) / count * 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    if not check():
+        sys.exit(1)
+    bench([int(count) for count in sys.argv[1:]] or [100, 1000, 2000, 10000, 30000])
@@ -0,0 +1,35 @@
+# checks the in-process xacro expander against URDFs generated by ROS xacro and times it
+# run from the repository root: python -m benchmarks.xacro_expander
+# the references in data/reference were made with: xacro data/<name>.xacro > data/reference/<name>.urdf
+
+import glob
+import os
+import sys
+import time
+
+import xacro_expander
+
+
+def check():
+    ok = True
+    for path in sorted(glob.glob("data/*.xacro")):
+        name = os.path.splitext(os.path.basename(path))[0]
+        reference = f"data/reference/{name}.urdf"
+        same = xacro_expander.compare(path, reference)
+        print(f"{path}: {'same as' if same else 'DIFFERS FROM'} {reference}")
+        ok = ok and same
+    return ok
+
+
+def bench(path="data/nas_robot_latest.xacro", repeat=100):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        xacro_expander.expand(path)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{path}: {elapsed * 1e3:.2f} ms per expansion")
+
+
+if __name__ == '__main__':
+    if not check():
+        sys.exit(1)
+    bench()
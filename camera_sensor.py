@@ -0,0 +1,134 @@
+from OpenGL.GL import *
+import numpy as np
+import pyrr
+
+from culling import Frustum
+from framebuffer import Framebuffer, ReadbackRing
+from shader_manager import FrameUniforms
+
+
+class CameraSensor:
+    # camera fixed to a link of the robot, draws the renderer's scene and robot from the link's pose into
+    # a framebuffer of its own, at its own rate (frames per second of wall clock time) independent of the view
+    # frames are read back without stalling the GPU and reach subscribers one sensor period after drawing,
+    # nothing is drawn while there are no subscribers
+    def __init__(self, link_name, width=320, height=240, rate=10.0, fov=60.0, offset=(0.0, 0.0, 0.0),
+                 near=0.01, far=100.0, slots=3):
+        # offset - position in the link's frame (URDF axes, x forward, z up), the camera looks along x
+        # slots - frames kept for subscribers, the view of a frame is overwritten slots - 1 frames later
+        self.link_name = link_name
+        self.width = width
+        self.height = height
+        self.rate = rate
+        self.fov = fov
+        self.offset = offset
+        self.near = near
+        self.far = far
+        self.subscribers = []
+
+        self.images = np.zeros((slots, height, width, 3), dtype=np.uint8)
+        # what subscribers get, read-only views of the images, (height, width, 3) RGB, first row at the top
+        self.views = [image.view() for image in self.images]
+        for view in self.views:
+            view.flags.writeable = False
+        self.drawn = 0
+        self.delivered = 0
+        self.latest_slot = None
+        self.next_time = 0.0
+        self.link = None  # index into the kinematics arrays, set by attach
+
+    def subscribe(self, callback):
+        # callback(image, stamp) is called on the GL thread for every frame, stamp is the time it was drawn
+        # image is only valid until the next slots - 1 frames, copy it to keep it longer
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    @property
+    def active(self):
+        return bool(self.subscribers)
+
+    def latest(self):
+        # view of the newest delivered frame, None before the first one
+        return None if self.latest_slot is None else self.views[self.latest_slot]
+
+    def attach(self, renderer):
+        # GL resources, the context has to be current
+        names = [link.name for link in renderer.robot.kinematics.links]
+        if self.link_name not in names:
+            raise ValueError(f"robot has no link {self.link_name!r}")
+        self.link = names.index(self.link_name)
+        framebuffer = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+        self.framebuffer = Framebuffer(self.width, self.height)
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+        self.ring = ReadbackRing(self.width, self.height, 2)
+        self.frame = FrameUniforms()
+        self.frame.projection[:] = pyrr.matrix44.create_perspective_projection(
+            fovy=self.fov, aspect=self.width / self.height, near=self.near, far=self.far)
+        renderer.frame.bind()
+
+    def update(self, renderer, now):
+        # delivers frames the GPU finished and draws a new one when it is due, the context has to be current
+        # returns True when a frame was drawn
+        for tag, _ in self.ring.poll(self.image_of):
+            self.deliver(tag)
+        if not self.subscribers or now < self.next_time:
+            return False
+        # on schedule, unless drawing fell behind by a whole period
+        self.next_time = max(self.next_time + 1 / self.rate, now)
+        self.draw(renderer, now)
+        return True
+
+    def draw(self, renderer, now):
+        # world transforms of this frame
+        renderer.render_list.sync()
+        world = renderer.robot.kinematics.worlds[self.link]
+
+        # Y and Z axis are swapped between URDF and OpenGL
+        x, y, z = self.offset
+        eye = (np.array([x, z, y, 1.0]) @ world)[:3]
+        forward = (np.array([1.0, 0.0, 0.0, 0.0]) @ world)[:3]
+        up = (np.array([0.0, 1.0, 0.0, 0.0]) @ world)[:3]
+        self.frame.view[:] = pyrr.matrix44.create_look_at(eye, eye + forward, up)
+        self.frame.view_position[:] = eye
+        self.frame.light_position[:] = renderer.frame.light_position
+        self.frame.light_color[:] = renderer.frame.light_color
+        self.frame.bind()
+        self.frame.upload()
+
+        framebuffer = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        self.framebuffer.bind()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        renderer.program.use()
+        frustum = Frustum(self.frame.view, self.frame.projection, self.height)
+        renderer.draw_scene(frustum)
+        renderer.draw_robot(frustum)
+        slot = self.drawn % len(self.images)
+        self.drawn += 1
+        finished = self.ring.read(self.framebuffer, (slot, now), self.image_of)
+        if finished is not None:
+            # both buffers were still in flight, the older one had to be waited for
+            self.deliver(finished[0])
+
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+        glViewport(*viewport)
+        renderer.frame.bind()
+
+    def image_of(self, tag):
+        # where the read back pixels of a frame are copied to
+        return self.images[tag[0]]
+
+    def deliver(self, tag):
+        slot, stamp = tag
+        self.latest_slot = slot
+        self.delivered += 1
+        for callback in list(self.subscribers):
+            callback(self.views[slot], stamp)
+
+    def destroy(self):
+        self.ring.destroy()
+        self.framebuffer.destroy()
+        self.frame.destroy()
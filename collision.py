@@ -0,0 +1,306 @@
+import numpy as np
+import pyrr
+
+from link import origin_matrix
+
+# no OpenGL or Qt imports here, collisions are checked headless
+# shapes are stored as arrays (structure of arrays) in OpenGL world axes like the kinematics (Y up),
+# every shape is a transform without scale and half extents along its own axes, cylinders lie along Y
+
+SPHERE, BOX, CYLINDER = 0, 1, 2
+KINDS = {"sphere": SPHERE, "box": BOX, "cylinder": CYLINDER}
+# height of the base link of robots on the ground, as placed by Robot.set_pose
+POSE_HEIGHT = 0.1
+# pairs checked by the narrow phase at once, bounds the size of its temporary arrays
+CHUNK = 4096
+
+
+def half_extents(description):
+    # description - {"shape", "size" | "radius", "length"} as read by urdf_loader
+    shape = description["shape"]
+    if shape == "box":
+        length, width, height = description["size"]
+        return [length / 2, height / 2, width / 2]  # Y and Z axis are swapped
+    if shape == "cylinder":
+        return [description["radius"], description["length"] / 2, description["radius"]]
+    return [description["radius"]] * 3
+
+
+def pose_matrices(x, y, theta, tilt):
+    # (n, 4, 4) world transforms of base links at poses in the ground plane, like Robot.set_pose
+    # tilt - 3x3 rotation of the base link's roll and pitch
+    c, s = np.cos(theta), np.sin(theta)
+    yaw = np.zeros((len(theta), 3, 3))
+    yaw[:, 0, 0] = c
+    yaw[:, 0, 2] = s
+    yaw[:, 1, 1] = 1.0
+    yaw[:, 2, 0] = -s
+    yaw[:, 2, 2] = c
+    poses = np.zeros((len(theta), 4, 4))
+    poses[:, :3, :3] = yaw @ tilt
+    poses[:, 3, 0] = x
+    poses[:, 3, 1] = POSE_HEIGHT
+    poses[:, 3, 2] = y
+    poses[:, 3, 3] = 1.0
+    return poses
+
+
+class Contacts:
+    # overlapping pairs of shapes found by CollisionWorld.query, one row per pair
+    # an obstacle is always the second shape of its pair
+    def __init__(self, first, second, first_owners, second_owners, normals, depths, points):
+        self.first = first  # shape indices into the world's arrays
+        self.second = second
+        self.first_owners = first_owners  # robot of each shape, -1 for obstacles
+        self.second_owners = second_owners
+        self.normals = normals  # (n, 3) unit vectors pointing from the first shape to the second
+        self.depths = depths  # how far the shapes overlap along the normal
+        self.points = points  # (n, 3) between the parts of the shapes closest to each other
+
+    def __len__(self):
+        return len(self.depths)
+
+    @property
+    def with_obstacles(self):
+        # rows of robots touching static obstacles, the others are between two robots
+        return self.second_owners < 0
+
+    def involving(self, owner):
+        # rows where the robot takes part
+        return (self.first_owners == owner) | (self.second_owners == owner)
+
+
+class CollisionWorld:
+    # collision shapes of robots, fleets and static obstacles, all checked against each other at once
+    # shapes of one robot never collide with each other and neither do obstacles
+    def __init__(self):
+        self.kinds = np.zeros(0, dtype=np.int64)
+        self.halves = np.zeros((0, 3))
+        self.owners = np.zeros(0, dtype=np.int64)  # robot of every shape, -1 for obstacles
+        self.names = []  # link or obstacle of every shape
+        self.transforms = np.zeros((0, 4, 4))  # world transforms, robots' are brought up to date by update
+        self.robots = []  # (robot, owner, shapes, links, offsets)
+        self.fleets = []  # (fleet, first owner, shapes, template, tilt)
+        self.owner_count = 0
+        self.cell = None  # of the broad phase's grid, None picks one from the sizes of the shapes
+
+    def add(self, descriptions, owners, names):
+        # appends shapes, returns the range of their indices
+        start = len(self.kinds)
+        self.kinds = np.concatenate((self.kinds, [KINDS[d["shape"]] for d in descriptions])).astype(np.int64)
+        self.halves = np.concatenate((self.halves, np.array([half_extents(d) for d in descriptions]).reshape(-1, 3)))
+        self.owners = np.concatenate((self.owners, owners)).astype(np.int64)
+        self.names += names
+        self.transforms = np.concatenate((self.transforms, np.tile(np.identity(4), (len(descriptions), 1, 1))))
+        return slice(start, len(self.kinds))
+
+    def collision_shapes(self, robot):
+        # (link index, description, offset) of the collision shapes of a robot's links
+        return [(i, description, offset) for i, link in enumerate(robot.kinematics.links)
+                for description, offset in link.collisions]
+
+    def add_robot(self, robot):
+        # returns the owner id of the robot's shapes
+        owner = self.owner_count
+        self.owner_count += 1
+        shapes = self.collision_shapes(robot)
+        rows = self.add([description for _, description, _ in shapes], [owner] * len(shapes),
+                        [robot.kinematics.links[i].name for i, _, _ in shapes])
+        links = np.array([i for i, _, _ in shapes], dtype=np.int64)
+        offsets = np.array([offset for _, _, offset in shapes]).reshape(-1, 4, 4)
+        self.robots.append((robot, owner, rows, links, offsets))
+        return owner
+
+    def add_fleet(self, fleet, robot):
+        # every robot of the fleet gets the collision shapes of robot, placed like Robot.set_pose places
+        # the base link, returns the owner id of the fleet's first robot, the others follow in order
+        owner = self.owner_count
+        self.owner_count += fleet.count
+        robot.kinematics.update()
+        shapes = self.collision_shapes(robot)
+        # shapes relative to the base link, the wheels' rotation does not change their cylinders
+        base = np.linalg.inv(robot.kinematics.worlds[0])
+        template = np.array([offset @ robot.kinematics.worlds[i] @ base for i, _, offset in shapes]).reshape(-1, 4, 4)
+        roll, pitch, _ = robot.base_link.rpy
+        tilt = pyrr.matrix44.create_from_eulers(eulers=[pitch, roll, 0.0])[:3, :3]
+        names = [robot.kinematics.links[i].name for i, _, _ in shapes]
+        rows = self.add([description for _, description, _ in shapes] * fleet.count,
+                        np.repeat(np.arange(owner, owner + fleet.count), len(shapes)), names * fleet.count)
+        self.fleets.append((fleet, owner, rows, template, tilt))
+        return owner
+
+    def add_obstacle(self, description, name="obstacle"):
+        # static shape, description like a <collision> read by urdf_loader, the origin in world (URDF) axes
+        rows = self.add([description], [-1], [name])
+        self.transforms[rows] = origin_matrix(description["xyz"], description["rpy"])
+        return rows.start
+
+    def update(self):
+        # world transforms of the shapes of robots and fleets at their current poses
+        for robot, _, rows, links, offsets in self.robots:
+            robot.kinematics.update()
+            self.transforms[rows] = offsets @ robot.kinematics.worlds[links]
+        for fleet, _, rows, template, tilt in self.fleets:
+            poses = pose_matrices(fleet.x, fleet.y, fleet.theta, tilt)
+            self.transforms[rows] = (template[None] @ poses[:, None]).reshape(-1, 4, 4)
+
+    def bounds(self):
+        # (n, 3) lower and upper corners of the world space boxes around the shapes
+        rotations = self.transforms[:, :3, :3]
+        centers = self.transforms[:, 3, :3]
+        extents = np.einsum("nij,ni->nj", np.abs(rotations), self.halves)
+        # tighter boxes around spheres and cylinders
+        spheres = self.kinds == SPHERE
+        extents[spheres] = self.halves[spheres, :1]
+        cylinders = self.kinds == CYLINDER
+        axes = np.abs(rotations[cylinders, 1])
+        extents[cylinders] = (self.halves[cylinders, 1:2] * axes
+                              + self.halves[cylinders, :1] * np.sqrt(np.maximum(0.0, 1.0 - axes ** 2)))
+        return centers - extents, centers + extents
+
+    def candidate_pairs(self):
+        # broad phase, pairs of shapes of different owners whose boxes overlap
+        lows, highs = self.bounds()
+        first, second = spatial_hash(lows, highs, self.cell, self.owners)
+        # obstacles second
+        swap = self.owners[first] < 0
+        first[swap], second[swap] = second[swap], first[swap]
+        return first, second
+
+    def query(self):
+        # contacts between the shapes at their transforms, update first to move them to the current poses
+        first, second = self.candidate_pairs()
+        found = []
+        for start in range(0, len(first), CHUNK):
+            a, b = first[start:start + CHUNK], second[start:start + CHUNK]
+            normals, depths, points = narrow_phase(self.kinds, self.halves, self.transforms, a, b)
+            touching = depths > 0
+            found.append((a[touching], b[touching], normals[touching], depths[touching], points[touching]))
+        if not found:
+            found.append((first, second, np.zeros((0, 3)), np.zeros(0), np.zeros((0, 3))))
+        a, b, normals, depths, points = (np.concatenate(arrays) for arrays in zip(*found))
+        return Contacts(a, b, self.owners[a], self.owners[b], normals, depths, points)
+
+    def separation(self, contacts):
+        # (owners, 2) URDF x, y displacement that moves every robot out of what it overlaps in the ground plane
+        # two robots share the push, obstacles do not move, pushes of several contacts in the same direction
+        # are not added up, the deepest one is enough
+        pushes = contacts.normals[:, [0, 2]] * contacts.depths[:, None]  # Y and Z axis are swapped
+        share = np.where(contacts.with_obstacles, 1.0, 0.5)[:, None]
+        owners = np.concatenate((contacts.first_owners, contacts.second_owners))
+        pushes = np.concatenate((-pushes * share, pushes * share))
+        moved = owners >= 0
+        owners, pushes = owners[moved], pushes[moved]
+        largest = np.zeros((self.owner_count, 2))
+        smallest = np.zeros((self.owner_count, 2))
+        np.maximum.at(largest, owners, pushes)
+        np.minimum.at(smallest, owners, pushes)
+        return largest + smallest
+
+    def separate(self, contacts):
+        # pushes robots and fleets out of the contacts
+        displacement = self.separation(contacts)
+        for robot, owner, _, _, _ in self.robots:
+            dx, dy = displacement[owner]
+            if dx or dy:
+                robot.set_pose(robot.base_link.xyz[0] + dx, robot.base_link.xyz[1] + dy, robot.theta)
+        for fleet, owner, _, _, _ in self.fleets:
+            fleet.x += displacement[owner:owner + fleet.count, 0]
+            fleet.y += displacement[owner:owner + fleet.count, 1]
+
+    def step(self):
+        # contacts at the current poses, the robots are then pushed out of them
+        self.update()
+        contacts = self.query()
+        self.separate(contacts)
+        return contacts
+
+
+def spatial_hash(lows, highs, cell=None, groups=None):
+    # pairs of overlapping boxes, boxes are entered into every cell of a uniform grid they touch and paired
+    # with the others in the same cells, cell - edge length, by default twice the typical box
+    # groups - (n,) boxes of the same group are never paired
+    # unlike sorting along one axis this stays linear for robots lined up in rows and columns
+    n = len(lows)
+    if cell is None:
+        cell = 2 * np.median((highs - lows).max(axis=1)) if n else 1.0
+        cell = cell if cell > 0 else 1.0
+    lo = np.floor(lows / cell).astype(np.int64)
+    spans = np.floor(highs / cell).astype(np.int64) - lo + 1
+    counts = spans.prod(axis=1)
+    boxes = np.repeat(np.arange(n), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    sx, sy = spans[boxes, 0], spans[boxes, 1]
+    cells = lo[boxes] + np.stack((k % sx, k // sx % sy, k // (sx * sy)), axis=1)
+    # cells far apart may share a key, their boxes are told apart by the overlap test
+    keys = cells @ np.array([73856093, 19349663, 83492791], dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys, boxes, cells = keys[order], boxes[order], cells[order]
+
+    # every entry is paired with the ones after it in the same cell
+    ends = np.searchsorted(keys, keys, side="right")
+    counts = ends - np.arange(1, len(keys) + 1)
+    entries = np.repeat(np.arange(len(keys)), counts)
+    second = entries + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    first, second = boxes[entries], boxes[second]
+    if groups is not None:
+        keep = groups[first] != groups[second]
+        first, second, entries = first[keep], second[keep], entries[keep]
+    for axis in range(3):
+        low, high = lows[:, axis], highs[:, axis]
+        keep = (low[first] <= high[second]) & (low[second] <= high[first])
+        first, second, entries = first[keep], second[keep], entries[keep]
+    # boxes sharing several cells are paired once, in the cell of the corner where their overlap starts
+    corner = np.floor(np.maximum(lows[first], lows[second]) / cell).astype(np.int64)
+    once = (corner == cells[entries]).all(axis=1)
+    return first[once], second[once]
+
+
+def narrow_phase(kinds, halves, transforms, first, second):
+    # separating axis test of pairs of shapes, returns (n, 3) normals from the first shape to the second,
+    # (n,) overlaps along them (negative - apart) and (n, 3) contact points
+    # axes tried are the shapes' own axes, their cross products, the line between the centers and the lines
+    # from each center to the closest point of the other shape, exact for boxes and spheres, near the rims
+    # of cylinders a pair may be reported touching a little before it does
+    ra, rb = transforms[first, :3, :3], transforms[second, :3, :3]
+    ca, cb = transforms[first, 3, :3], transforms[second, 3, :3]
+    d = cb - ca
+    qa = closest_points(kinds[first], ra, ca, halves[first], cb)
+    qb = closest_points(kinds[second], rb, cb, halves[second], ca)
+    axes = np.concatenate((ra, rb, np.cross(ra[:, :, None], rb[:, None]).reshape(-1, 9, 3),
+                           d[:, None], (qb - ca)[:, None], (cb - qa)[:, None]), axis=1)
+    lengths = np.linalg.norm(axes, axis=2)
+    valid = lengths > 1e-9  # cross products of parallel axes and lines between touching points
+    axes /= np.where(valid, lengths, 1.0)[..., None]
+    distances = (axes @ d[:, :, None])[..., 0]
+    overlaps = (support_radii(kinds[first], ra, halves[first], axes)
+                + support_radii(kinds[second], rb, halves[second], axes) - np.abs(distances))
+    overlaps[~valid] = np.inf
+    best = np.argmin(overlaps, axis=1)
+    rows = np.arange(len(first))
+    normals = axes[rows, best] * np.where(distances[rows, best] < 0, -1.0, 1.0)[:, None]
+    return normals, overlaps[rows, best], (qa + qb) / 2
+
+
+def support_radii(kinds, rotations, halves, axes):
+    # (n, k) half widths of shapes projected onto unit axes (n, k, 3)
+    dots = np.abs(axes @ rotations.transpose(0, 2, 1))
+    box = (dots * halves[:, None, :]).sum(axis=2)
+    along = dots[..., 1]
+    cylinder = halves[:, None, 0] * np.sqrt(np.maximum(0.0, 1.0 - along ** 2)) + halves[:, None, 1] * along
+    sphere = np.broadcast_to(halves[:, None, 0], box.shape)
+    return np.select([kinds[:, None] == SPHERE, kinds[:, None] == CYLINDER], [sphere, cylinder], box)
+
+
+def closest_points(kinds, rotations, centers, halves, points):
+    # (n, 3) points of shapes closest to points, the points themselves when they are inside
+    local = (rotations @ (points - centers)[:, :, None])[..., 0]
+    box = np.clip(local, -halves, halves)
+    length = np.linalg.norm(local, axis=1)
+    sphere = local * np.minimum(1.0, halves[:, 0] / np.maximum(length, 1e-12))[:, None]
+    cylinder = local.copy()
+    radial = np.linalg.norm(local[:, [0, 2]], axis=1)
+    cylinder[:, [0, 2]] *= np.minimum(1.0, halves[:, 0] / np.maximum(radial, 1e-12))[:, None]
+    cylinder[:, 1] = np.clip(local[:, 1], -halves[:, 1], halves[:, 1])
+    local = np.select([kinds[:, None] == SPHERE, kinds[:, None] == CYLINDER], [sphere, cylinder], box)
+    return (local[:, None, :] @ rotations)[:, 0] + centers
@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+
+# a controller for a robot served by ControlServer, and a latency test against a running window
+# python3 main.py differential_drive.xacro --serve 127.0.0.1:5555
+# python3 control_client.py [ADDRESS] [--count N] [--batch N] [--rate HZ]
+
+import socket
+import sys
+import time
+
+import numpy as np
+
+from control_server import (ACK, ACK_PAYLOAD, DEFAULT_ADDRESS, ERROR, FRAME, JOINT, RATE, SPEED, SUBSCRIBE,
+                            TELEMETRY, encode_commands, frame, parse_address, telemetry_struct)
+
+
+class ControlClient:
+    # blocking, frames are read only while waiting for an acknowledgement or in read
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=5.0):
+        transport, endpoint = parse_address(address)
+        if transport == "unix":
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(endpoint)
+        else:
+            self.socket = socket.create_connection(endpoint)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # commands are small
+        self.socket.settimeout(timeout)
+        self.buffer = bytearray()
+        self.sequence = 0
+        self.acks = {}  # sequence -> time.monotonic() the server applied the batch at
+        self.errors = []
+        self.state = None  # t, x, y, theta, wheel speeds of the last telemetry frame
+        self.telemetry_frames = 0
+        self.telemetry = None
+
+    def send(self, commands):
+        # commands - (SPEED, wheel, [speed]) or (JOINT, wheel, [roll, pitch, yaw]), applied together
+        # returns the sequence number acknowledged once they are applied
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        self.socket.sendall(encode_commands(self.sequence, commands))
+        return self.sequence
+
+    def set_speeds(self, speeds):
+        return self.send([(SPEED, wheel, [speed]) for wheel, speed in enumerate(speeds)])
+
+    def set_joints(self, angles):
+        return self.send([(JOINT, wheel, pry) for wheel, pry in enumerate(angles)])
+
+    def subscribe(self, rate):
+        # telemetry frames per second, 0 stops them
+        self.socket.sendall(frame(SUBSCRIBE, RATE.pack(rate)))
+
+    def receive(self, size):
+        while len(self.buffer) < size:
+            data = self.socket.recv(65536)
+            if not data:
+                raise ConnectionError("the server closed the connection")
+            self.buffer += data
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read(self):
+        # one frame, returns its type
+        length, kind = FRAME.unpack(self.receive(FRAME.size))
+        payload = self.receive(length)
+        if kind == ACK:
+            sequence, applied = ACK_PAYLOAD.unpack(payload)
+            self.acks[sequence] = applied
+        elif kind == TELEMETRY:
+            if self.telemetry is None or self.telemetry.size != length:
+                self.telemetry = telemetry_struct((length - 32) // 8)
+            values = self.telemetry.unpack(payload)
+            self.state = values[:4] + (values[4:],)
+            self.telemetry_frames += 1
+        elif kind == ERROR:
+            self.errors.append(payload.decode("utf-8"))
+        return kind
+
+    def wait(self, sequence):
+        # time.monotonic() the batch was applied at
+        while sequence not in self.acks:
+            if self.read() == ERROR:
+                raise ValueError(self.errors[-1])
+        return self.acks.pop(sequence)
+
+    def close(self):
+        self.socket.close()
+
+
+def measure(client, count, batch, wheels=2):
+    # sends count batches one after the other, each waits for its acknowledgement
+    # returns round trips and times from sending to being applied, in seconds
+    round_trips = np.empty(count)
+    to_applied = np.empty(count)
+    for i in range(count):
+        commands = [(SPEED, j % wheels, [np.sin(i / 50) * 3]) for j in range(batch)]
+        sent = time.monotonic()
+        start = time.perf_counter()
+        applied = client.wait(client.send(commands))
+        round_trips[i] = time.perf_counter() - start
+        to_applied[i] = applied - sent  # the server is on the same machine
+    return round_trips, to_applied
+
+
+def summary(name, seconds):
+    p50, p99, worst = np.percentile(seconds, [50, 99, 100]) * 1e3
+    return f"{name}: median {p50:.3f} ms, p99 {p99:.3f} ms, max {worst:.3f} ms"
+
+
+def main():
+    address, count, batch, rate = DEFAULT_ADDRESS, 2000, 2, 100.0
+    args = sys.argv[1:]
+    while args:
+        arg = args.pop(0)
+        if arg in ("--count", "--batch", "--rate") and args:
+            value = args.pop(0)
+            if arg == "--count":
+                count = int(value)
+            elif arg == "--batch":
+                batch = int(value)
+            else:
+                rate = float(value)
+        elif not arg.startswith("--"):
+            address = arg
+        else:
+            sys.exit(f"unknown option {arg}")
+
+    client = ControlClient(address)
+    client.subscribe(rate)
+    start = time.perf_counter()
+    round_trips, to_applied = measure(client, count, batch)
+    elapsed = time.perf_counter() - start
+    print(f"{count} batches of {batch} commands to {address}")
+    print(summary("round trip", round_trips))
+    print(summary("sent to applied", to_applied))
+    print(f"telemetry: {client.telemetry_frames / elapsed:.1f} frames/s of {rate:g} asked, last {client.state}")
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import asyncio
+import collections
+import os
+import struct
+import threading
+import time
+
+# no OpenGL or Qt imports here, the server runs next to any loop that owns the robot
+# every frame is the length of its payload (uint32), its type (uint8) and the payload, all little endian
+FRAME = struct.Struct("<IB")
+MAX_PAYLOAD = 1 << 20
+# client -> server
+COMMANDS = 1  # uint32 sequence number, then any number of COMMAND records applied together
+SUBSCRIBE = 2  # float64 telemetry rate in Hz, 0 stops it
+# server -> client
+ACK = 3  # uint32 sequence number, float64 time.monotonic() the batch was applied at
+TELEMETRY = 4  # float64 simulation time, x, y, theta, then float64 speed of every wheel
+ERROR = 5  # UTF-8 message, the batch or frame it is about is ignored
+
+SEQUENCE = struct.Struct("<I")
+# kind, wheel index, values - SPEED uses the first one, JOINT sets roll, pitch, yaw
+COMMAND = struct.Struct("<BHddd")
+SPEED, JOINT = 0, 1
+RATE = struct.Struct("<d")
+ACK_PAYLOAD = struct.Struct("<Id")
+DEFAULT_ADDRESS = "127.0.0.1:5555"
+
+
+class ServerError(RuntimeError):
+    pass
+
+
+def frame(kind, payload=b""):
+    return FRAME.pack(len(payload), kind) + payload
+
+
+def encode_commands(sequence, commands):
+    # commands - (kind, wheel, values) with one value for SPEED and three for JOINT
+    payload = [SEQUENCE.pack(sequence)]
+    for kind, wheel, values in commands:
+        values = tuple(values) + (0.0,) * (3 - len(values))
+        payload.append(COMMAND.pack(kind, wheel, *values))
+    return frame(COMMANDS, b"".join(payload))
+
+
+def telemetry_struct(wheels):
+    return struct.Struct(f"<4d{wheels}d")
+
+
+def parse_address(address):
+    # "unix:/path/to/socket", "host:port" or ":port" (localhost)
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    if not port.isdigit():
+        raise ServerError(f"address {address!r} is neither unix:PATH nor HOST:PORT")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+class ControlServer:
+    # wheel speed and joint commands from external controllers and pose telemetry back to them, served by an
+    # asyncio event loop on a thread of its own so that commands are taken in while the owner of the robot
+    # (the window or a simulation loop) is busy drawing
+    # commands are queued and applied by the owner calling apply, which then acknowledges them,
+    # telemetry sends the state the owner last passed to publish
+    def __init__(self, wheels, address=DEFAULT_ADDRESS):
+        # wheels - number of wheels of the robot commands are checked against
+        self.wheels = wheels
+        self.transport, self.endpoint = parse_address(address)
+        self.telemetry = telemetry_struct(wheels)
+        self.pending = collections.deque()  # (sequence, commands, writer), appended by the server thread
+        self.state = None  # packed TELEMETRY frame of the last published state
+        self.loop = None
+        self.thread = None
+        self.connections = {}  # writer -> task handling the controller, closed and cancelled by stop
+        self.ready = threading.Event()
+        self.error = None
+        self.received = 0  # command batches taken in
+        self.applied = 0
+
+    def start(self):
+        # returns once the server listens, raises ServerError when it can not
+        self.thread = threading.Thread(target=self.run, name="control server", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise ServerError(f"can not serve on {self.endpoint}: {self.error}")
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        if self.transport == "unix":
+            if os.path.exists(self.endpoint):
+                os.unlink(self.endpoint)  # left over by a server that was not stopped
+            server = await asyncio.start_unix_server(self.handle, self.endpoint)
+        else:
+            server = await asyncio.start_server(self.handle, *self.endpoint)
+            self.endpoint = server.sockets[0].getsockname()[:2]  # the port taken when asked for port 0
+        self.ready.set()
+        async with server:
+            await self.stopping.wait()
+            # the server waits for open connections when it is closed, handlers are blocked reading them
+            for writer, task in list(self.connections.items()):
+                writer.close()
+                task.cancel()
+            await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        if self.transport == "unix" and os.path.exists(self.endpoint):
+            os.unlink(self.endpoint)
+
+    @property
+    def address(self):
+        # to connect to, also when the server was asked for port 0
+        if self.transport == "unix":
+            return f"unix:{self.endpoint}"
+        return f"{self.endpoint[0]}:{self.endpoint[1]}"
+
+    def stop(self):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.stopping.set)
+            self.thread.join()
+
+    async def handle(self, reader, writer):
+        # one connected controller
+        telemetry = None
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                length, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+                if length > MAX_PAYLOAD:
+                    writer.write(frame(ERROR, f"frame of {length} bytes is too long".encode("utf-8")))
+                    break
+                payload = await reader.readexactly(length)
+                if kind == COMMANDS:
+                    self.take_commands(payload, writer)
+                elif kind == SUBSCRIBE and length == RATE.size:
+                    rate, = RATE.unpack(payload)
+                    if telemetry is not None:
+                        telemetry.cancel()
+                    telemetry = asyncio.create_task(self.send_telemetry(writer, rate)) if rate > 0 else None
+                else:
+                    writer.write(frame(ERROR, f"unknown frame type {kind} of {length} bytes".encode("utf-8")))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # the controller disconnected
+        except asyncio.CancelledError:
+            pass  # the server is stopping
+        finally:
+            if telemetry is not None:
+                telemetry.cancel()
+                await asyncio.gather(telemetry, return_exceptions=True)
+            writer.close()
+            del self.connections[writer]
+
+    def take_commands(self, payload, writer):
+        # checks a batch and queues it for the owner, nothing of a bad batch is applied
+        if len(payload) < SEQUENCE.size or (len(payload) - SEQUENCE.size) % COMMAND.size:
+            writer.write(frame(ERROR, b"commands of a wrong size"))
+            return
+        sequence, = SEQUENCE.unpack_from(payload)
+        commands = list(COMMAND.iter_unpack(payload[SEQUENCE.size:]))
+        for kind, wheel, *_ in commands:
+            if kind not in (SPEED, JOINT) or wheel >= self.wheels:
+                writer.write(frame(ERROR, f"batch {sequence}: bad command {kind} for wheel {wheel}".encode("utf-8")))
+                return
+        self.received += 1
+        self.pending.append((sequence, commands, writer))
+
+    async def send_telemetry(self, writer, rate):
+        # the last published state at a fixed rate, a slow controller gets fewer frames, not old ones
+        period = 1 / rate
+        next_time = self.loop.time()
+        while not writer.is_closing():
+            if self.state is not None:
+                writer.write(self.state)
+                await writer.drain()
+            next_time = max(next_time + period, self.loop.time())
+            await asyncio.sleep(next_time - self.loop.time())
+
+    def apply(self, robot):
+        # called by the owner of the robot, applies the queued batches in order and acknowledges them
+        # returns the number of batches applied
+        applied = 0
+        while self.pending:
+            sequence, commands, writer = self.pending.popleft()
+            for kind, wheel, a, b, c in commands:
+                joint = robot.wheels[wheel]
+                if kind == SPEED:
+                    joint.update_j_rotation(joint.angles, a)
+                else:
+                    joint.update_j_rotation([a, b, c], joint.speed)
+            self.loop.call_soon_threadsafe(writer.write, frame(ACK, ACK_PAYLOAD.pack(sequence, time.monotonic())))
+            applied += 1
+        self.applied += applied
+        return applied
+
+    def publish(self, t, robot):
+        # state sent by telemetry from now on, called by the owner of the robot
+        self.state = frame(TELEMETRY, self.telemetry.pack(t, robot.base_link.xyz[0], robot.base_link.xyz[1],
+                                                          robot.theta, *(wheel.speed for wheel in robot.wheels)))
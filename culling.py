@@ -0,0 +1,52 @@
+import numpy as np
+
+
+class Frustum:
+    # the six planes of a camera's view volume, taken from its view and projection matrices
+    # (pyrr row vector matrices, as stored in FrameUniforms), a point p is inside a plane when n.p + d >= 0
+    def __init__(self, view, projection, height=None):
+        # height - of the viewport in pixels, for sizes on screen
+        self.view = np.array(view, dtype=np.float64)
+        self.projection = np.array(projection, dtype=np.float64)
+        self.height = height
+        # clip = p @ view @ projection, the plane equations are sums of the columns of the combined matrix
+        clip = (self.view @ self.projection).T
+        planes = np.array([
+            clip[3] + clip[0],  # left
+            clip[3] - clip[0],  # right
+            clip[3] + clip[1],  # bottom
+            clip[3] - clip[1],  # top
+            clip[3] + clip[2],  # near
+            clip[3] - clip[2],  # far
+        ])
+        # normalized, so distances to the planes are in world units
+        self.planes = planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+    def __eq__(self, other):
+        return isinstance(other, Frustum) and self.height == other.height and np.array_equal(self.planes, other.planes)
+
+    def spheres_visible(self, centers, radii):
+        # (n,) bool, spheres that are at least partly inside, conservative near the frustum's corners
+        distances = centers @ self.planes[:, :3].T + self.planes[:, 3]
+        return (distances >= -np.asarray(radii)[:, None]).all(axis=1)
+
+    def screen_sizes(self, centers, radii):
+        # (n,) diameters of spheres on screen in pixels, infinite without a viewport height
+        # and for spheres around or behind the camera
+        if self.height is None:
+            return np.full(len(centers), np.inf)
+        depths = -(centers @ self.view[:3, 2] + self.view[3, 2])  # the camera looks along -z
+        with np.errstate(divide="ignore"):
+            sizes = radii * self.projection[1, 1] * self.height / depths
+        return np.where(depths > radii, sizes, np.inf)
+
+
+def world_spheres(models, sphere):
+    # a model space bounding sphere (center, radius) placed by (n, 4, 4) model matrices, scale included
+    # returns (n, 3) centers and (n,) radii
+    center, radius = sphere
+    models = np.asarray(models, dtype=np.float64)
+    centers = np.append(center, 1.0) @ models
+    # radius grows with the largest axis scale of every model
+    scales = np.linalg.norm(models[:, :3, :3], axis=2).max(axis=1)
+    return centers[:, :3], radius * scales
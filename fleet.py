@@ -0,0 +1,77 @@
+import math
+import numpy as np
+
+# no OpenGL or Qt imports here, fleets run headless
+
+
+class Fleet:
+    # many differential drive robots stored as arrays (structure of arrays)
+    # all of them are stepped at once with the same kinematics as Robot.move
+
+    def __init__(self, count, wheel_radius=0.1, wheel_separation=0.25, x=0.0, y=0.0, theta=0.0):
+        self.count = count
+        # pose in the ground plane
+        self.x = np.full(count, x, dtype=np.float64)
+        self.y = np.full(count, y, dtype=np.float64)
+        self.theta = np.full(count, theta, dtype=np.float64)
+        # [left, right] wheel speeds and radii, in the order of Robot.wheels
+        self.speeds = np.zeros((count, 2))
+        self.wheel_radii = np.empty((count, 2))
+        self.wheel_radii[:] = wheel_radius  # scalar, [r1, r2] or one pair per robot
+        self.wheel_separation = np.empty(count)
+        self.wheel_separation[:] = wheel_separation
+
+        # preallocated temporaries, a step does not allocate new arrays
+        self.wheel_step = np.empty((count, 2))
+        self.forward_step = np.empty(count)
+        self.omega_step = np.empty(count)
+        self.tmp = np.empty(count)
+
+    @classmethod
+    def from_robot(cls, robot, count):
+        # fleet of copies of a two wheeled Robot, all starting at its current pose
+        if robot.number_of_wheels != 2:
+            raise ValueError("fleet needs differential drive robots (2 wheels)")
+        wheel1, wheel2 = robot.wheels
+        separation = math.dist(wheel1.xyz, wheel2.xyz)
+        fleet = cls(count, [wheel1.child.radius, wheel2.child.radius], separation,
+                    robot.base_link.xyz[0], robot.base_link.xyz[1], robot.theta)
+        fleet.speeds[:] = [wheel1.speed, wheel2.speed]
+        return fleet
+
+    def set_speeds(self, speeds):
+        # (count, 2) or (2,) wheel speeds
+        self.speeds[:] = speeds
+
+    def step(self, dt=1.0):
+        # one Euler step for every robot, dt=1 is exactly one call of Robot.move
+        # each wheel's contribution, radius * speed
+        np.multiply(self.wheel_radii, self.speeds, out=self.wheel_step)
+        if dt != 1.0:
+            self.wheel_step *= dt
+        left = self.wheel_step[:, 0]
+        right = self.wheel_step[:, 1]
+
+        # movement in the robot's local frame, 0.5 * r1 * w1 + 0.5 * r2 * w2
+        np.multiply(0.5, left, out=self.forward_step)
+        np.multiply(0.5, right, out=self.tmp)
+        self.forward_step += self.tmp
+
+        # rotation, r1 * w1 / d - r2 * w2 / d
+        np.divide(left, self.wheel_separation, out=self.omega_step)
+        np.divide(right, self.wheel_separation, out=self.tmp)
+        self.omega_step -= self.tmp
+
+        # local -> global frame
+        np.cos(self.theta, out=self.tmp)
+        self.tmp *= self.forward_step
+        self.x += self.tmp
+        np.sin(self.theta, out=self.tmp)
+        self.tmp *= self.forward_step
+        self.y += self.tmp
+        self.theta += self.omega_step
+        np.remainder(self.theta, math.radians(360), out=self.theta)
+
+    def poses(self):
+        # (count, 3) array of x, y, theta
+        return np.stack((self.x, self.y, self.theta), axis=1)
@@ -0,0 +1,120 @@
+from OpenGL.GL import *
+import numpy as np
+import ctypes
+
+
+class Framebuffer:
+    # color (RGBA8) and depth renderbuffers of one size to draw into instead of a window, bind() before drawing
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        self.color, self.depth = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            self.destroy()
+            raise RuntimeError(f"framebuffer incomplete: 0x{status:x}")
+
+    def bind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.width, self.height)
+
+    def read(self):
+        # (height, width, 3) uint8 image, first row at the top, waits for drawing to finish
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        pixels = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        glPixelStorei(GL_PACK_ALIGNMENT, 4)
+        return np.frombuffer(pixels, dtype=np.uint8).reshape(self.height, self.width, 3)[::-1]
+
+    def destroy(self):
+        glDeleteFramebuffers(1, (self.fbo,))
+        glDeleteRenderbuffers(2, (self.color, self.depth))
+
+
+class ReadbackRing:
+    # reads framebuffers back through a ring of pixel buffer objects without waiting for the GPU,
+    # the copy of frame N into a buffer runs while frame N + 1 is drawn, its pixels are mapped only
+    # when the buffer comes up for reuse (size frames later)
+    def __init__(self, width, height, size=3):
+        self.width = width
+        self.height = height
+        self.nbytes = width * height * 4  # RGBA rows need no alignment padding
+        self.buffers = [int(buffer) for buffer in np.atleast_1d(glGenBuffers(size))]
+        for buffer in self.buffers:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.nbytes, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.fences = [None] * size  # set while a buffer holds a read that was not collected
+        self.tags = [None] * size
+        self.next = 0
+
+    def read(self, framebuffer, tag=None, out=None):
+        # starts reading the framebuffer, returns (tag, image) of the read whose buffer is reused,
+        # None while the ring is filling up
+        # out - function tag -> array to copy the returned image into
+        i = self.next
+        finished = None
+        if self.fences[i] is not None:
+            finished = self.collect(i, None if out is None else out(self.tags[i]))
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, framebuffer.fbo)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[i])
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.fences[i] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.tags[i] = tag
+        self.next = (i + 1) % len(self.buffers)
+        return finished
+
+    def flush(self):
+        # (tag, image) of every read not collected yet, oldest first
+        for i in self.in_flight():
+            yield self.collect(i)
+
+    def poll(self, out=None):
+        # (tag, image) of the reads the GPU has finished, oldest first, without waiting for the others
+        # out - function tag -> array to copy the image into
+        for i in self.in_flight():
+            if glClientWaitSync(self.fences[i], 0, 0) not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                break
+            tag = self.tags[i]
+            yield self.collect(i, None if out is None else out(tag))
+
+    def in_flight(self):
+        # buffers holding reads that were not collected, oldest first
+        for k in range(len(self.buffers)):
+            i = (self.next + k) % len(self.buffers)
+            if self.fences[i] is not None:
+                yield i
+
+    def collect(self, i, out=None):
+        # (height, width, 3) uint8 image of buffer i, first row at the top, copied into out when given
+        glClientWaitSync(self.fences[i], GL_SYNC_FLUSH_COMMANDS_BIT, GL_TIMEOUT_IGNORED)
+        glDeleteSync(self.fences[i])
+        self.fences[i] = None
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[i])
+        address = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.nbytes, GL_MAP_READ_BIT)
+        pixels = np.ctypeslib.as_array((ctypes.c_ubyte * self.nbytes).from_address(address))
+        pixels = pixels.reshape(self.height, self.width, 4)[::-1, :, :3]
+        # copied before unmapping
+        if out is None:
+            out = pixels.copy()
+        else:
+            np.copyto(out, pixels)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        return self.tags[i], out
+
+    def destroy(self):
+        for fence in self.fences:
+            if fence is not None:
+                glDeleteSync(fence)
+        self.fences = [None] * len(self.buffers)
+        glDeleteBuffers(len(self.buffers), self.buffers)
@@ -8,8 +8,8 @@ class Joint:
         self.joint_type = joint_type
         self.parent = parent
         self.child = child
-        self.xyz = [float(x) for x in xyz.split(" ")]
-        self.rpy = [float(x) for x in rpy.split(" ")]
+        self.xyz = [float(x) for x in xyz.split()]
+        self.rpy = [float(x) for x in rpy.split()]
         self.position = pyrr.matrix44.create_from_translation(
             pyrr.Vector3([self.xyz[0], self.xyz[2], self.xyz[1]])
         )  # Y and Z axis are swapped
@@ -17,13 +17,19 @@ class Joint:
             eulers=[self.rpy[1], self.rpy[0], self.rpy[2]]
         )
         self.speed = 0
+        self.angles = [0.0, 0.0, 0.0]  # roll, pitch, yaw last set by update_j_rotation
+        self.on_change = None  # set by the robot's kinematics
 
     def update_j_rotation(self, pry, speed):
         # updates joint rotation and sets rotation speed
         self.rotation = pyrr.matrix44.create_from_eulers(
             eulers=[pry[0], pry[1], pry[2]]
         )
+        self.angles = [float(angle) for angle in pry]
         self.speed = speed
+        # cached world transforms of the child subtree are out of date
+        if self.on_change is not None:
+            self.on_change()
 
     def describe(self):
         # print(f"Joint(name, type, parent, child, xyz, rpy):\n{self.name}, {self.joint_type}, {self.parent.name}, "
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+class Kinematics:
+    # forward kinematics of a robot's link tree
+    # transforms are stored as (N, 4, 4) arrays with parents before their children, world transforms
+    # are recomputed level by level with batched matmuls and only for subtrees that changed
+    def __init__(self, base_link):
+        self.links = []
+        self.joints = []  # joint connecting a link to its parent, None for the base link
+        parents = []
+        depths = []
+        self.walk(base_link, parents, depths)
+        n = len(self.links)
+        self.parents = np.array(parents, dtype=np.int64)
+
+        # a subtree is a contiguous range [i, subtree_end[i]) in this order
+        self.subtree_end = np.arange(1, n + 1)
+        for i in range(n - 1, 0, -1):
+            parent = self.parents[i]
+            self.subtree_end[parent] = max(self.subtree_end[parent], self.subtree_end[i])
+
+        # links grouped by depth, every group only depends on the one before it
+        depths = np.array(depths)
+        order = np.argsort(depths, kind="stable")
+        self.levels = np.split(order, np.cumsum(np.bincount(depths))[:-1])
+
+        self.locals = np.zeros((n, 4, 4))  # link's rotation and position
+        self.joint_locals = np.tile(np.identity(4), (n, 1, 1))  # joint's rotation and position
+        self.scales = np.array([link.get_scale() for link in self.links], dtype=np.float64)
+        self.worlds = np.zeros((n, 4, 4))  # without the link's scale, children are placed relative to it
+        self.models = np.zeros((n, 4, 4))  # with the link's scale, what gets drawn
+        self.normals = np.zeros((n, 3, 3))
+
+        self.changed = np.ones(n, dtype=bool)  # local transforms that have to be read again
+        self.dirty = np.ones(n, dtype=bool)  # world transforms that have to be recomputed
+        self.version = 0  # counts updates that moved something, for users that copy the transforms
+
+        for i, link in enumerate(self.links):
+            link.on_change = self.link_changed(i)
+            if self.joints[i] is not None:
+                self.joints[i].on_change = self.link_changed(i)
+
+    def walk(self, base_link, parents, depths):
+        # depth first walk of the joint tree, with a stack so that long chains of links do not
+        # run into the recursion limit
+        pending = [(base_link, -1, None, 0)]
+        while pending:
+            link, parent, joint, depth = pending.pop()
+            index = len(self.links)
+            self.links.append(link)
+            self.joints.append(joint)
+            parents.append(parent)
+            depths.append(depth)
+            # reversed, so children are visited in the order of the link's joints
+            for joint in reversed(link.connected_joints):
+                if joint.child == link:
+                    continue
+                pending.append((joint.child, index, joint, depth + 1))
+
+    def link_changed(self, i):
+        # callback for a link or the joint above it, marks the whole subtree as dirty
+        def mark():
+            self.changed[i] = True
+            self.dirty[i:self.subtree_end[i]] = True
+        return mark
+
+    def update(self):
+        # bring world transforms, model and normal matrices up to date
+        # returns False when nothing moved since the last call
+        if not self.dirty.any():
+            return False
+
+        for i in np.flatnonzero(self.changed):
+            link = self.links[i]
+            np.matmul(link.rotation, link.position, out=self.locals[i])
+            joint = self.joints[i]
+            if joint is not None:
+                np.matmul(joint.rotation, joint.position, out=self.joint_locals[i])
+        self.changed[:] = False
+
+        for depth, level in enumerate(self.levels):
+            level = level[self.dirty[level]]
+            if len(level) == 0:
+                continue
+            if depth == 0:
+                self.worlds[level] = self.locals[level]
+            else:
+                self.worlds[level] = self.locals[level] @ self.joint_locals[level] @ self.worlds[self.parents[level]]
+
+        dirty = np.flatnonzero(self.dirty)
+        self.models[dirty] = self.scales[dirty] @ self.worlds[dirty]
+        self.normals[dirty] = normal_matrices(self.models[dirty])
+        self.dirty[:] = False
+        self.version += 1
+        return True
+
+
+def normal_matrices(models):
+    # matrices that transform normals correctly under non-uniform scale, (N, 4, 4) -> (N, 3, 3)
+    # cofactor of the upper 3x3 block, it equals inverse-transpose up to a scale factor that the
+    # fragment shader normalizes away and it also exists for flattened (zero scale) models
+    m = models[:, :3, :3]
+    cofactor = np.stack((
+        np.cross(m[:, 1], m[:, 2]),
+        np.cross(m[:, 2], m[:, 0]),
+        np.cross(m[:, 0], m[:, 1]),
+    ), axis=1)
+    # keep normals facing out for mirrored models
+    sign = np.where(np.linalg.det(m) < 0, -1.0, 1.0)
+    return cofactor * sign[:, None, None]
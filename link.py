@@ -1,18 +1,27 @@
+import numpy as np
 import pyrr
-import mesh_loader as ml
-from OpenGL.GL import *
+
+
+def origin_matrix(xyz, rpy):
+    # rotation and position of an URDF <origin> ("x y z", "r p y" strings) the way links and joints use them
+    xyz = [float(x) for x in xyz.split()]
+    rpy = [float(x) for x in rpy.split()]
+    rotation = pyrr.matrix44.create_from_eulers(eulers=[rpy[1], rpy[0], rpy[2]])
+    position = pyrr.matrix44.create_from_translation(pyrr.Vector3([xyz[0], xyz[2], xyz[1]]))  # Y and Z swapped
+    return rotation @ position
 
 
 class Link:
     # link parent class
+    model = None  # .obj file the link is drawn with
 
     def __init__(self, name, xyz, rpy, color):
         self.name = name
         self.connected_joints = []
         self.is_base_link = False
-        self.xyz = [float(x) for x in xyz.split(" ")]
-        self.rpy = [float(x) for x in rpy.split(" ")]
-        self.color = [float(x) for x in color.split(" ")]
+        self.xyz = [float(x) for x in xyz.split()]
+        self.rpy = [float(x) for x in rpy.split()]
+        self.color = [float(x) for x in color.split()]
         self.position = pyrr.matrix44.create_from_translation(
             pyrr.Vector3([self.xyz[0], self.xyz[2], self.xyz[1]])
         )  # Y and Z axis are swapped
@@ -24,19 +33,41 @@ class Link:
             eulers=[self.rpy[1], self.rpy[0], self.rpy[2]]
         )
         self.mesh = None
+        self.on_change = None  # set by the robot's kinematics
+        self.collisions = []  # (description, transform relative to the drawn link), set by set_collisions
 
     def update_position(self, x, y, z):
         self.position = pyrr.matrix44.create_from_translation(
             pyrr.Vector3([x, y, z])
         )
+        self.notify_change()
 
     def update_rotation(self, theta):
         self.rotation = pyrr.matrix44.create_from_eulers(
             eulers=[self.rpy[1], self.rpy[0], theta]
         )
+        self.notify_change()
+
+    def set_collisions(self, descriptions):
+        # collision shapes read by urdf_loader, called before the link is moved
+        # the drawn link is placed at its visual origin, collision origins are relative to the link's frame
+        inverse = np.linalg.inv(self.rotation @ self.position)
+        self.collisions = [(description, origin_matrix(description["xyz"], description["rpy"]) @ inverse)
+                           for description in descriptions]
+
+    def notify_change(self):
+        # cached world transforms of this link and everything attached to it are out of date
+        if self.on_change is not None:
+            self.on_change()
+
+    def load_mesh(self, meshes):
+        # links with the same model share one mesh from the registry
+        self.mesh = meshes.acquire(self.model)
 
-    def load_mesh(self):
-        pass
+    def release_mesh(self, meshes):
+        if self.mesh is not None:
+            meshes.release(self.model)
+            self.mesh = None
 
     def describe(self):
         print(f"This is link {self.name}")
@@ -44,26 +75,6 @@ class Link:
     def get_scale(self):
         raise Exception()
 
-    def draw(self, model_location, model_matrix):
-        # draw all links of a robot on screen recursively
-        # print("LINK ", self.name, self.get_scale())
-        model = pyrr.matrix44.multiply(self.position, model_matrix)
-        model = pyrr.matrix44.multiply(self.rotation, model)
-        glUniformMatrix4fv(model_location, 1, GL_FALSE, pyrr.matrix44.multiply(self.get_scale(), model))
-        glBindVertexArray(self.mesh.vao)  # bind the VAO that is being drawn
-        glDrawArrays(GL_TRIANGLES, 0, self.mesh.vertex_count)
-
-        for joint in self.connected_joints:
-            if joint.child == self:
-                continue
-            model2 = pyrr.Matrix44(model)
-            # pridaj joint
-            model2 = pyrr.matrix44.multiply(joint.position, model2)
-            model2 = pyrr.matrix44.multiply(joint.rotation, model2)
-            # pridaj link
-            link = joint.child
-            link.draw(model_location, model2)
-
     def __str__(self):
         return "LINK '" + self.name + "'"
 
@@ -73,6 +84,7 @@ class Link:
 
 class Box(Link):
     # base link, robot's body, as of now - can only be box, also other box links
+    model = "models/cube.obj"
 
     def __init__(self, name, length, width, height, xyz, rpy, color):
         super().__init__(name, xyz, rpy, color)
@@ -82,9 +94,6 @@ class Box(Link):
         self.shape = "box"
         self.scale = pyrr.matrix44.create_from_scale(pyrr.Vector3([length, height, width]))
 
-    def load_mesh(self):
-        self.mesh = ml.MeshLoader("models/cube.obj", self.color)
-
     def describe(self):
         # print(f"Link Box (name, dimensions LWH, shape, xyz, rpy, color):\n{self.name}, {self.length} {self.width} "
         #       f"{self.height}, {self.shape}, {self.xyz}, {self.rpy}, {self.color}\n")
@@ -99,6 +108,7 @@ class Box(Link):
 
 class Cylinder(Link):
     # meant to represent robot's wheels, cylinder shapes
+    model = "models/cylinder.obj"
 
     def __init__(self, name, radius, length, xyz, rpy, color):
         super().__init__(name, xyz, rpy, color)
@@ -107,9 +117,6 @@ class Cylinder(Link):
         self.shape = "cylinder"
         self.scale = pyrr.matrix44.create_from_scale(pyrr.Vector3([2 * self.radius, self.length, 2 * self.radius]))
 
-    def load_mesh(self):
-        self.mesh = ml.MeshLoader("models/cylinder.obj", self.color)
-
     def describe(self):
         # print(f"Link Cylinder (name, radius, length, shape, xyz, rpy,color):\n{self.name}, {self.radius}, {self.length}, "
         #       f"{self.shape}, {self.xyz}, {self.rpy}, {self.color}\n")
@@ -124,6 +131,7 @@ class Cylinder(Link):
 
 class Sphere(Link):
     # class for spherical link, meant to represent omnidirectional wheel
+    model = "models/sphere.obj"
 
     def __init__(self, name, radius, xyz, rpy, color):
         super().__init__(name, xyz, rpy, color)
@@ -131,9 +139,6 @@ class Sphere(Link):
         self.shape = "sphere"
         self.scale = pyrr.matrix44.create_from_scale(pyrr.Vector3([2 * self.radius, 2 * self.radius, 2 * self.radius]))
 
-    def load_mesh(self):
-        self.mesh = ml.MeshLoader("models/sphere.obj", self.color)
-
     def describe(self):
         # print(f"Link Sphere (name, radius, shape, xyz, rpy, color):\n{self.name}, {self.radius}, "
         #       f"{self.shape}, {self.xyz}, {self.rpy}, {self.color}\n")
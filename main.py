@@ -3,13 +3,22 @@
 # run from terminal and have ROS installed
 # source /opt/ros/noetic/setup.bash
 # /usr/bin/python3 main.py differential_drive.xacro
+# /usr/bin/python3 main.py differential_drive.xacro --serve 127.0.0.1:5555  (or --serve unix:/tmp/robot.sock)
+# to take wheel speed and joint commands from external controllers, see control_client.py
 
 from windowQt import Window
 from PyQt6.QtWidgets import QApplication
 import sys
 
 if __name__ == '__main__':
+    serve = None
+    if "--serve" in sys.argv:
+        i = sys.argv.index("--serve")
+        if i + 1 >= len(sys.argv):
+            sys.exit("--serve needs an address, HOST:PORT or unix:PATH")
+        serve = sys.argv[i + 1]
+        del sys.argv[i:i + 2]
     app = QApplication(sys.argv)
-    window = Window()
+    window = Window(serve)
     window.showMaximized()
     app.exec()
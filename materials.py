@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from OpenGL.GL import *
+import os
+
+import texture_loader as tl
+
+# GPU memory textures may use, estimated from their uploaded levels
+TEXTURE_BUDGET = 256 * 2 ** 20
+# RGB8 textures are stored as RGBX by most drivers
+BYTES_PER_TEXEL = 4
+
+# texture unit of every kind of map the fragment shader samples, other maps of a material are not loaded
+TEXTURE_UNITS = {"color": 0}
+
+# maps shipped in textures/ for the road surface
+ROAD_MAPS = {
+    "color": "textures/RoadCityWorn001_COL_3K.jpg",
+    "normal": "textures/RoadCityWorn001_NRM_3K.jpg",
+    "ao": "textures/RoadCityWorn001_AO_3K.jpg",
+    "gloss": "textures/RoadCityWorn001_GLOSS_3K.jpg",
+    "reflection": "textures/RoadCityWorn001_REFL_3K.jpg",
+    "displacement": "textures/RoadCityWorn001_DISP_3K.jpg",
+}
+
+
+class Material:
+    # named set of texture maps, kind -> image file
+    # nothing is loaded until the material is drawn for the first time
+    def __init__(self, name, maps):
+        self.name = name
+        self.maps = maps
+
+    def bind(self, textures):
+        # binds every map the shader samples, placeholders while they are still loading
+        for kind, filepath in self.maps.items():
+            if kind not in TEXTURE_UNITS:
+                continue
+            glActiveTexture(GL_TEXTURE0 + TEXTURE_UNITS[kind])
+            glBindTexture(GL_TEXTURE_2D, textures.use(filepath))
+        glActiveTexture(GL_TEXTURE0)
+
+
+class Texture:
+    # one GL texture and the mip chain it was uploaded from
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.texture = glGenTextures(1)
+        self.levels = None  # full mip chain (memory mapped), None while it loads
+        self.first_level = 0  # largest level uploaded, dropped levels save memory
+        self.bytes = 0
+        self.last_used = -1  # frame
+
+
+class TextureManager:
+    # textures of all materials, loaded on first use and kept within a GPU memory budget
+    # when over budget, textures not drawn in the last frame are evicted (least recently used first),
+    # then textures in use drop their largest mip levels, which are restored once there is room again
+    def __init__(self, assets, budget=TEXTURE_BUDGET, max_size=tl.MAX_SIZE):
+        self.assets = assets
+        self.budget = budget
+        self.max_size = max_size
+        self.textures = OrderedDict()  # path -> Texture, least recently used first
+        self.pending = set()
+        self.resident_bytes = 0
+        self.frame = 0
+
+    def use(self, filepath):
+        # GL texture of an image file for drawing this frame
+        key = os.path.normpath(filepath)
+        texture = self.textures.get(key)
+        if texture is None:
+            texture = self.textures[key] = Texture(key)
+            self.upload(texture, tl.PLACEHOLDER)
+            self.assets.request_texture(key, self.max_size)
+            self.pending.add(key)
+        self.textures.move_to_end(key)
+        texture.last_used = self.frame
+        return texture.texture
+
+    def poll(self):
+        # once per frame with the GL context current - uploads textures that finished loading and
+        # applies the budget, returns True while some textures are still placeholders
+        self.frame += 1
+        for key in list(self.pending):
+            levels = self.assets.take(key)
+            if levels is not None:
+                texture = self.textures[key]
+                texture.levels = levels
+                self.upload(texture, levels)
+                self.pending.discard(key)
+            elif not self.assets.loading(key):
+                self.pending.discard(key)  # failed, stays a placeholder
+        self.enforce_budget()
+        return bool(self.pending)
+
+    def upload(self, texture, levels):
+        tl.upload_texture(texture.texture, levels)
+        self.resident_bytes -= texture.bytes
+        texture.bytes = self.level_bytes(levels)
+        self.resident_bytes += texture.bytes
+
+    def set_first_level(self, texture, first_level):
+        texture.first_level = first_level
+        self.upload(texture, texture.levels[first_level:])
+
+    def enforce_budget(self):
+        self.make_room(0)
+
+        # still over budget with only textures in use, least recently used ones drop levels first
+        for texture in self.textures.values():
+            if texture.levels is None:
+                continue
+            while self.resident_bytes > self.budget and texture.first_level < len(texture.levels) - 1:
+                self.set_first_level(texture, texture.first_level + 1)
+
+        # most recently used first, bring back dropped levels of textures in use when they fit
+        for texture in reversed(list(self.textures.values())):
+            if texture.last_used < self.frame - 1:
+                continue
+            while texture.levels is not None and texture.first_level > 0:
+                larger = self.level_bytes(texture.levels[texture.first_level - 1:])
+                if not self.make_room(larger - texture.bytes):
+                    break
+                self.set_first_level(texture, texture.first_level - 1)
+
+    def make_room(self, needed):
+        # evicts textures not drawn in the last frame, least recently used first, until needed more
+        # bytes fit into the budget, returns False when they do not fit even then
+        for key in list(self.textures):
+            if self.resident_bytes + needed <= self.budget:
+                break
+            texture = self.textures[key]
+            if texture.last_used < self.frame - 1 and key not in self.pending:
+                self.evict(key)
+        return self.resident_bytes + needed <= self.budget
+
+    @staticmethod
+    def level_bytes(levels):
+        return sum(level.shape[0] * level.shape[1] for level in levels) * BYTES_PER_TEXEL
+
+    def evict(self, key):
+        # frees the GL texture, it is loaded again (from the mip cache) when it is used next
+        texture = self.textures.pop(key)
+        glDeleteTextures(1, (texture.texture,))
+        self.resident_bytes -= texture.bytes
+        self.pending.discard(key)
+
+    def destroy(self):
+        for key in list(self.textures):
+            self.evict(key)
@@ -1,90 +1,303 @@
 from OpenGL.GL import *
 import numpy as np
 import ctypes
+import hashlib
+import os
+
+# on-disk cache of expanded vertex arrays, one .npy file per (model, mtime, layout)
+CACHE_DIR = ".cache/meshes"
+
+# data stored in VBO, attribute location, name and number of floats
+VERTEX_LAYOUT = (
+    (0, "position", 3),
+    (2, "normal", 3),
+    (3, "texture", 2),
+)
+# color (vec4) is not part of the VBO, it comes from the per-instance data of a draw
+COLOR_LOCATION = 1
+VERTEX_SIZE = sum(size for _, _, size in VERTEX_LAYOUT)
+
+# coarser tessellations generated for primitives, level 0 is the model file itself
+# sphere - (segments around, rings), cylinder - (segments around,)
+LOD_MODELS = {
+    "sphere.obj": ("sphere", ((16, 8), (10, 6), (6, 4))),
+    "cylinder.obj": ("cylinder", ((16,), (10,), (6,))),
+}
 
 
 class MeshLoader:
     # for use with glDrawArrays
-    def __init__(self, filepath, color):
-        self.vertices = self.load_mesh(filepath, color)
-        # need number of vertices
-        self.vertex_count = len(self.vertices) // 10
-        self.vertices = np.array(self.vertices, dtype=np.float32)
-
+    def __init__(self, filepath, vertices=None):
+        # vertices - data to upload instead of loading filepath now, e.g. a placeholder while
+        # the file is loaded in the background, the real data is uploaded later with upload()
+        self.filepath = filepath
+        self.lods = []  # coarser meshes of the same shape, set by MeshRegistry
         self.vao = glGenVertexArrays(1)  # create vertex array object
         glBindVertexArray(self.vao)
 
         self.vbo = glGenBuffers(1)  # create vertex buffer object and send data to GPU
+        self.upload(load_vertices(filepath) if vertices is None else vertices)
+
+        set_vertex_attributes()
+
+    def upload(self, vertices):
+        # (re)fills the VBO, batches that share it draw the new data from the next frame on
+        self.vertices = vertices
+        # need number of vertices
+        self.vertex_count = len(self.vertices)
+        # bounding volumes in model space, for culling
+        self.aabb, self.sphere = bounds(vertices)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
         glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
 
-        # describing data stored in .obj, 0 - location, 1 - texture, 2 - normal
-        # data stored in VBO, 0 - location, 1 - color (vec4), 3 - normal
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, self.vertices.itemsize * 12, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(1)
-        glVertexAttribPointer(1, 4, GL_FLOAT, GL_FALSE, self.vertices.itemsize * 12, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(2)
-        glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, self.vertices.itemsize * 12, ctypes.c_void_p(28))
-        glEnableVertexAttribArray(3)
-        glVertexAttribPointer(3, 2, GL_FLOAT, GL_FALSE, self.vertices.itemsize * 12, ctypes.c_void_p(40))
-
-    def load_mesh(self, filepath, color):
-        # data from .obj file
-        v = []
-        vn = []
-        vt = []
+    @staticmethod
+    def load_mesh(filepath):
+        # data from .obj file, the text after the tag of every v, vt, vn and f line
+        lines = {"v": [], "vt": [], "vn": [], "f": []}
+        with open(filepath, 'r') as f:
+            for line in f.read().splitlines():
+                tag, _, values = line.partition(" ")
+                if tag in lines:
+                    lines[tag].append(values)
 
-        # completed VBO
-        vertices = []
+        # convert from string to float in one go, [[x, y, z], [x, y, z], ...]
+        v = parse_floats(lines["v"], 3)
+        vt = parse_floats(lines["vt"], 2)
+        vn = parse_floats(lines["vn"], 3)
+        faces = [face.split() for face in lines["f"]]  # [["1/1/1", "5/5/1", "7/9/1", ...], ...]
 
-        # load the numbers into v, vt, vn
-        with open(filepath, 'r') as f:
-            line = f.readline()
-            while line:
-                line = line.split(" ")
-                if line[0] == "v":
-                    values = [float(x) for x in line[1:4]]  # convert from string to float
-                    v.append(values)  # [x, y, z], [x, y, z], ...
-                if line[0] == "vt":
-                    values = [float(x) for x in line[1:3]]
-                    vt.append(values)  # [s, t], [s, t], ...
-                if line[0] == "vn":
-                    values = [float(x) for x in line[1:4]]
-                    vn.append(values)  # [x, y, z], [x, y, z], ...
-                if line[0] == "f":
-                    line.remove("f")  # ["1/1/1", "5/5/1", "7/9/1", ...]
-                    f_vertices = []  # to store vertex info in a face [ 1, 5, 7, ...]
-                    f_textures = []  # to store texture info in a face [ 1, 1, 1, ...]
-                    f_normals = []  # to store normal info in a face [ 1, 5, 9, ...]
-                    for vertex in line:
-                        vertex = vertex.split("/")
-                        # instead of storing 1,5,7 (index of the vertice in list v) append the value at that index in list v
-                        f_vertices.append(v[int(vertex[0]) - 1])  # blender uses 1 indexing
-                        f_textures.append(vt[int(vertex[1]) - 1])
-                        f_normals.append(vn[int(vertex[2]) - 1])
-
-                    number_of_triangles = len(line) - 2  # how many triangles are there in a face
-                    vertex_order = []  # order in which to write the vertices to form triangles
-                    for i in range(number_of_triangles):  # unpack vertices in a face [0, 1, 2, 3] -> [0, 1, 2, 0, 2, 3]
-                        vertex_order.append(0)
-                        vertex_order.append(i + 1)
-                        vertex_order.append(i + 2)
-                    for i in vertex_order:
-                        for j in f_vertices[i]:  # to add x,y,z instead of [x,y,z]
-                            vertices.append(j)
-                        for c in color:
-                            vertices.append(c)
-                        for n in f_normals[i]:
-                            vertices.append(n)
-                        for n in f_textures[i]:
-                            vertices.append(n)
-
-                line = f.readline()
-
-        return vertices
+        # "v/vt/vn" of every face corner -> [[v, vt, vn], ...], blender uses 1 indexing
+        corners = [corner for face in faces for corner in face]
+        corners = np.array(" ".join(corners).replace("/", " ").split(), dtype=np.int64).reshape(-1, 3) - 1
+
+        # VBO row for every face corner
+        attributes = {
+            "position": v[corners[:, 0]],
+            "normal": vn[corners[:, 2]],
+            "texture": vt[corners[:, 1]],
+        }
+        corner_data = np.empty((len(corners), VERTEX_SIZE), dtype=np.float32)
+        offset = 0
+        for _, name, size in VERTEX_LAYOUT:
+            corner_data[:, offset:offset + size] = attributes[name]
+            offset += size
+
+        # unpack corners of every face into a triangle fan [0, 1, 2, 3] -> [0, 1, 2, 0, 2, 3]
+        corner_counts = np.array([len(face) for face in faces], dtype=np.int64)
+        triangle_counts = corner_counts - 2  # how many triangles are there in a face
+        face_starts = np.cumsum(corner_counts) - corner_counts  # index of the first corner of a face
+        first = np.repeat(face_starts, triangle_counts)
+        i = np.arange(triangle_counts.sum()) - np.repeat(np.cumsum(triangle_counts) - triangle_counts, triangle_counts)
+        vertex_order = np.stack((first, first + i + 1, first + i + 2), axis=1).ravel()
+
+        # completed VBO
+        return corner_data[vertex_order]
 
     def destroy(self):
         # free all buffer objects
+        for lod in self.lods:
+            lod.destroy()
         glDeleteBuffers(1, (self.vbo,))
         glDeleteVertexArrays(1, (self.vao,))
+
+
+class MeshRegistry:
+    # one VAO/VBO per model file, shared by every link drawn with that model
+    def __init__(self, assets=None):
+        # assets - AssetLoader that reads model files in the background, without it they are
+        # loaded when first acquired
+        self.assets = assets
+        self.meshes = {}
+        self.references = {}
+        self.pending = set()  # meshes still drawn as a placeholder
+
+    def acquire(self, filepath):
+        # returns the mesh of a model file, uploading it only on the first request
+        key = os.path.normpath(filepath)
+        if key not in self.meshes:
+            if self.assets is None:
+                self.meshes[key] = MeshLoader(filepath)
+            else:
+                self.assets.request_mesh(filepath)
+                vertices = self.assets.take(filepath)
+                if vertices is None:
+                    vertices = placeholder_vertices()
+                    self.pending.add(key)
+                self.meshes[key] = MeshLoader(filepath, vertices)
+            # generated levels do not depend on the file, they are drawn even while it loads
+            self.meshes[key].lods = [MeshLoader(f"{filepath}#lod{level}", vertices)
+                                     for level, vertices in enumerate(lod_vertices(filepath), start=1)]
+            self.references[key] = 0
+        self.references[key] += 1
+        return self.meshes[key]
+
+    def poll(self):
+        # uploads meshes that finished loading in the background, call with the GL context current
+        # returns True while some meshes are still placeholders
+        for key in list(self.pending):
+            vertices = self.assets.take(key)
+            if vertices is not None:
+                self.meshes[key].upload(vertices)
+                self.pending.discard(key)
+            elif not self.assets.loading(key):
+                self.pending.discard(key)  # failed, stays a placeholder
+        return bool(self.pending)
+
+    def release(self, filepath):
+        # frees the GPU buffers once the last user of a model releases it
+        key = os.path.normpath(filepath)
+        self.references[key] -= 1
+        if self.references[key] == 0:
+            self.meshes.pop(key).destroy()
+            del self.references[key]
+            self.pending.discard(key)
+
+    def destroy(self):
+        # free every mesh that is still referenced
+        for mesh in self.meshes.values():
+            mesh.destroy()
+        self.meshes.clear()
+        self.references.clear()
+        self.pending.clear()
+
+
+def set_vertex_attributes():
+    # describing data stored in .obj, 0 - location, 1 - texture, 2 - normal
+    # data stored in VBO, 0 - location, 2 - normal, 3 - texture
+    # applies to the VAO and VBO that are currently bound
+    itemsize = np.dtype(np.float32).itemsize
+    stride = itemsize * VERTEX_SIZE
+    offset = 0
+    for location, _, size in VERTEX_LAYOUT:
+        glEnableVertexAttribArray(location)
+        glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset))
+        offset += itemsize * size
+
+
+def load_vertices(filepath):
+    # returns the expanded VBO contents as an (n, VERTEX_SIZE) float32 array,
+    # parsing the .obj only when there is no cache entry for this file version
+    path = cache_path(filepath)
+    if os.path.exists(path):
+        try:
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            pass  # damaged cache entry, parse again and overwrite it
+
+    vertices = MeshLoader.load_mesh(filepath)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # write to a temporary file first so a concurrent reader never sees half a file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, vertices)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # read-only checkout, the cache is only an optimization
+    return vertices
+
+
+def bounds(vertices):
+    # axis aligned box (min, max) and sphere (center, radius) around the positions of (n, VERTEX_SIZE) vertices
+    # the sphere is centered on the box, its radius reaches the farthest vertex, not the box corners
+    if len(vertices) == 0:
+        zero = np.zeros(3)
+        return (zero, zero), (zero, 0.0)
+    positions = np.asarray(vertices[:, :3], dtype=np.float64)
+    low = positions.min(axis=0)
+    high = positions.max(axis=0)
+    center = (low + high) / 2
+    radius = float(np.sqrt(((positions - center) ** 2).sum(axis=1).max()))
+    return (low, high), (center, radius)
+
+
+def lod_vertices(filepath):
+    # vertex arrays of the coarser levels of a model, finest first, none for models without levels
+    shape, levels = LOD_MODELS.get(os.path.basename(filepath), (None, ()))
+    generate = {"sphere": sphere_vertices, "cylinder": cylinder_vertices}.get(shape)
+    return [generate(*level) for level in levels]
+
+
+def sphere_vertices(segments, rings):
+    # UV sphere of radius 0.5 like models/sphere.obj, flat shaded
+    theta = np.linspace(0, 2 * np.pi, segments + 1)
+    phi = np.linspace(0, np.pi, rings + 1)
+    points = 0.5 * np.stack((np.outer(np.sin(phi), np.cos(theta)),
+                             np.outer(np.cos(phi), np.ones_like(theta)),
+                             np.outer(np.sin(phi), np.sin(theta))), axis=-1)
+    uv = np.stack(np.meshgrid(theta / (2 * np.pi), 1 - phi / np.pi), axis=-1)
+    # two triangles per quad of the grid, the ones collapsed into the poles are left out
+    i, j = np.meshgrid(np.arange(rings), np.arange(segments), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    upper = np.stack((i, j, i + 1, j, i + 1, j + 1), axis=-1)[i < rings - 1]
+    lower = np.stack((i, j, i + 1, j + 1, i, j + 1), axis=-1)[i > 0]
+    corners = np.concatenate((upper, lower)).reshape(-1, 3, 2)  # (triangles, 3 corners, (ring, segment))
+    return flat_triangles(points[corners[..., 0], corners[..., 1]], uv[corners[..., 0], corners[..., 1]])
+
+
+def cylinder_vertices(segments):
+    # cylinder of radius 0.5 and length 1 along the y axis like models/cylinder.obj, flat shaded
+    theta = np.linspace(0, 2 * np.pi, segments + 1)
+    ring = 0.5 * np.stack((np.cos(theta), np.zeros_like(theta), np.sin(theta)), axis=-1)
+    bottom, top = ring - [0, 0.5, 0], ring + [0, 0.5, 0]
+    j = np.arange(segments)
+    side = np.concatenate((np.stack((bottom[j], top[j], top[j + 1]), axis=1),
+                           np.stack((bottom[j], top[j + 1], bottom[j + 1]), axis=1)))
+    u = np.concatenate((np.stack((j, j, j + 1), axis=1), np.stack((j, j + 1, j + 1), axis=1))) / segments
+    v = np.concatenate((np.tile([0.0, 1.0, 1.0], (segments, 1)), np.tile([0.0, 1.0, 0.0], (segments, 1))))
+    side_uv = np.stack((u, v), axis=-1)
+    # caps as triangle fans around their first vertex
+    k = np.arange(1, segments - 1)
+    caps = np.concatenate((np.stack((bottom[np.zeros_like(k)], bottom[k], bottom[k + 1]), axis=1),
+                           np.stack((top[np.zeros_like(k)], top[k], top[k + 1]), axis=1)))
+    caps_uv = caps[..., [0, 2]] + 0.5
+    return flat_triangles(np.concatenate((side, caps)), np.concatenate((side_uv, caps_uv)))
+
+
+def flat_triangles(positions, uv):
+    # (n, 3, 3) triangle corners and (n, 3, 2) texture coordinates -> VBO rows with face normals,
+    # normals face away from the center of the shape (the origin)
+    normals = np.cross(positions[:, 1] - positions[:, 0], positions[:, 2] - positions[:, 0])
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    outward = np.einsum("ij,ij->i", normals, positions.mean(axis=1)) >= 0
+    normals[~outward] *= -1
+    vertices = np.empty((len(positions), 3, VERTEX_SIZE), dtype=np.float32)
+    vertices[..., 0:3] = positions
+    vertices[..., 3:6] = normals[:, None, :]
+    vertices[..., 6:8] = uv
+    return vertices.reshape(-1, VERTEX_SIZE)
+
+
+def placeholder_vertices():
+    # unit box drawn until a mesh is loaded, every model in models/ fits inside it
+    faces = []
+    for axis in range(3):
+        u, v = (axis + 1) % 3, (axis + 2) % 3
+        for sign in (-0.5, 0.5):
+            corners = np.zeros((4, VERTEX_SIZE), dtype=np.float32)
+            corners[:, axis] = sign
+            corners[:, u] = [-0.5, 0.5, 0.5, -0.5]
+            corners[:, v] = [-0.5, -0.5, 0.5, 0.5]
+            corners[:, 3 + axis] = 1.0 if sign > 0 else -1.0  # normal
+            corners[:, 6] = corners[:, u] + 0.5  # texture
+            corners[:, 7] = corners[:, v] + 0.5
+            faces.append(corners[[0, 1, 2, 0, 2, 3]])
+    return np.concatenate(faces)
+
+
+def cache_path(filepath):
+    # cache key - absolute path, modification time and layout of the vertex data
+    stat = os.stat(filepath)
+    layout = ",".join(f"{name}{size}" for _, name, size in VERTEX_LAYOUT)
+    key = f"{os.path.abspath(filepath)}|{stat.st_mtime_ns}|{stat.st_size}|{layout}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{digest}.npy")
+
+
+def parse_floats(lines, width):
+    # ["x y z\n", ...] -> float array of shape (len(lines), width)
+    if not lines:
+        return np.zeros((0, width))
+    values = np.array(" ".join(lines).split(), dtype=np.float64)
+    return values.reshape(len(lines), -1)[:, :width]
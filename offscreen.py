@@ -0,0 +1,63 @@
+# OpenGL without a window - EGL context on a surfaceless display (Mesa llvmpipe on machines without a GPU),
+# drawing goes to framebuffer objects (framebuffer.Framebuffer)
+# import this module before anything imports OpenGL, PyOpenGL chooses its platform on the first import
+import ctypes
+import os
+import sys
+
+if "OpenGL.GL" in sys.modules and os.environ.get("PYOPENGL_PLATFORM") != "egl":
+    raise ImportError("offscreen has to be imported before OpenGL")
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+from OpenGL import EGL
+from OpenGL.GL import *
+
+
+class OffscreenError(RuntimeError):
+    pass
+
+
+class Context:
+    # OpenGL core profile context made current on creation
+    def __init__(self, major=3, minor=3):
+        try:
+            self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+            if not EGL.eglInitialize(self.display, None, None):
+                raise OffscreenError("EGL display cannot be initialized")
+            attributes = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                          EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE]
+            config = EGL.EGLConfig()
+            count = EGL.EGLint()
+            EGL.eglChooseConfig(self.display, (EGL.EGLint * len(attributes))(*attributes),
+                                ctypes.pointer(config), 1, ctypes.pointer(count))
+            if count.value == 0:
+                raise OffscreenError("no EGL config supports desktop OpenGL")
+            # drawing goes to framebuffer objects, the surface only has to exist
+            size = [EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1, EGL.EGL_NONE]
+            self.surface = EGL.eglCreatePbufferSurface(self.display, config, (EGL.EGLint * len(size))(*size))
+            EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+            attributes = [EGL.EGL_CONTEXT_MAJOR_VERSION, major, EGL.EGL_CONTEXT_MINOR_VERSION, minor,
+                          EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+                          EGL.EGL_NONE]
+            self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT,
+                                                (EGL.EGLint * len(attributes))(*attributes))
+            if not self.context:
+                raise OffscreenError(f"OpenGL {major}.{minor} core context cannot be created")
+        except EGL.EGLError as e:
+            raise OffscreenError(f"EGL: {e}") from e
+        self.make_current()
+
+    def make_current(self):
+        if not EGL.eglMakeCurrent(self.display, self.surface, self.surface, self.context):
+            raise OffscreenError("EGL context cannot be made current")
+
+    def renderer(self):
+        # e.g. "llvmpipe (LLVM 15.0.7, 256 bits)"
+        return (glGetString(GL_RENDERER) or b"").decode()
+
+    def destroy(self):
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglDestroySurface(self.display, self.surface)
+        EGL.eglTerminate(self.display)
@@ -0,0 +1,123 @@
+from collections import Counter, deque
+from contextlib import contextmanager
+from OpenGL.GL import *
+import csv
+import ctypes
+import time
+
+# draw calls, uniform uploads, ... counted wherever they happen, collected once per frame by Profiler
+counters = Counter()
+COUNTERS = ("draw_calls", "instances", "vertices", "uniform_uploads")
+
+
+def count(name, n=1):
+    counters[name] += n
+
+
+class Profiler:
+    # CPU time of named stages (perf_counter) and GPU time of stages that draw (GL_TIME_ELAPSED queries)
+    # GPU results are read two frames later from a second set of queries, so the CPU never waits for the GPU
+    def __init__(self, history=300):
+        self.enabled = False
+        self.frames = deque(maxlen=history)  # one dict per frame, stage -> ms and counter -> value
+        self.frame = 0
+        self.stages = []  # in the order they were first seen
+        self.current = {}  # stages measured since the last end_frame, also those between frames (sim steps)
+        self.queries = {}  # stage -> [query of even frames, query of odd frames]
+        self.issued = {}  # query -> frame it measured
+
+    @contextmanager
+    def stage(self, name, gpu=False):
+        # with profiler.stage("robot", gpu=True): ...
+        if not self.enabled:
+            yield
+            return
+        if name not in self.stages:
+            self.stages.append(name)
+        query = None
+        if gpu:
+            query = self.query(name)
+            glBeginQuery(GL_TIME_ELAPSED, query)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current["cpu_" + name] = self.current.get("cpu_" + name, 0.0) + (time.perf_counter() - start) * 1e3
+            if query is not None:
+                glEndQuery(GL_TIME_ELAPSED)
+                self.issued[query] = self.frame
+
+    def query(self, name):
+        if name not in self.queries:
+            self.queries[name] = list(glGenQueries(2))
+        return self.queries[name][self.frame % 2]
+
+    def begin_frame(self):
+        # GL context has to be current, reads the queries this frame is going to reuse
+        if not self.enabled:
+            return
+        for name, queries in self.queries.items():
+            query = queries[self.frame % 2]
+            frame = self.issued.pop(query, None)
+            if frame is None:
+                continue
+            elapsed = GLuint64()  # nanoseconds
+            glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(elapsed))
+            record = self.record(frame)
+            if record is not None:
+                record["gpu_" + name] = elapsed.value / 1e6
+
+    def end_frame(self):
+        # closes the frame's record and resets the counters
+        if self.enabled:
+            record = {"frame": self.frame, "time": time.time()}
+            record.update(self.current)
+            for name in COUNTERS:
+                record[name] = counters[name]
+            self.frames.append(record)
+            self.frame += 1
+        self.current = {}
+        counters.clear()
+
+    def record(self, frame):
+        # record of an earlier frame, None when it is no longer kept
+        if not self.frames:
+            return None
+        i = len(self.frames) - 1 - (self.frames[-1]["frame"] - frame)
+        return self.frames[i] if 0 <= i < len(self.frames) else None
+
+    def columns(self):
+        return (["frame", "time"] + ["cpu_" + name for name in self.stages] +
+                ["gpu_" + name for name in self.queries] + list(COUNTERS))
+
+    def summary(self, frames=60):
+        # mean of every column over the last frames, text for the overlay
+        recent = list(self.frames)[-frames:]
+        if not recent:
+            return "no frames profiled yet"
+        lines = []
+        for column in self.columns()[2:]:
+            values = [record[column] for record in recent if column in record]
+            if not values:
+                continue
+            mean = sum(values) / len(values)
+            unit = " ms" if column.startswith(("cpu_", "gpu_")) else ""
+            lines.append(f"{column:<18}{mean:8.3f}{unit}")
+        if len(recent) > 1:
+            fps = (len(recent) - 1) / max(recent[-1]["time"] - recent[0]["time"], 1e-9)
+            lines.append(f"{'fps':<18}{fps:8.1f}")
+        return "\n".join(lines)
+
+    def export_csv(self, filepath):
+        # every kept frame, missing values (GPU time not read yet) are left empty
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns(), restval="")
+            writer.writeheader()
+            for record in self.frames:
+                writer.writerow(record)
+
+    def destroy(self):
+        for queries in self.queries.values():
+            glDeleteQueries(2, queries)
+        self.queries.clear()
+        self.issued.clear()
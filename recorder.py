@@ -0,0 +1,152 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+# no OpenGL or Qt imports here, runs are recorded headless too
+# a log is a header and then fixed size little endian records, one per simulation step:
+#   magic, layout version (uint32), length of the JSON description (uint32), JSON, zero padding to HEADER_ALIGN
+LOG_MAGIC = b"ROBOTLOG"
+# bump when the record layout changes
+LOG_VERSION = 1
+HEADER_ALIGN = 64
+
+
+class LogError(ValueError):
+    # the file is not a log or not one of this layout
+    pass
+
+
+def record_dtype(wheels):
+    # time, pose and the speed and roll, pitch, yaw of every wheel joint as set by Robot.update_values
+    return np.dtype([
+        ("t", "<f8"),
+        ("x", "<f8"),
+        ("y", "<f8"),
+        ("theta", "<f8"),
+        ("speeds", "<f8", (wheels,)),
+        ("angles", "<f8", (wheels, 3)),
+    ])
+
+
+def write_header(file, description):
+    text = json.dumps(description).encode("utf-8")
+    header = LOG_MAGIC + struct.pack("<II", LOG_VERSION, len(text)) + text
+    file.write(header + b"\0" * (-len(header) % HEADER_ALIGN))
+
+
+def read_header(file):
+    # (description, offset of the first record, record dtype) of an open log
+    start = file.read(len(LOG_MAGIC) + 8)
+    if len(start) < len(LOG_MAGIC) + 8 or not start.startswith(LOG_MAGIC):
+        raise LogError(f"{getattr(file, 'name', 'file')} is not a robot log")
+    version, length = struct.unpack("<II", start[len(LOG_MAGIC):])
+    if version != LOG_VERSION:
+        raise LogError(f"log layout version {version}, expected {LOG_VERSION}")
+    description = json.loads(file.read(length).decode("utf-8"))
+    size = len(start) + length
+    return description, size + (-size % HEADER_ALIGN), record_dtype(len(description["wheels"]))
+
+
+class PoseRecorder:
+    # state of a robot after every simulation step, kept in a preallocated ring of the last capacity steps
+    # and appended to a log file in chunks of records, recording a step only writes into the ring
+    def __init__(self, robot, path=None, capacity=65536, chunk=4096, name=""):
+        # path - log to append to, None keeps only the ring, chunk - records written at once
+        # name - of the robot's file, stored in the log's description
+        if path is not None and not 0 < chunk <= capacity:
+            raise ValueError("chunk has to fit into the ring")
+        self.robot = robot
+        self.wheels = robot.wheels
+        self.ring = np.zeros(capacity, dtype=record_dtype(len(self.wheels)))
+        # column views, writing through them does not create record objects
+        self.t = self.ring["t"]
+        self.x = self.ring["x"]
+        self.y = self.ring["y"]
+        self.theta = self.ring["theta"]
+        self.speeds = self.ring["speeds"]
+        self.angles = self.ring["angles"]
+        self.capacity = capacity
+        self.chunk = chunk
+        self.count = 0  # steps recorded
+        self.written = 0  # steps in the log file
+        self.path = path
+        self.file = None
+        self.last_time = None  # of the log appended to, its times are continued from there
+        self.time_offset = 0.0  # added to the times being recorded
+        if path is not None:
+            self.file = self.open_log(path, {"robot": name, "wheels": [wheel.name for wheel in self.wheels]})
+
+    def open_log(self, path, description):
+        # new log, or an existing one of the same robot that the records are appended to
+        file = open(path, "a+b")
+        file.seek(0)
+        if os.fstat(file.fileno()).st_size == 0:
+            write_header(file, description)
+            return file
+        try:
+            existing, offset, dtype = read_header(file)
+        except LogError:
+            file.close()
+            raise
+        if existing["wheels"] != description["wheels"] or dtype != self.ring.dtype:
+            file.close()
+            raise LogError(f"{path} was recorded with wheels {existing['wheels']}")
+        size = os.fstat(file.fileno()).st_size
+        if (size - offset) % dtype.itemsize:
+            file.close()
+            raise LogError(f"{path} ends with an incomplete record")
+        if size > offset:
+            file.seek(size - dtype.itemsize)
+            self.last_time = float(np.frombuffer(file.read(dtype.itemsize), dtype=dtype)["t"][0])
+        return file
+
+    def record(self, t):
+        # t - simulation time, it must not decrease
+        if self.count == 0 and self.last_time is not None:
+            self.time_offset = self.last_time - t
+        t += self.time_offset
+        i = self.count % self.capacity
+        robot = self.robot
+        self.t[i] = t
+        self.x[i] = robot.base_link.xyz[0]
+        self.y[i] = robot.base_link.xyz[1]
+        self.theta[i] = robot.theta
+        for k, wheel in enumerate(self.wheels):
+            self.speeds[i, k] = wheel.speed
+            self.angles[i, k] = wheel.angles
+        self.count += 1
+        if self.file is not None and self.count - self.written >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        # appends the records that are not in the log yet, at most two slices of the ring
+        while self.written < self.count:
+            start = self.written % self.capacity
+            end = min(start + self.count - self.written, self.capacity)
+            self.file.write(self.ring[start:end])
+            self.written += end - start
+        self.file.flush()
+
+    def history(self, n=None):
+        # copy of the last n recorded steps (all that are in the ring by default), oldest first
+        n = min(self.count, self.capacity) if n is None else min(n, self.count, self.capacity)
+        return self.ring[np.arange(self.count - n, self.count) % self.capacity]
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+
+def open_log(path):
+    # (description, records) of a log, records are a read-only memory map, nothing is read before it is used
+    with open(path, "rb") as file:
+        description, offset, dtype = read_header(file)
+        size = os.fstat(file.fileno()).st_size
+    count = (size - offset) // dtype.itemsize  # an incomplete last record of an interrupted run is left out
+    if count == 0:
+        return description, np.zeros(0, dtype=dtype)
+    return description, np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
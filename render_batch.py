@@ -0,0 +1,211 @@
+# renders a robot driven by a command script without a window, e.g. for image datasets on machines without a GPU
+# python3 render_batch.py differential_drive.xacro drive.txt frames/            -> frames/frame_00000.png, ...
+# python3 render_batch.py differential_drive.xacro drive.txt frames/%04d.jpg
+# python3 render_batch.py differential_drive.xacro drive.txt - | ffmpeg -f rawvideo -pix_fmt rgb24 -s 640x480 -r 30 -i - out.mp4
+# options: --size 640x480, --ring 3 (pixel buffers in flight), --workers 2 (threads encoding image files)
+#
+# command script, one command per line, # starts a comment:
+#   dt 0.01          simulation time step in seconds (default 1/60)
+#   fps 30           frames per simulated second drawn by run (default 30)
+#   pose 0 0 1.57    places the robot, x y in meters and yaw in radians
+#   speeds 2 1       wheel speeds, one per wheel (continuous joint)
+#   run 2.5          simulates seconds, drawing fps frames per second
+#   frame            draws one frame of the current state
+import offscreen  # before OpenGL is imported by anything else
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import os
+import sys
+import time
+
+from PIL import Image
+
+from asset_loader import AssetLoader
+from framebuffer import Framebuffer, ReadbackRing
+from renderer import Renderer
+from robot import Robot
+from simulation import Simulation
+
+# command -> number of values it takes, None for one per wheel
+COMMANDS = {"dt": 1, "fps": 1, "pose": 3, "speeds": None, "run": 1, "frame": 0}
+RAW_EXTENSIONS = (".rgb", ".raw")
+
+
+class ScriptError(ValueError):
+    pass
+
+
+def parse_script(text):
+    # [(line number, command, [values]), ...], only the syntax is checked here
+    commands = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.split("#", 1)[0].split()
+        if not line:
+            continue
+        command, values = line[0], line[1:]
+        if command not in COMMANDS:
+            raise ScriptError(f"line {number}: unknown command {command!r}")
+        try:
+            values = [float(value) for value in values]
+        except ValueError:
+            raise ScriptError(f"line {number}: {command} takes numbers") from None
+        expected = COMMANDS[command]
+        if expected is not None and len(values) != expected:
+            raise ScriptError(f"line {number}: {command} takes {expected} value(s), got {len(values)}")
+        commands.append((number, command, values))
+    return commands
+
+
+def run_script(commands, simulation, draw):
+    # steps the simulation as the script says, draw() is called for every frame
+    robot = simulation.robot
+    frame_interval = 1 / 30
+    for number, command, values in commands:
+        if command == "dt":
+            if values[0] <= 0:
+                raise ScriptError(f"line {number}: dt has to be positive")
+            simulation.dt = values[0]
+        elif command == "fps":
+            if values[0] <= 0:
+                raise ScriptError(f"line {number}: fps has to be positive")
+            frame_interval = 1 / values[0]
+        elif command == "pose":
+            robot.set_pose(*values)
+            simulation.previous = simulation.current = simulation.pose()
+        elif command == "speeds":
+            if len(values) != robot.number_of_wheels:
+                raise ScriptError(f"line {number}: the robot has {robot.number_of_wheels} wheels, "
+                                  f"got {len(values)} speeds")
+            robot.update_values([[0, 0, 0]] * robot.number_of_wheels, values)
+        elif command == "run":
+            since_frame = 0.0
+            for _ in range(round(values[0] / simulation.dt)):
+                simulation.step()
+                since_frame += simulation.dt
+                if since_frame >= frame_interval - 1e-9:
+                    draw()
+                    since_frame -= frame_interval
+        elif command == "frame":
+            draw()
+
+
+class FrameWriter:
+    # numbered image files encoded on worker threads, or raw RGB24 frames written to a stream
+    # (a video encoder's stdin), in the order they were drawn
+    def __init__(self, output, stream=None, workers=2):
+        self.stream = None
+        self.pattern = None
+        if output == "-" or output.endswith(RAW_EXTENSIONS):
+            self.stream = stream if output == "-" else open(output, 'wb')
+        else:
+            self.pattern = output if "%" in output else os.path.join(output, "frame_%05d.png")
+            directory = os.path.dirname(self.pattern)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frames")
+            self.pending = deque()
+            self.limit = 4 * workers  # frames waiting to be encoded, bounds the memory they take
+        self.count = 0
+
+    def write(self, index, image):
+        self.count += 1
+        if self.stream is not None:
+            self.stream.write(image.tobytes())
+            return
+        while len(self.pending) >= self.limit:
+            self.pending.popleft().result()
+        self.pending.append(self.pool.submit(Image.fromarray(image).save, self.pattern % index))
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.flush()
+            if self.stream is not sys.stdout.buffer:
+                self.stream.close()
+            return
+        while self.pending:
+            self.pending.popleft().result()
+        self.pool.shutdown()
+
+
+def render(robot_file, script_text, output, size=(640, 480), ring_size=3, workers=2, stream=None):
+    # returns the number of frames written
+    commands = parse_script(script_text)
+    width, height = size
+    context = offscreen.Context()
+    writer = FrameWriter(output, stream, workers)
+    try:
+        robot = Robot(robot_file)
+        framebuffer = Framebuffer(width, height)
+        framebuffer.bind()
+        renderer = Renderer(robot, AssetLoader())
+        renderer.initialize()
+        renderer.resize(width, height)
+        ring = ReadbackRing(width, height, ring_size)
+        # frames of a dataset should not show placeholders
+        while renderer.paint():
+            time.sleep(0.01)
+
+        index = 0
+
+        def draw():
+            nonlocal index
+            renderer.paint()
+            finished = ring.read(framebuffer, index)
+            if finished is not None:
+                writer.write(*finished)
+            index += 1
+
+        try:
+            run_script(commands, Simulation(robot), draw)
+            for finished in ring.flush():
+                writer.write(*finished)
+        finally:
+            ring.destroy()
+            renderer.destroy()
+            framebuffer.destroy()
+    finally:
+        writer.close()
+        context.destroy()
+    return writer.count
+
+
+def main(arguments):
+    options = {"--size": "640x480", "--ring": "3", "--workers": "2"}
+    positional = []
+    while arguments:
+        argument = arguments.pop(0)
+        if argument in options:
+            if not arguments:
+                sys.exit(f"{argument} needs a value")
+            options[argument] = arguments.pop(0)
+        else:
+            positional.append(argument)
+    if len(positional) != 3:
+        sys.exit("usage: render_batch.py robot.xacro script.txt output [--size WxH] [--ring N] [--workers N]")
+    robot_file, script_file, output = positional
+    try:
+        size = tuple(int(value) for value in options["--size"].lower().split("x"))
+    except ValueError:
+        size = ()
+    if len(size) != 2 or min(size) <= 0:
+        sys.exit(f"--size takes WIDTHxHEIGHT, got {options['--size']}")
+    with open(script_file, 'r') as f:
+        script_text = f.read()
+
+    # frames may go to stdout, everything else that is printed goes to stderr
+    stream = sys.stdout.buffer
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            count = render(robot_file, script_text, output, size, int(options["--ring"]), int(options["--workers"]),
+                           stream)
+        except (ScriptError, offscreen.OffscreenError) as e:
+            sys.exit(str(e))
+    elapsed = time.perf_counter() - start
+    print(f"{count} frames in {elapsed:.2f} s ({count / elapsed:.1f} fps)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
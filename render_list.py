@@ -0,0 +1,206 @@
+from OpenGL.GL import *
+import numpy as np
+import ctypes
+
+import mesh_loader as ml
+import profiler
+from culling import world_spheres
+from kinematics import normal_matrices
+
+# per-instance data, model matrix (mat4 takes locations 4 - 7), normal matrix (mat3, 8 - 10) and color (vec4)
+MODEL_LOCATION = 4
+NORMAL_LOCATION = 8
+INSTANCE_SIZE = 16 + 9 + 4
+
+# smallest diameter on screen (pixels) at which levels of detail 0, 1, 2 ... are drawn, below the last
+# one the coarsest level is used
+LOD_SIZES = (96.0, 32.0, 12.0)
+# an instance changes level only when its size is this far (fraction) past the threshold, so that
+# sizes close to a threshold do not switch levels back and forth every frame
+LOD_HYSTERESIS = 0.15
+
+
+class Batch:
+    # all instances of one mesh, drawn with a single glDrawArraysInstanced
+    def __init__(self, mesh, count, instances=None):
+        # instances - (count, INSTANCE_SIZE) data shared with other batches, e.g. levels of detail
+        self.mesh = mesh
+        # one row per instance - model matrix, normal matrix and color
+        self.instances = np.zeros((count, INSTANCE_SIZE), dtype=np.float32) if instances is None else instances
+        self.models = self.instances[:, :16].reshape(count, 4, 4)
+        self.normals = self.instances[:, 16:25].reshape(count, 3, 3)
+        self.colors = self.instances[:, 25:]
+        self.visible = np.ones(count, dtype=bool)  # instances inside the view frustum
+        self.count = count  # instances in the buffer, only the visible ones are uploaded
+
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, mesh.vbo)  # vertex data is shared with the mesh
+        ml.set_vertex_attributes()
+
+        self.instance_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.instances.nbytes, self.instances, GL_DYNAMIC_DRAW)
+        stride = self.instances.itemsize * INSTANCE_SIZE
+        # matrices are passed one column per attribute location
+        attributes = [(MODEL_LOCATION + column, 4, 4 * column) for column in range(4)]
+        attributes += [(NORMAL_LOCATION + column, 3, 16 + 3 * column) for column in range(3)]
+        attributes.append((ml.COLOR_LOCATION, 4, 25))
+        for location, size, offset in attributes:
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, stride,
+                                  ctypes.c_void_p(offset * self.instances.itemsize))
+            glVertexAttribDivisor(location, 1)  # advance once per instance, not per vertex
+        glBindVertexArray(0)
+
+    def set_models(self, models):
+        # model matrices of all instances, normal matrices are derived from them
+        self.models[:] = models
+        self.normals[:] = normal_matrices(np.asarray(models, dtype=np.float64).reshape(-1, 4, 4))
+
+    def cull(self, frustum):
+        # marks the instances whose bounding spheres are inside the frustum, None shows all of them
+        # returns True when that changed and the batch has to be uploaded again
+        if frustum is None:
+            return self.select(np.ones(len(self.instances), dtype=bool))
+        return self.select(frustum.spheres_visible(*world_spheres(self.models, self.mesh.sphere)))
+
+    def select(self, visible):
+        # instances to draw, returns True when that changed
+        if np.array_equal(visible, self.visible):
+            return False
+        self.visible = visible
+        return True
+
+    def upload(self):
+        # send the visible instances to the GPU, the buffer is orphaned to avoid waiting on the last frame
+        data = self.instances if self.visible.all() else self.instances[self.visible]
+        self.count = len(data)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+
+    def draw(self):
+        if self.count == 0:
+            return
+        glBindVertexArray(self.vao)  # bind the VAO that is being drawn
+        glDrawArraysInstanced(GL_TRIANGLES, 0, self.mesh.vertex_count, self.count)
+        profiler.count("draw_calls")
+        profiler.count("instances", self.count)
+        profiler.count("vertices", self.mesh.vertex_count * self.count)
+
+    def destroy(self):
+        glDeleteBuffers(1, (self.instance_vbo,))
+        glDeleteVertexArrays(1, (self.vao,))
+
+
+class LodBatch:
+    # instances of a mesh with levels of detail (mesh.lods), one batch per level sharing the instance data,
+    # every instance is drawn with the level that fits its size on screen
+    def __init__(self, mesh, count):
+        self.mesh = mesh
+        self.batches = [Batch(mesh, count)]
+        self.instances = self.batches[0].instances
+        self.batches += [Batch(lod, count, self.instances) for lod in mesh.lods]
+        self.models = self.batches[0].models
+        self.normals = self.batches[0].normals
+        self.colors = self.batches[0].colors
+        self.levels = np.zeros(count, dtype=np.int64)  # level every instance was drawn with last
+
+    @property
+    def count(self):
+        return sum(batch.count for batch in self.batches)
+
+    def set_models(self, models):
+        self.batches[0].set_models(models)
+
+    def cull(self, frustum):
+        # culls against the frustum and picks the levels, returns True when some level has to be uploaded again
+        if frustum is None:
+            visible = np.ones(len(self.instances), dtype=bool)
+            self.levels[:] = 0
+        else:
+            centers, radii = world_spheres(self.models, self.mesh.sphere)
+            visible = frustum.spheres_visible(centers, radii)
+            sizes = frustum.screen_sizes(centers[visible], radii[visible])
+            self.levels[visible] = lod_levels(sizes, self.levels[visible], len(self.batches) - 1)
+        changed = False
+        for level, batch in enumerate(self.batches):
+            changed = batch.select(visible & (self.levels == level)) or changed
+        return changed
+
+    def upload(self):
+        for batch in self.batches:
+            batch.upload()
+
+    def draw(self):
+        for batch in self.batches:
+            batch.draw()
+
+    def destroy(self):
+        for batch in self.batches:
+            batch.destroy()
+
+
+def lod_levels(sizes, current, coarsest):
+    # level of detail for instances of the given diameters on screen, changing the current level only
+    # when the size is past a threshold by LOD_HYSTERESIS
+    thresholds = np.array(LOD_SIZES[:coarsest])
+    # coarser than needed when even the raised thresholds are exceeded, finer when even the lowered are not
+    # (level 0 is the finest, higher levels are coarser)
+    coarsest_kept = (sizes[:, None] < thresholds * (1 + LOD_HYSTERESIS)).sum(axis=1)
+    finest_kept = (sizes[:, None] < thresholds * (1 - LOD_HYSTERESIS)).sum(axis=1)
+    return np.clip(current, finest_kept, coarsest_kept)
+
+
+class RenderList:
+    # robot's links grouped into one batch per mesh
+    # draw calls per frame depend on the number of distinct meshes, not on the number of links
+    def __init__(self, kinematics):
+        self.kinematics = kinematics
+
+        # which links (indices into the kinematics arrays) each batch draws
+        indices = {}
+        for i, link in enumerate(kinematics.links):
+            indices.setdefault(link.mesh, []).append(i)
+        self.batches = []
+        for mesh, links in indices.items():
+            batch = LodBatch(mesh, len(links)) if mesh.lods else Batch(mesh, len(links))
+            batch.links = np.array(links)
+            batch.colors[:] = [kinematics.links[i].color for i in links]
+            self.batches.append(batch)
+        self.moved = True  # batches hold model matrices that were not culled and uploaded yet
+        self.synced = -1  # kinematics version the batches were copied from
+        self.frustum = None  # what the batches were culled against
+
+    def sync(self):
+        # copy model and normal matrices of links that moved into the batches
+        # the kinematics may have been updated by someone else (collisions) since the last copy
+        self.kinematics.update()
+        if self.kinematics.version == self.synced:
+            return
+        self.synced = self.kinematics.version
+        for batch in self.batches:
+            batch.models[:] = self.kinematics.models[batch.links]
+            batch.normals[:] = self.kinematics.normals[batch.links]
+        self.moved = True
+
+    def update(self, frustum=None):
+        # brings the batches up to date, culled against the frustum (None draws every link), and uploads
+        # the ones that changed, nothing is done when neither the links nor the frustum changed
+        self.sync()
+        if not self.moved and frustum == self.frustum:
+            return
+        for batch in self.batches:
+            if batch.cull(frustum) or self.moved:
+                batch.upload()
+        self.moved = False
+        self.frustum = frustum
+
+    def draw(self):
+        for batch in self.batches:
+            batch.draw()
+
+    def destroy(self):
+        for batch in self.batches:
+            batch.destroy()
+        self.batches.clear()
@@ -0,0 +1,225 @@
+from OpenGL.GL import *
+import pyrr
+
+import mesh_loader as ml
+from asset_loader import AssetLoader
+from culling import Frustum
+from render_list import Batch, RenderList
+from shader_manager import FrameUniforms, ShaderManager
+from materials import ROAD_MAPS, Material, TextureManager
+from profiler import Profiler
+
+GROUND_MODEL = "models/plane.obj"
+
+
+class Renderer:
+    # robot and ground drawn into the framebuffer that is bound, the same frame for the Qt widget
+    # and for rendering without a window
+    def __init__(self, robot, assets=None):
+        self.robot = robot
+        self.cam = Camera()
+        self.simulation = None  # set by Window, draws the robot interpolated between steps
+        self.assets = assets if assets is not None else AssetLoader()
+        self.assets.request_mesh(GROUND_MODEL)
+        self.profiler = Profiler()
+        self.sensors = []  # cameras attached to links, drawn by render_sensors
+        self.culling = True  # skip links and ground outside the view frustum
+        self.lod = True  # draw coarser meshes of links small on screen
+        self.height = 720  # of the viewport in pixels, levels of detail are picked by size on screen
+        self.initialized = False
+
+    def initialize(self):
+        # GL resources, the context has to be current
+        # create openGL vertex and fragment shader, linked programs are cached between launches
+        self.shaders = ShaderManager()
+        self.program = self.shaders.program("shaders/vertex.txt", "shaders/fragment.txt")
+        self.program.use()
+        # camera and light of all programs, one uniform buffer updated once per frame
+        self.frame = FrameUniforms()
+
+        glClearColor(0.1, 0.45, 0.55, 1)
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+        # create perspective projection matrix
+        self.projection = pyrr.matrix44.create_perspective_projection(
+            fovy=45.0, aspect=1280 / 720,
+            near=0.1, far=100.0)
+
+        # view matrix, eye - position of camera cannot be [0, 0, 0], target i am looking at , up vector of the camera
+        camera_position = pyrr.Vector3([0, 0.2, 1])
+        self.look_at = pyrr.matrix44.create_look_at(
+            camera_position,
+            pyrr.Vector3([0, 0, 0]),
+            pyrr.Vector3([0, 1, 0]))
+
+        # projection & view matrices for the shader
+        self.frame.projection[:] = self.projection
+        self.frame.view[:] = self.cam.look_at
+
+        # meshes are uploaded once per model and shared by all links and the scene
+        # until a model file is loaded its links are drawn as placeholder boxes
+        self.meshes = ml.MeshRegistry(self.assets)
+        self.scene = Scene(self.meshes)
+        self.frame.light_color[:] = self.scene.light.color
+        self.frame.light_position[:] = self.scene.light.position
+
+        for link in self.robot.links:
+            link.load_mesh(self.meshes)
+        # robot drawn with one instanced draw call per mesh
+        self.render_list = RenderList(self.robot.kinematics)
+
+        self.cam.set_target(self.robot.base_link.xyz)
+        self.cam.move(self.frame)
+
+        # textures of materials are loaded when they are first drawn, grey until then
+        self.textures = TextureManager(self.assets)
+
+        self.initialized = True
+        for sensor in self.sensors:
+            sensor.attach(self)
+
+    def destroy(self):
+        # frees GPU resources, the context has to be current
+        self.assets.shutdown()
+        for sensor in self.sensors:
+            sensor.destroy()
+        self.sensors.clear()
+        self.render_list.destroy()
+        for link in self.robot.links:
+            link.release_mesh(self.meshes)
+        self.scene.destroy(self.meshes)
+        self.meshes.destroy()
+        self.textures.destroy()
+        self.frame.destroy()
+        self.shaders.destroy()
+        self.profiler.destroy()
+
+    def poll_assets(self):
+        # uploads meshes and textures that finished loading, returns True while some are still loading
+        pending = self.meshes.poll()
+        return self.textures.poll() or pending
+
+    def paint(self):
+        # draws one frame, returns True while placeholders were drawn and the frame should be drawn again
+        self.profiler.begin_frame()
+        with self.profiler.stage("assets"):
+            pending = self.poll_assets()
+
+        # move cam, while running the robot is drawn between the last two simulation steps
+        with self.profiler.stage("camera"):
+            target = self.robot.base_link.xyz
+            if self.simulation is not None and self.simulation.running:
+                x, y, _ = self.simulation.interpolate()
+                target = [x, y, target[2]]
+            self.cam.set_target(target)
+            self.cam.move(self.frame)
+            self.frame.bind()
+            self.frame.upload()
+            if self.culling:
+                # without a viewport height every link is drawn with its finest mesh
+                frustum = Frustum(self.frame.view, self.frame.projection, self.height if self.lod else None)
+            else:
+                frustum = None
+
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)  # refresh screen
+        self.program.use()  # here to make sure the correct one is being used
+
+        # draw light & ground
+        with self.profiler.stage("scene", gpu=True):
+            self.draw_scene(frustum)
+
+        # draw robot
+        with self.profiler.stage("robot", gpu=True):
+            self.draw_robot(frustum)
+        self.profiler.end_frame()
+        return pending
+
+    def draw_scene(self, frustum=None):
+        # the program has to be in use, only what is inside the frustum (None - everything) is drawn
+        self.scene.material.bind(self.textures)
+        self.program.set_int("switchColorToTex", 1)
+        self.scene.draw_scene(frustum)
+        self.program.set_int("switchColorToTex", 0)
+
+    def draw_robot(self, frustum=None):
+        self.render_list.update(frustum)
+        self.render_list.draw()
+
+    def add_sensor(self, sensor):
+        # GL resources of the sensor are created now or, before initialize, by initialize
+        self.sensors.append(sensor)
+        if self.initialized:
+            sensor.attach(self)
+
+    def render_sensors(self, now):
+        # draws the sensors that are due, the context has to be current
+        # now - wall clock time (time.perf_counter()), sensors keep their rate in it
+        with self.profiler.stage("sensors", gpu=True):
+            for sensor in self.sensors:
+                sensor.update(self, now)
+
+    def resize(self, w, h):
+        glViewport(0, 0, w, h)
+        self.height = h
+        projection_on_resize = pyrr.matrix44.create_perspective_projection(
+            fovy=45.0, aspect=w / h,
+            near=0.1, far=100.0)
+        self.frame.projection[:] = projection_on_resize
+
+
+class Scene:
+    def __init__(self, meshes):
+        self.ground = meshes.acquire(GROUND_MODEL)
+        self.ground_color = [0.5, 0.5, 0.5, 1.0]
+        self.ground_scale = pyrr.matrix44.create_from_scale(pyrr.Vector3([10, 0.0, 7]))
+        self.ground_position = pyrr.matrix44.create_from_translation(pyrr.Vector3([0, 0, 0]))
+        self.ground_model = pyrr.matrix44.multiply(self.ground_scale, self.ground_position)
+        self.ground_batch = Batch(self.ground, 1)
+        self.ground_batch.set_models([self.ground_model])
+        self.ground_batch.colors[0] = self.ground_color
+        self.ground_batch.upload()
+        self.material = Material("road", ROAD_MAPS)
+
+        self.light = Light([0., 3., 1.], [1., 1., 1.])
+
+    def draw_scene(self, frustum=None):
+        if self.ground_batch.cull(frustum):
+            self.ground_batch.upload()
+        self.ground_batch.draw()
+
+    def destroy(self, meshes):
+        self.ground_batch.destroy()
+        meshes.release(GROUND_MODEL)
+
+
+class Light:
+    def __init__(self, position, color):
+        self.position = pyrr.Vector3(position)
+        self.color = pyrr.Vector3(color)
+
+
+class Camera:
+    def __init__(self):
+        self.pos = pyrr.Vector3([0., 2, 3])
+        self.target = pyrr.Vector3([0., 0., 0.])
+        self.up = pyrr.Vector3([0, 1, 0])
+        self.look_at = self.make_look_at()
+        self.deg = 270
+
+    def set_pos(self):
+        #self.pos = pyrr.Vector3([x, y, z])
+        self.look_at = self.make_look_at()
+
+    def set_target(self, xyz):
+        self.target = pyrr.Vector3([xyz[0], xyz[2], xyz[1]])
+        self.look_at = self.make_look_at()
+
+    def make_look_at(self):
+        return pyrr.matrix44.create_look_at(self.pos, self.target, self.up)
+
+    def move(self, frame):
+        # view matrix and position for the next frame's uniform buffer
+        frame.view[:] = self.look_at
+        frame.view_position[:] = self.pos
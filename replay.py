@@ -0,0 +1,60 @@
+import numpy as np
+
+from recorder import open_log
+
+# no OpenGL or Qt imports here, logs are replayed headless too
+
+
+class LogReplay:
+    # a log written by PoseRecorder opened for random access, records are read from the memory map only when
+    # they are shown, so opening does not depend on the length of the log
+    # times of a log never decrease (PoseRecorder continues the times of the log it appends to)
+    def __init__(self, path, stride=1024):
+        # stride - records between the samples the time index is built from
+        self.path = path
+        self.description, self.records = open_log(path)
+        self.count = len(self.records)
+        if self.count == 0:
+            self.start = self.end = 0.0
+            return
+        self.times = self.records["t"]
+        self.start = float(self.times[0])
+        self.end = float(self.times[-1])
+        self.build_index(stride)
+
+    def build_index(self, stride):
+        # the span of the log is split into equally long buckets, every bucket knows the range of records
+        # its times are in, bounded by samples of every stride-th record, the only records read on opening
+        self.stride = stride
+        samples = np.array(self.times[::stride])
+        buckets = len(samples)
+        self.width = (self.end - self.start) / buckets or 1.0
+        edges = self.start + self.width * np.arange(buckets + 1)
+        edges[-1] = self.end  # start + width * buckets may round to just below it
+        # the last sample at or before the start of a bucket and the first one after its end
+        self.lower = np.maximum(np.searchsorted(samples, edges[:-1], side="right") - 1, 0) * stride
+        self.upper = np.minimum(np.searchsorted(samples, edges[1:], side="right") * stride, self.count)
+        self.upper[-1] = self.count  # the last bucket holds the end of the log
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def index_at(self, t):
+        # last record at or before time t, the first one for earlier times
+        if self.count == 0:
+            raise IndexError("the log has no records")
+        t = min(max(t, self.start), self.end)
+        bucket = min(int((t - self.start) / self.width), len(self.lower) - 1)
+        low, high = self.lower[bucket], self.upper[bucket]
+        return low + int(np.searchsorted(self.times[low:high], t, side="right")) - 1
+
+    def apply(self, robot, i):
+        # places the robot as it was at record i, Robot.move is not run
+        record = self.records[i]
+        robot.update_values(record["angles"], record["speeds"])
+        robot.set_pose(float(record["x"]), float(record["y"]), float(record["theta"]))
+
+    def close(self):
+        # the file is unmapped once nothing refers to the records any more
+        self.records = self.times = None
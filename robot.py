@@ -1,21 +1,28 @@
 import subprocess
-import xml.etree.ElementTree as Et
 from link import *
 from joint import *
+from kinematics import Kinematics
+import robot_cache
+import urdf_loader
+import xacro_expander
 import numpy as np
 import math
-from operator import add
 
 
 class Robot:
 
-    def __init__(self, file_name):
-        urdf_links, urdf_joints, materials = self.extract_xacro(file_name)
-        self.links = self.create_link_objects(urdf_links, materials)
-        self.joints = self.create_joint_objects(urdf_joints)
+    def __init__(self, file_name, xacro_args=(), model=None):
+        # xacro_args - "name:=value" arguments for xacro
+        # model - robot already read with urdf_loader.load, file_name is not loaded then
+        if model is None:
+            model = self.load_model(file_name, xacro_args)
+        self.links = self.create_link_objects(model["links"])
+        self.joints = self.create_joint_objects(model["joints"])
         # determine which link is the base link of a robot
-        self.base_link = self.find_base_link(self.links, self.joints)
+        self.base_link = self.find_base_link(self.links, model["base_link"])
         self.connect_joints_links(self.links, self.joints)
+        # cached world transforms of all links
+        self.kinematics = Kinematics(self.base_link)
         self.number_of_wheels = 0
         self.wheels = []  # joints
         for j in self.joints:
@@ -23,39 +30,38 @@ class Robot:
                 self.number_of_wheels += 1
                 self.wheels.append(j)
         self.theta = self.base_link.rpy[2]
+        # kinematic constants of differential drive robots, wheels do not move relative to the body
+        if self.number_of_wheels == 2:
+            self.wheel_radii = [wheel.child.radius for wheel in self.wheels]
+            self.wheel_separation = math.dist(self.wheels[0].xyz, self.wheels[1].xyz)
         print("*** robot vytvoreny *** ")
 
-    def move(self):
+    def move(self, dt=1.0):
         # for differential drive robots only ( 2 wheels)
+        # wheel speeds are applied for dt, the default of 1 moves by one whole speed unit
         if self.number_of_wheels != 2:
             return
         wheel1 = self.wheels[0]
         wheel2 = self.wheels[1]
+        r1, r2 = self.wheel_radii
 
-        # calculate distance between wheels
-        l1 = list(map(add, self.base_link.xyz, wheel1.xyz))
-        l2 = list(map(add, self.base_link.xyz, wheel2.xyz))
-
-        dbw = math.sqrt(math.pow(l2[0] - l1[0], 2) +
-                        math.pow(l2[1] - l1[1], 2) +
-                        math.pow(l2[2] - l1[2], 2))
-        l1 = dbw/2
-        l2 = dbw/2
+        # distance between wheels
+        l1 = self.wheel_separation / 2
+        l2 = self.wheel_separation / 2
 
         # each wheel's contribution to movement (change)  in local reference frame
-        xR1 = 0.5 * wheel1.child.radius * wheel1.speed
-        xR2 = 0.5 * wheel2.child.radius * wheel2.speed
+        xR1 = 0.5 * r1 * wheel1.speed * dt
+        xR2 = 0.5 * r2 * wheel2.speed * dt
         xR = xR1 + xR2
         yR = 0
 
         # each wheel's contribution to robot's rotation
-        omega1 = wheel1.child.radius * wheel1.speed / (2 * l1)
-        omega2 = -wheel2.child.radius * wheel2.speed / (2 * l2)
+        omega1 = r1 * wheel1.speed * dt / (2 * l1)
+        omega2 = -r2 * wheel2.speed * dt / (2 * l2)
         omega = omega1 + omega2
 
         # new local position
         xiR = pyrr.Vector3([xR, yR, omega])
-        print(f"new local {xiR}")
 
         # new global position
         rotation_matrix = np.array([[np.cos(self.theta), -np.sin(self.theta), 0],
@@ -65,12 +71,47 @@ class Robot:
                        self.base_link.xyz[1],
                        self.theta])
         xiI = xiI + (rotation_matrix @ xiR)
-        self.base_link.xyz[0] = xiI[0]
-        self.base_link.xyz[1] = xiI[1]
-        xiI[2] = xiI[2] % math.radians(360)
-        self.base_link.update_rotation(xiI[2])
-        self.base_link.update_position(xiI[0], 0.1, xiI[1])
-        self.theta = xiI[2]
+        self.set_pose(xiI[0], xiI[1], xiI[2])
+
+    def set_pose(self, x, y, theta):
+        # places the base link on the ground, x and y in the URDF frame, theta (yaw) in radians
+        self.base_link.xyz[0] = x
+        self.base_link.xyz[1] = y
+        theta = theta % math.radians(360)
+        self.base_link.update_rotation(theta)
+        self.base_link.update_position(x, 0.1, y)
+        self.theta = theta
+
+    def rollout(self, speed_profile, dt):
+        # whole trajectory for a sequence of wheel speed commands, the robot itself does not move
+        # speed_profile - (..., T, 2) wheel speeds held for dt each, leading axes are independent candidates
+        # returns (..., T + 1, 3) poses [x, y, theta], the first one is the current pose
+        # unlike the Euler step in move, every step is integrated exactly along its arc
+        if self.number_of_wheels != 2:
+            raise ValueError("rollout is for differential drive robots only (2 wheels)")
+        speeds = np.asarray(speed_profile, dtype=np.float64)
+        r1, r2 = self.wheel_radii
+
+        # forward and angular speed of every step
+        v = 0.5 * r1 * speeds[..., 0] + 0.5 * r2 * speeds[..., 1]
+        omega = (r1 * speeds[..., 0] - r2 * speeds[..., 1]) / self.wheel_separation
+
+        # heading at the start of every step
+        dtheta = omega * dt
+        theta_end = self.theta + np.cumsum(dtheta, axis=-1)
+        theta_start = theta_end - dtheta
+
+        # chord of the arc travelled in a step, v * dt * sin(dtheta / 2) / (dtheta / 2)
+        # np.sinc is sin(pi x) / (pi x), so straight steps (dtheta = 0) need no special case
+        chord = v * dt * np.sinc(dtheta / (2 * np.pi))
+        heading = theta_start + dtheta / 2
+
+        poses = np.empty(speeds.shape[:-2] + (speeds.shape[-2] + 1, 3))
+        poses[..., 0, :] = [self.base_link.xyz[0], self.base_link.xyz[1], self.theta]
+        poses[..., 1:, 0] = self.base_link.xyz[0] + np.cumsum(chord * np.cos(heading), axis=-1)
+        poses[..., 1:, 1] = self.base_link.xyz[1] + np.cumsum(chord * np.sin(heading), axis=-1)
+        poses[..., 1:, 2] = theta_end % math.radians(360)
+        return poses
 
     def update_values(self, pry, speeds):
         for i, wheel in enumerate(self.wheels):
@@ -85,123 +126,76 @@ class Robot:
             joint.describe()
             joint.child.describe()
 
-    def extract_xacro(self, file_name):
-        # runs xacro
-        # reads complete urdf - links and joints
-        urdf_links = list()
-        urdf_joints = list()
-        materials = {}
-
+    def load_model(self, file_name, xacro_args=()):
+        # links, joints and materials of a robot as plain values
+        # taken from the cache when neither the xacro files nor the arguments changed
+        key = robot_cache.cache_key(f'data/{file_name}', xacro_args)
+        model = robot_cache.load(key)
+        if model is not None:
+            print("*** nacitavam z cache *** " + file_name)
+            return model
+
+        urdf_file = self.extract_xacro(file_name, xacro_args)
+        model = urdf_loader.load(urdf_file)
+        robot_cache.store(key, urdf_file, model)
+        return model
+
+    def extract_xacro(self, file_name, xacro_args=()):
+        # expands xacro, returns complete urdf
         print("*** nacitavam *** " + file_name)
+        try:
+            # in-process, no ROS needed for the constructs used in data/
+            return xacro_expander.expand(f'data/{file_name}', xacro_args)
+        except xacro_expander.XacroUnsupported as e:
+            print(f"xacro_expander: {e}, running xacro")
         # result = subprocess.run(['/opt/ros/noetic/bin/xacro', f'data/{file_name}'], stdout=subprocess.PIPE)
-        result = subprocess.run(['./xacro.sh', f'data/{file_name}'], stdout=subprocess.PIPE)
-        urdf_file = result.stdout.decode('utf-8')
-        root = Et.fromstring(urdf_file)
-
-        for link in root.iter("link"):
-            urdf_links.append(link)
-
-        for joint in root.iter("joint"):
-            urdf_joints.append(joint)
-
-        for child in root:
-            if child.tag == "material":
-                name = child.attrib["name"]
-                value = child[0].attrib["rgba"]
-                materials[name] = value
-
-        return urdf_links, urdf_joints, materials
-
-    def create_link_objects(self, urdf_links, materials):
-        # extract values from urdf
+        result = subprocess.run(['./xacro.sh', f'data/{file_name}', *xacro_args], stdout=subprocess.PIPE)
+        return result.stdout.decode('utf-8')
 
+    def create_link_objects(self, descriptions):
         links = list()
-        for link in urdf_links:
-            shape = link.find("visual").find('geometry')[0].tag
+        for link in descriptions:
+            shape = link["shape"]
 
             if shape == 'box':
-                name = link.attrib.get("name")
-                dimensions = string_split(link.find("visual").find('geometry')[0].attrib.get("size"))
-                length = dimensions[0]
-                width = dimensions[1]
-                height = dimensions[2]
-                xyz = link.find("visual").find("origin").attrib.get("xyz")
-                rpy = link.find("visual").find("origin").attrib.get("rpy")
-                color = link.find("visual").find("material").attrib.get("name")
-                color = materials[color]
-                links.append(Box(name, length, width, height, xyz, rpy, color))
+                length, width, height = link["size"]
+                links.append(Box(link["name"], length, width, height, link["xyz"], link["rpy"], link["color"]))
 
             if shape == 'cylinder':
-                name = link.attrib.get("name")
-                radius = link.find("visual").find('geometry')[0].attrib.get("radius")
-                length = link.find("visual").find('geometry')[0].attrib.get("length")
-                xyz = link.find("visual").find("origin").attrib.get("xyz")
-                rpy = link.find("visual").find("origin").attrib.get("rpy")
-                color = link.find("visual").find("material").attrib.get("name")
-                color = materials[color]
-                links.append(Cylinder(name, float(radius), float(length), xyz, rpy, color))
+                links.append(Cylinder(link["name"], link["radius"], link["length"], link["xyz"], link["rpy"],
+                                      link["color"]))
 
             if shape == 'sphere':
-                name = link.attrib.get("name")
-                radius = link.find("visual").find('geometry')[0].attrib.get("radius")
-                xyz = link.find("visual").find("origin").attrib.get("xyz")
-                rpy = link.find("visual").find("origin").attrib.get("rpy")
-                color = link.find("visual").find("material").attrib.get("name")
-                color = materials[color]
-                links.append(Sphere(name, float(radius), xyz, rpy, color))
+                links.append(Sphere(link["name"], link["radius"], link["xyz"], link["rpy"], link["color"]))
+            links[-1].set_collisions(link["collisions"])
         return links
 
-    def create_joint_objects(self, urdf_joints):
-        # extract values from urdf
+    def create_joint_objects(self, descriptions):
         joints = list()
-        for joint in urdf_joints:
-            name = joint.get("name")
-            jtype = joint.get("type")
-            parent = joint.find("parent").get("link")
-            child = joint.find("child").get("link")
-            xyz = joint.find("origin").get("xyz")
-            rpy = joint.find("origin").get("rpy")
-            joints.append(Joint(name, jtype, parent, child, xyz, rpy))
+        for joint in descriptions:
+            joints.append(Joint(joint["name"], joint["type"], joint["parent"], joint["child"], joint["xyz"],
+                                joint["rpy"]))
         return joints
 
-    def find_base_link(self, links, joints):
-        # finds the base_link of a robot in urdf and returns object Box
-        link_names = list()
+    def find_base_link(self, links, base_link_name):
+        # the base_link of a robot, the only link that is not anyone's child (checked by urdf_loader)
         for link in links:
-            link_names.append(link.name)
-
-        joint_children = list()
-        for joint in joints:
-            joint_children.append(joint.child)
-
-        base_link = None
-        for name in link_names:  # base link is not anyone's child
-            if name not in joint_children:
-                base_link = name
-        for link in links:
-            if base_link == link.name:
+            if link.name == base_link_name:
                 link.is_base_link = True
-                base_link = link
-
-        return base_link
+                return link
+        return None
 
     def connect_joints_links(self, links, joints):
         # create tree structure of the robot
+        links_by_name = {link.name: link for link in links}
         for joint in joints:
-            # connecting links to joints
-            for link in links:
-                # connect links to joints as children
-                if link.name == joint.child:
-                    joint.child = link
-                # connect links to joints as parents
-                if link.name == joint.parent:
-                    joint.parent = link
-
-        # connect joints to links
-        for link in links:
-            for joint in joints:
-                if link.name == joint.parent.name or link.name == joint.child.name:
-                    link.connected_joints.append(joint)
+            # connecting links to joints as parents and children
+            joint.child = links_by_name[joint.child]
+            joint.parent = links_by_name[joint.parent]
+            # connect joints to links, in the order of the joints
+            joint.parent.connected_joints.append(joint)
+            if joint.child is not joint.parent:
+                joint.child.connected_joints.append(joint)
 
         # print("1==============================")
         # for joint in joints:
@@ -218,7 +212,3 @@ class Robot:
         # for link in links:
         #     print(link.is_base_link)
 
-
-def string_split(string_list):
-    # splits string into floats, deletes spaces
-    return [float(item) for item in string_list.split()]
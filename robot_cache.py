@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import re
+
+# expanded URDF and compiled robot model of every xacro file version that was loaded
+CACHE_DIR = ".cache/robots"
+# bump when the layout of the stored model changes
+MODEL_VERSION = 3
+
+INCLUDE = re.compile(r"<xacro:include\s[^>]*filename\s*=\s*[\"']([^\"']+)[\"']")
+
+
+def source_files(path):
+    # the xacro file and every file it includes, directly or through other includes
+    files = []
+    pending = [os.path.normpath(path)]
+    while pending:
+        file = pending.pop()
+        if file in files:
+            continue
+        files.append(file)
+        if not os.path.exists(file):
+            continue  # xacro reports the missing include
+        with open(file, 'r') as f:
+            text = f.read()
+        for include in INCLUDE.findall(text):
+            if "$(" in include:
+                continue  # $(find package) paths are only known to ROS, hashed as text of the including file
+            pending.append(os.path.normpath(os.path.join(os.path.dirname(file), include)))
+    return files
+
+
+def cache_key(path, xacro_args=()):
+    # hash of the contents of all source files and of the xacro arguments
+    digest = hashlib.sha256(f"model v{MODEL_VERSION}\n".encode("utf-8"))
+    for file in source_files(path):
+        digest.update(file.encode("utf-8") + b"\0")
+        if os.path.exists(file):
+            with open(file, 'rb') as f:
+                digest.update(f.read())
+        digest.update(b"\0")
+    for arg in xacro_args:
+        digest.update(arg.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def load(key):
+    # compiled model stored under the key, None when it is not cached
+    try:
+        with open(os.path.join(CACHE_DIR, key + ".json"), 'r') as f:
+            model = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if model.get("version") != MODEL_VERSION:
+        return None
+    return model
+
+
+def store(key, urdf, model):
+    # writes the expanded URDF and the compiled model, a failure only means the next start is slower
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        write_atomic(os.path.join(CACHE_DIR, key + ".urdf"), urdf)
+        write_atomic(os.path.join(CACHE_DIR, key + ".json"), json.dumps(dict(model, version=MODEL_VERSION),
+                                                                         separators=(",", ":")))
+    except OSError:
+        pass
+
+
+def write_atomic(path, text):
+    # a concurrent reader never sees half a file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,181 @@
+from OpenGL.GL import *
+from OpenGL.GL.shaders import compileShader
+import numpy as np
+import ctypes
+import hashlib
+import os
+
+import profiler
+
+# linked programs saved with glGetProgramBinary, one file per (sources, driver)
+CACHE_DIR = ".cache/shaders"
+
+# uniform block shared by every program, updated once per frame (std140 layout)
+# mat4 projection, mat4 view, vec3 lightPos, vec3 lightColor, vec3 viewPos (vec3 take 16 bytes each)
+FRAME_BLOCK = "Frame"
+FRAME_BINDING = 0
+FRAME_SIZE = 16 + 16 + 4 + 4 + 4  # floats
+
+
+class ShaderManager:
+    # one program per pair of shader files, shared by everything drawn with it
+    def __init__(self):
+        self.programs = {}
+
+    def program(self, vertex_filepath, fragment_filepath):
+        key = (os.path.normpath(vertex_filepath), os.path.normpath(fragment_filepath))
+        if key not in self.programs:
+            self.programs[key] = Program(vertex_filepath, fragment_filepath)
+        return self.programs[key]
+
+    def destroy(self):
+        for program in self.programs.values():
+            program.destroy()
+        self.programs.clear()
+
+
+class Program:
+    def __init__(self, vertex_filepath, fragment_filepath):
+        with open(vertex_filepath, 'r') as f:
+            vertex_src = f.read()
+        with open(fragment_filepath, 'r') as f:
+            fragment_src = f.read()
+        self.program = load_program(vertex_src, fragment_src)
+        self.locations = {}  # uniform name -> location, looked up once
+
+        # the frame block is taken from the shared uniform buffer
+        block = glGetUniformBlockIndex(self.program, FRAME_BLOCK)
+        if block != GL_INVALID_INDEX:
+            glUniformBlockBinding(self.program, block, FRAME_BINDING)
+
+    def use(self):
+        glUseProgram(self.program)
+
+    def location(self, name):
+        if name not in self.locations:
+            self.locations[name] = glGetUniformLocation(self.program, name)
+        return self.locations[name]
+
+    def set_int(self, name, value):
+        # the program has to be in use
+        glUniform1i(self.location(name), value)
+        profiler.count("uniform_uploads")
+
+    def destroy(self):
+        glDeleteProgram(self.program)
+
+
+class FrameUniforms:
+    # camera and light shared by all programs through one uniform buffer
+    # set the values any time, upload() sends them once per frame when something changed
+    def __init__(self):
+        self.data = np.zeros(FRAME_SIZE, dtype=np.float32)
+        # matrices are stored like glUniformMatrix4fv with transpose GL_FALSE would pass them
+        self.projection = self.data[0:16].reshape(4, 4)
+        self.view = self.data[16:32].reshape(4, 4)
+        self.light_position = self.data[32:35]
+        self.light_color = self.data[36:39]
+        self.view_position = self.data[40:43]
+
+        self.ubo = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferData(GL_UNIFORM_BUFFER, self.data.nbytes, None, GL_DYNAMIC_DRAW)
+        self.bind()
+        self.uploaded = None
+
+    def bind(self):
+        # makes these the values programs read, when more than one camera draws (sensors)
+        glBindBufferBase(GL_UNIFORM_BUFFER, FRAME_BINDING, self.ubo)
+
+    def upload(self):
+        if self.uploaded is not None and np.array_equal(self.uploaded, self.data):
+            return
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, self.data.nbytes, self.data)
+        self.uploaded = self.data.copy()
+        profiler.count("uniform_uploads")
+
+    def destroy(self):
+        glDeleteBuffers(1, (self.ubo,))
+
+
+def load_program(vertex_src, fragment_src):
+    # linked program, taken from the binary cache when this driver already linked these sources
+    path = cache_path(vertex_src, fragment_src)
+    program = load_binary(path)
+    if program is not None:
+        return program
+
+    vertex = compileShader(vertex_src, GL_VERTEX_SHADER)
+    fragment = compileShader(fragment_src, GL_FRAGMENT_SHADER)
+    program = glCreateProgram()
+    glAttachShader(program, vertex)
+    glAttachShader(program, fragment)
+    if binaries_supported():
+        glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+    glLinkProgram(program)
+    glDetachShader(program, vertex)
+    glDetachShader(program, fragment)
+    glDeleteShader(vertex)
+    glDeleteShader(fragment)
+    if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+        log = glGetProgramInfoLog(program)
+        glDeleteProgram(program)
+        raise RuntimeError(f"shader program link failure: {log}")
+    store_binary(path, program)
+    return program
+
+
+def load_binary(path):
+    # None when there is no usable binary, a driver update can make an old one invalid
+    if not binaries_supported():
+        return None
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return None
+    if len(data) < 4:
+        return None
+    binary_format = int(data[:4].view(np.uint32)[0])
+    program = glCreateProgram()
+    glProgramBinary(program, binary_format, data[4:], len(data) - 4)
+    if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+        glDeleteProgram(program)
+        return None
+    return program
+
+
+def store_binary(path, program):
+    # a failure only means the next start compiles again
+    if not binaries_supported():
+        return
+    length = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+    if length <= 0:
+        return
+    binary = np.empty(length, dtype=np.uint8)
+    written = GLsizei()
+    binary_format = GLenum()
+    glGetProgramBinary(program, length, ctypes.byref(written), ctypes.byref(binary_format), binary)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(np.uint32(binary_format.value).tobytes())
+            f.write(binary[:written.value].tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def binaries_supported():
+    return glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+
+
+def cache_path(vertex_src, fragment_src):
+    # cache key - both sources and the driver that linked them
+    digest = hashlib.sha256()
+    for text in (vertex_src, fragment_src):
+        digest.update(text.encode("utf-8") + b"\0")
+    for name in (GL_VENDOR, GL_RENDERER, GL_VERSION):
+        digest.update((glGetString(name) or b"") + b"\0")
+    return os.path.join(CACHE_DIR, digest.hexdigest() + ".bin")
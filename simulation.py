@@ -0,0 +1,82 @@
+import math
+import time
+
+
+class Simulation:
+    # steps a robot with a fixed time step, independent of how often the view is repainted
+    # the view draws the robot interpolated between the last two steps
+
+    def __init__(self, robot, dt=1 / 60, collisions=None, recorder=None):
+        # collisions - CollisionWorld the robot was added to, checked after every step
+        # recorder - PoseRecorder of the robot, records the state after every step
+        self.robot = robot
+        self.collisions = collisions
+        self.recorder = recorder
+        self.contacts = None  # of the last step
+        self.dt = dt
+        self.time = 0.0  # simulated seconds
+        self.steps = 0
+        self.accumulator = 0.0  # real time not yet simulated
+        self.running = False
+        self.previous = self.current = self.pose()
+
+    def pose(self):
+        return self.robot.base_link.xyz[0], self.robot.base_link.xyz[1], self.robot.theta
+
+    def step(self):
+        # one fixed step, wheel speeds are per second
+        self.previous = self.current
+        self.robot.move(self.dt)
+        if self.collisions is not None:
+            # the robot is pushed back out of whatever it ran into
+            self.contacts = self.collisions.step()
+        self.current = self.pose()
+        self.time += self.dt
+        self.steps += 1
+        self.record()
+
+    def record(self):
+        # also for moves made outside of step
+        if self.recorder is not None:
+            self.recorder.record(self.time)
+
+    def advance(self, elapsed, max_steps=10):
+        # real time mode - simulate the elapsed wall clock time in whole steps, the rest is carried over
+        # at most max_steps per call, so a slow frame does not make the next one even slower
+        self.accumulator += elapsed
+        steps = 0
+        while self.accumulator >= self.dt and steps < max_steps:
+            self.step()
+            self.accumulator -= self.dt
+            steps += 1
+        if steps == max_steps:
+            self.accumulator = min(self.accumulator, self.dt)
+        return steps
+
+    def run_for(self, budget):
+        # faster than real time mode - step for budget seconds of wall clock time without drawing
+        end = time.perf_counter() + budget
+        steps = 0
+        while time.perf_counter() < end:
+            self.step()
+            steps += 1
+        self.accumulator = 0.0
+        # no real time is left over to interpolate with, the last step is drawn as it is
+        self.previous = self.current
+        return steps
+
+    def interpolate(self, alpha=None):
+        # places the drawn robot between the last two steps, alpha 0 - previous, 1 - current
+        # only the drawn transform changes, base_link.xyz and theta keep the simulated state
+        if alpha is None:
+            alpha = min(self.accumulator / self.dt, 1.0)
+        x0, y0, theta0 = self.previous
+        x1, y1, theta1 = self.current
+        # shortest way around the circle, theta wraps at 360 degrees
+        dtheta = (theta1 - theta0 + math.pi) % (2 * math.pi) - math.pi
+        x = x0 + (x1 - x0) * alpha
+        y = y0 + (y1 - y0) * alpha
+        theta = (theta0 + dtheta * alpha) % (2 * math.pi)
+        self.robot.base_link.update_rotation(theta)
+        self.robot.base_link.update_position(x, 0.1, y)
+        return x, y, theta
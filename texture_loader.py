@@ -1,24 +1,101 @@
 from OpenGL.GL import *
 from PIL import Image
+import numpy as np
+import hashlib
+import os
+import shutil
+import threading
 
+# on-disk cache of flipped RGB mip chains, one directory of .npy files (one per level) per texture version
+CACHE_DIR = ".cache/textures"
+# largest width or height that is uploaded, None - full resolution
+# smaller values save memory, the levels above it are simply not uploaded
+MAX_SIZE = None
 
-def load_texture(filepath, texture):
+# 1x1 grey mip chain drawn until the real texture is decoded
+PLACEHOLDER = [np.full((1, 1, 3), 128, dtype=np.uint8)]
+
+
+def load_texture(filepath, texture, max_size=MAX_SIZE):
+    return upload_texture(texture, decode_texture(filepath, max_size))
+
+
+def decode_texture(filepath, max_size=MAX_SIZE):
+    # file I/O and decoding only, no OpenGL calls, safe to run on a worker thread
+    # returns the mip chain as (height, width, 3) uint8 arrays, largest first, memory mapped from the cache
+    levels = load_mip_chain(filepath)
+    if max_size is not None:
+        # the level that fits and all smaller ones, never less than the last level
+        first = next((i for i, level in enumerate(levels) if max(level.shape[:2]) <= max_size), len(levels) - 1)
+        levels = levels[first:]
+    return levels
+
+
+def upload_texture(texture, levels):
+    # mip chain from decode_texture, every level is uploaded as it is, needs the GL context
     glBindTexture(GL_TEXTURE_2D, texture)
-    glColor3f(1.0, 1.0, 1.0)
     # texture wrapping parameters
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
 
     # texture filtering parameters
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, 0)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
 
-    # load image
-    img = Image.open(filepath)
-    img = img.transpose(Image.FLIP_TOP_BOTTOM)
-    # 24 bit jpg RGB
-    # 24 bit, 32 bit png RGBA
-    img_data = img.convert("RGB").tobytes()
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, img.width, img.height, 0, GL_RGB, GL_UNSIGNED_BYTE, img_data)
-    glGenerateMipmap(GL_TEXTURE_2D)
+    # RGB rows are not padded to 4 bytes
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    for i, level in enumerate(levels):
+        height, width = level.shape[:2]
+        glTexImage2D(GL_TEXTURE_2D, i, GL_RGB8, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, level)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
     return texture
+
+
+def load_mip_chain(filepath):
+    # mip chain of an image file, decoded only when there is no cache entry for this file version
+    path = cache_path(filepath)
+    try:
+        # levels are 0.npy, 1.npy, ..., other files in the directory are not counted
+        count = sum(1 for name in os.listdir(path) if name.endswith(".npy") and name[:-4].isdigit())
+        levels = [np.load(os.path.join(path, f"{i}.npy"), mmap_mode="r") for i in range(count)]
+        # a complete chain goes down to 1x1, an empty or partial one is decoded again
+        if levels and max(levels[-1].shape[:2]) == 1:
+            return levels
+    except (OSError, ValueError):
+        pass  # not cached yet or damaged cache entry, decode again and overwrite it
+
+    levels = make_mip_chain(filepath)
+    # write to a temporary directory first so a concurrent reader never sees part of the chain
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(tmp_path)
+        for i, level in enumerate(levels):
+            np.save(os.path.join(tmp_path, f"{i}.npy"), level)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)  # read-only checkout, the cache is only an optimization
+    return levels
+
+
+def make_mip_chain(filepath):
+    # flipped RGB image and every level down to 1x1, each half the size of the one before (box filter)
+    img = Image.open(filepath).convert("RGB")
+    # OpenGL expects the bottom row first
+    img = img.transpose(Image.FLIP_TOP_BOTTOM)
+    levels = [np.asarray(img)]
+    while img.width > 1 or img.height > 1:
+        img = img.resize((max(1, img.width // 2), max(1, img.height // 2)), Image.BOX)
+        levels.append(np.asarray(img))
+    return levels
+
+
+def cache_path(filepath):
+    # cache key - absolute path, modification time and size of the image
+    stat = os.stat(filepath)
+    key = f"{os.path.abspath(filepath)}|{stat.st_mtime_ns}|{stat.st_size}|rgb8"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{digest}")
@@ -0,0 +1,166 @@
+import io
+import xml.etree.ElementTree as Et
+
+# reads a complete URDF into the plain model Robot is built from:
+# {"materials": {name: rgba}, "links": [description], "joints": [description], "base_link": name}
+# the document is streamed, every link and joint is turned into a description as soon as it is parsed
+# and dropped, so memory and time grow linearly with the number of links
+
+
+class UrdfError(ValueError):
+    # the URDF does not describe a robot that can be loaded
+    pass
+
+
+def load(urdf_text):
+    materials = {}
+    links = []
+    joints = []
+    link_materials = []  # material of every link, materials may be defined after the links using them
+
+    root = None
+    depth = 0
+    for event, element in Et.iterparse(io.StringIO(urdf_text), events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue  # only direct children of <robot> are complete descriptions
+        if element.tag == "link":
+            description, material = describe_link(element, materials)
+            links.append(description)
+            link_materials.append(material)
+        elif element.tag == "joint":
+            joints.append(describe_joint(element))
+        elif element.tag == "material":
+            define_material(element, materials)
+        root.clear()  # everything read so far is described, keep the tree empty
+
+    for description, material in zip(links, link_materials):
+        if description["color"] is None:
+            if material not in materials:
+                raise UrdfError(f"link {description['name']} uses undefined material {material}")
+            description["color"] = materials[material]
+
+    base_link, _ = link_tree(links, joints)
+    return {"materials": materials, "links": links, "joints": joints, "base_link": base_link}
+
+
+def describe_link(element, materials):
+    # description of a <link>, the colour is None until its named material is known
+    name = element.get("name")
+    visual = element.find("visual")
+    if visual is None:
+        raise UrdfError(f"link {name} has no <visual>")
+    geometry = visual.find("geometry")
+    if geometry is None or len(geometry) == 0:
+        raise UrdfError(f"link {name} has no <geometry>")
+    shape = geometry[0]
+    origin = visual.find("origin")
+    xyz, rpy = origin_values(origin)
+
+    material = visual.find("material")
+    if material is None:
+        raise UrdfError(f"link {name} has no <material>")
+    material_name = material.get("name")
+    if material.find("color") is not None:
+        define_material(material, materials)
+    if material_name is None:
+        color = material.find("color").get("rgba")  # unnamed inline colour
+    else:
+        color = materials.get(material_name)
+
+    description = {"name": name, "shape": shape.tag, "xyz": xyz, "rpy": rpy, "color": color}
+    describe_shape(name, shape, description)
+    # collision shapes, {"shape", "xyz", "rpy"} and dimensions like the visual, links may have none or several
+    description["collisions"] = [describe_collision(name, collision) for collision in element.findall("collision")]
+    return description, material_name
+
+
+def describe_collision(name, element):
+    geometry = element.find("geometry")
+    if geometry is None or len(geometry) == 0:
+        raise UrdfError(f"collision of link {name} has no <geometry>")
+    xyz, rpy = origin_values(element.find("origin"))
+    description = {"shape": geometry[0].tag, "xyz": xyz, "rpy": rpy}
+    describe_shape(name, geometry[0], description)
+    return description
+
+
+def describe_shape(name, shape, description):
+    # dimensions of a box, cylinder or sphere added to the description
+    if shape.tag == 'box':
+        description["size"] = [float(item) for item in shape.get("size").split()]
+    elif shape.tag == 'cylinder':
+        description["radius"] = float(shape.get("radius"))
+        description["length"] = float(shape.get("length"))
+    elif shape.tag == 'sphere':
+        description["radius"] = float(shape.get("radius"))
+    else:
+        raise UrdfError(f"link {name} has unsupported geometry <{shape.tag}>")
+
+
+def describe_joint(element):
+    name = element.get("name")
+    parent = element.find("parent")
+    child = element.find("child")
+    if parent is None or child is None:
+        raise UrdfError(f"joint {name} needs a <parent> and a <child>")
+    xyz, rpy = origin_values(element.find("origin"))
+    return {"name": name, "type": element.get("type"), "parent": parent.get("link"), "child": child.get("link"),
+            "xyz": xyz, "rpy": rpy}
+
+
+def define_material(element, materials):
+    color = element.find("color")
+    if color is not None:
+        materials[element.get("name")] = color.get("rgba")
+
+
+def origin_values(origin):
+    # xyz and rpy strings of an <origin>, URDF defaults to zeros for missing ones
+    if origin is None:
+        return "0 0 0", "0 0 0"
+    return origin.get("xyz", "0 0 0"), origin.get("rpy", "0 0 0")
+
+
+def link_tree(links, joints):
+    # checks that links and joints form one tree
+    # returns the name of the base link and {link name: indices of the joints it is the parent of}
+    children = {}
+    for link in links:
+        if link["name"] in children:
+            raise UrdfError(f"link {link['name']} is defined twice")
+        children[link["name"]] = []
+
+    parent_joint = {}
+    for i, joint in enumerate(joints):
+        for end in ("parent", "child"):
+            if joint[end] not in children:
+                raise UrdfError(f"joint {joint['name']} refers to undefined link {joint[end]}")
+        if joint["child"] in parent_joint:
+            other = joints[parent_joint[joint['child']]]["name"]
+            raise UrdfError(f"link {joint['child']} is the child of joints {other} and {joint['name']}")
+        parent_joint[joint["child"]] = i
+        children[joint["parent"]].append(i)
+
+    roots = [name for name in children if name not in parent_joint]
+    if len(roots) != 1:
+        if not roots:
+            raise UrdfError("no base link, every link is some joint's child (the joints form a cycle)")
+        raise UrdfError(f"more than one base link: {', '.join(roots[:5])}")
+
+    # with one parent per link, links that can not be reached from the base link are on a cycle
+    reached = {roots[0]}
+    pending = [roots[0]]
+    while pending:
+        for i in children[pending.pop()]:
+            reached.add(joints[i]["child"])
+            pending.append(joints[i]["child"])
+    if len(reached) != len(children):
+        cycle = [name for name in children if name not in reached]
+        raise UrdfError(f"links {', '.join(cycle[:5])} are on a cycle of joints, not connected to {roots[0]}")
+    return roots[0], children
@@ -1,7 +1,9 @@
 import glfw
 from OpenGL.GL import *
-from OpenGL.GL.shaders import compileShader, compileProgram
 import mesh_loader as ml
+from culling import Frustum
+from render_list import Batch, RenderList
+from shader_manager import FrameUniforms, ShaderManager
 from robot import Robot
 import pyrr
 
@@ -17,13 +19,16 @@ class App:
             glfw.terminate()
             raise Exception("glfw window can not be created")
 
+        self.height = 720  # levels of detail are picked by size on screen
         glfw.set_window_pos(self.window, 400, 200)
         glfw.set_window_size_callback(self.window, self.window_resize)  # window resizing
         glfw.make_context_current(self.window)  # openGL context
 
         # create openGL shaders, vertex and fragment
-        self.shader = self.create_shader("shaders/vertex.txt", "shaders/fragment.txt")
-        glUseProgram(self.shader)
+        self.shaders = ShaderManager()
+        self.program = self.shaders.program("shaders/vertex.txt", "shaders/fragment.txt")
+        self.program.use()
+        self.frame = FrameUniforms()
 
         glClearColor(0.1, 0.2, 0.2, 1)
         glEnable(GL_DEPTH_TEST)
@@ -40,21 +45,20 @@ class App:
             pyrr.Vector3([0, 0, 0]),
             pyrr.Vector3([0, 1, 0]))
 
-        # get the uniform's location from shader
-        self.projection_location = glGetUniformLocation(self.shader, "projection")
-        self.view_location = glGetUniformLocation(self.shader, "view")
-        self.model_location = glGetUniformLocation(self.shader, "model")
+        # projection & view matrices for the shader
+        self.frame.projection[:] = self.projection
+        self.frame.view[:] = self.look_at
 
-        # upload the projection & view matrices to the shader
-        glUniformMatrix4fv(self.projection_location, 1, GL_FALSE, self.projection)
-        glUniformMatrix4fv(self.view_location, 1, GL_FALSE, self.look_at)
-
-        self.scene = Scene()
-        glUniform3fv(glGetUniformLocation(self.shader, "lightColor"), 1, self.scene.light.color)
-        glUniform3fv(glGetUniformLocation(self.shader, "lightPos"), 1, self.scene.light.position)
-        glUniform3fv(glGetUniformLocation(self.shader, "viewPos"), 1, self.look_at[0])
+        self.meshes = ml.MeshRegistry()
+        self.scene = Scene(self.meshes)
+        self.frame.light_color[:] = self.scene.light.color
+        self.frame.light_position[:] = self.scene.light.position
+        self.frame.view_position[:] = self.look_at[0][:3]
 
         self.robot = Robot(urdfFilepath)
+        for link in self.robot.links:
+            link.load_mesh(self.meshes)
+        self.render_list = RenderList(self.robot.kinematics)
 
         self.main_loop()
 
@@ -63,60 +67,60 @@ class App:
             glfw.poll_events()  # check for glfw events
 
             glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)  # refresh screen
-            glUseProgram(self.shader)  # here to make sure the correct one is being used
+            self.program.use()  # here to make sure the correct one is being used
+            self.frame.upload()
+            frustum = Frustum(self.frame.view, self.frame.projection, self.height)
 
             # draw robot
-            self.robot.base_link.draw(self.model_location, pyrr.matrix44.create_identity())
+            self.render_list.update(frustum)
+            self.render_list.draw()
 
             # scene floor plane model
-            glUniformMatrix4fv(self.model_location, 1, GL_FALSE, self.scene.ground_model)
-            glBindVertexArray(self.scene.ground.vao)  # bind the VAO that is being drawn
-            glDrawArrays(GL_TRIANGLES, 0, self.scene.ground.vertex_count)
+            if self.scene.ground_batch.cull(frustum):
+                self.scene.ground_batch.upload()
+            self.scene.ground_batch.draw()
 
             glfw.swap_buffers(self.window)  # swap buffers - double buffering
         self.quit()
 
-    def create_shader(self, vertexFilepath, fragmentFilepath):
-        # load shaders from files and compile them to be used as a program
-        with open(vertexFilepath, 'r') as f:
-            vertex_src = f.readlines()
-        with open(fragmentFilepath, 'r') as f:
-            fragment_src = f.readlines()
-
-        shader = compileProgram(
-            compileShader(vertex_src, GL_VERTEX_SHADER),
-            compileShader(fragment_src, GL_FRAGMENT_SHADER)
-        )
-        return shader
-
     def quit(self):
         # free allocated space before exiting
-        glDeleteProgram(self.shader)
+        self.frame.destroy()
+        self.shaders.destroy()
+        self.render_list.destroy()
         for link in self.robot.links:
-            link.mesh.destroy()
-        self.scene.destroy()
+            link.release_mesh(self.meshes)
+        self.scene.destroy(self.meshes)
+        self.meshes.destroy()
         glfw.terminate()
 
     def window_resize(self, window, width, height):
         # window resizing function
         glViewport(0, 0, width, height)
+        self.height = height
         projection_on_resize = pyrr.matrix44.create_perspective_projection(
             fovy=45.0, aspect=width / height,
             near=0.1, far=100.0)
-        glUniformMatrix4fv(self.projection_location, 1, GL_FALSE, projection_on_resize)
+        self.frame.projection[:] = projection_on_resize
 
 
 class Scene:
-    def __init__(self):
-        self.ground = ml.MeshLoader("models/plane.obj", [0.412, 0.412, 0.412, 1.0])
+    def __init__(self, meshes):
+        self.ground = meshes.acquire("models/plane.obj")
+        self.ground_color = [0.412, 0.412, 0.412, 1.0]
         self.ground_scale = pyrr.matrix44.create_from_scale(pyrr.Vector3([10.0, 10.0, 10.0]))
         self.ground_position = pyrr.matrix44.create_from_translation(pyrr.Vector3([0, 0, 0]))
         self.ground_model = pyrr.matrix44.multiply(self.ground_scale, self.ground_position)
+        self.ground_batch = Batch(self.ground, 1)
+        self.ground_batch.set_models([self.ground_model])
+        self.ground_batch.colors[0] = self.ground_color
+        self.ground_batch.upload()
 
         self.light = Light([0., 3., 1.], [1., 1., 1.])
 
-    def destroy(self):
-        self.ground.destroy()
+    def destroy(self, meshes):
+        self.ground_batch.destroy()
+        meshes.release("models/plane.obj")
 
 
 class Light:
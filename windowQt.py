@@ -1,33 +1,38 @@
 import math
+import time
 
 from PyQt6.QtWidgets import (
     QMainWindow, QPushButton, QHBoxLayout,
-    QLabel, QVBoxLayout, QWidget, QLineEdit, QFormLayout
+    QLabel, QVBoxLayout, QWidget, QLineEdit, QFormLayout, QFileDialog, QMessageBox, QSlider
 )
 from PyQt6.QtOpenGLWidgets import QOpenGLWidget
 from PyQt6.QtOpenGL import QOpenGLVersionProfile
-from PyQt6.QtGui import QSurfaceFormat
-from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QFontDatabase, QImage, QPixmap, QSurfaceFormat
+from PyQt6.QtCore import Qt, QTimer
 
 import sys
-from OpenGL.GL import *
-from OpenGL.GL.shaders import compileProgram, compileShader
 
-import mesh_loader as ml
-from texture_loader import load_texture
+from asset_loader import AssetLoader
+from camera_sensor import CameraSensor
+from control_server import ControlServer, ServerError
+from recorder import LogError, PoseRecorder
+from replay import LogReplay
+from renderer import Renderer
 from robot import Robot
-import pyrr
+from simulation import Simulation
 
 
 class Window(QMainWindow):
 
-    def __init__(self):
+    def __init__(self, serve=None):
+        # serve - address external controllers connect to, see control_server.py, no server when None
 
         super().__init__()
 
         try:
             if sys.argv[1] is not None:
                 filepath = str(sys.argv[1])
+                self.robot_file = filepath
                 if ".xacro" in filepath:
                     self.robot = Robot(sys.argv[1])
                 elif ".urdf" in filepath:
@@ -39,10 +44,14 @@ class Window(QMainWindow):
         except ValueError:
             sys.exit("URDF or XACRO file expected")
 
+        # meshes and textures load in the background while the window is being built
+        self.assets = AssetLoader()
+        self.assets.preload_robot(self.robot)
+
         self.setWindowTitle("RobotSim")
 
         # widgets
-        self.ogl_widget = OpenGLWidget(self.robot)
+        self.ogl_widget = OpenGLWidget(self.robot, self.assets)
         self.ogl_widget.setFocusPolicy(Qt.FocusPolicy.ClickFocus)
         wheel_num = self.robot.number_of_wheels
         #self.robot.describe()
@@ -78,6 +87,101 @@ class Window(QMainWindow):
         button_apply_steps = QPushButton("Apply 10x")
         button_apply_steps.clicked.connect(self.button_steps_func)
 
+        # fixed time step simulation, runs on a timer independent of repainting
+        self.simulation = Simulation(self.robot)
+        self.ogl_widget.renderer.simulation = self.simulation
+        self.sim_timer = QTimer(self)
+        self.sim_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.sim_timer.timeout.connect(self.sim_timer_func)
+        self.last_tick = None
+        self.dt_input_field = QLineEdit()
+        self.dt_input_field.setPlaceholderText(f"{self.simulation.dt:.4f}")
+        self.run_button = QPushButton("Run")
+        self.run_button.setCheckable(True)
+        self.run_button.toggled.connect(self.run_button_func)
+        self.fast_button = QPushButton("Fast-forward")
+        self.fast_button.setCheckable(True)
+        self.fast_button.toggled.connect(self.fast_button_func)
+        # state after every step appended to a log file while checked
+        self.record_button = QPushButton("Record")
+        self.record_button.setCheckable(True)
+        self.record_button.toggled.connect(self.record_button_func)
+
+        # a recorded log shown on a timeline instead of the simulation, poses are read from the file
+        self.replay = None
+        self.replay_button = QPushButton("Replay log")
+        self.replay_button.setCheckable(True)
+        self.replay_button.toggled.connect(self.replay_button_func)
+        self.timeline = QSlider(Qt.Orientation.Horizontal)
+        self.timeline.valueChanged.connect(self.timeline_func)
+        self.play_button = QPushButton("Play")
+        self.play_button.setCheckable(True)
+        self.play_button.toggled.connect(self.play_button_func)
+        self.replay_speed = 1.0
+        self.speed_input_field = QLineEdit()
+        self.speed_input_field.setPlaceholderText("1.0")
+        self.speed_input_field.editingFinished.connect(self.speed_input_func)
+        self.replay_label = QLabel()
+        self.replay_timer = QTimer(self)
+        self.replay_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.replay_timer.setInterval(16)
+        self.replay_timer.timeout.connect(self.replay_timer_func)
+        self.replay_widgets = QWidget()
+        replay_layout = QFormLayout()
+        replay_layout.addRow(self.timeline)
+        replay_layout.addRow(self.replay_label)
+        replay_layout.addRow(QLabel("Speed factor"), self.speed_input_field)
+        replay_layout.addRow(self.play_button)
+        self.replay_widgets.setLayout(replay_layout)
+        self.replay_widgets.hide()
+        # controls of the live simulation, disabled while replaying
+        self.live_widgets = [apply_button, self.dt_input_field, self.run_button, self.fast_button,
+                             self.record_button]
+
+        # per stage CPU and GPU times, draw calls and uniform uploads, off until the panel is shown
+        self.profiler_button = QPushButton("Profiler")
+        self.profiler_button.setCheckable(True)
+        self.profiler_button.toggled.connect(self.profiler_button_func)
+        self.profiler_label = QLabel()
+        self.profiler_label.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.profiler_label.hide()
+        self.export_button = QPushButton("Export CSV")
+        self.export_button.clicked.connect(self.export_button_func)
+        self.export_button.hide()
+        self.profiler_timer = QTimer(self)
+        self.profiler_timer.setInterval(500)
+        self.profiler_timer.timeout.connect(self.update_profiler_label)
+
+        # onboard camera looking forward from the front of the base link, drawn only while it is shown
+        front = getattr(self.robot.base_link, "length", 0.0) / 2 + 0.01
+        self.camera_sensor = CameraSensor(self.robot.base_link.name, 280, 210, rate=10.0, offset=(front, 0.0, 0.05))
+        self.ogl_widget.add_sensor(self.camera_sensor)
+        self.camera_button = QPushButton("Camera")
+        self.camera_button.setCheckable(True)
+        self.camera_button.toggled.connect(self.camera_button_func)
+        self.camera_label = QLabel()
+        self.camera_label.hide()
+
+        # wheel speed and joint commands from external controllers, taken in on the server's own thread and
+        # applied here between frames, telemetry is published after every applied batch and simulation step
+        self.control_server = None
+        self.control_label = QLabel()
+        self.control_label.hide()
+        self.control_timer = QTimer(self)
+        self.control_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.control_timer.setInterval(2)
+        self.control_timer.timeout.connect(self.control_timer_func)
+        if serve is not None:
+            self.control_server = ControlServer(wheel_num, serve)
+            try:
+                self.control_server.start()
+            except ServerError as e:
+                sys.exit(str(e))
+            self.control_server.publish(self.simulation.time, self.robot)
+            self.control_label.setText(f"Serving controllers on {serve}")
+            self.control_label.show()
+            self.control_timer.start()
+
         sidebar_container = QWidget()
         sidebar_container.setMaximumWidth(300)
 
@@ -103,6 +207,20 @@ class Window(QMainWindow):
 
         column_layout.addWidget(self.pos_label)
         column_layout.addWidget(apply_button)
+        sim_row = QFormLayout()
+        sim_row.addRow(QLabel("Time step [s]"), self.dt_input_field)
+        column_layout.addLayout(sim_row)
+        column_layout.addWidget(self.run_button)
+        column_layout.addWidget(self.fast_button)
+        column_layout.addWidget(self.record_button)
+        column_layout.addWidget(self.replay_button)
+        column_layout.addWidget(self.replay_widgets)
+        column_layout.addWidget(self.profiler_button)
+        column_layout.addWidget(self.profiler_label)
+        column_layout.addWidget(self.export_button)
+        column_layout.addWidget(self.camera_button)
+        column_layout.addWidget(self.camera_label)
+        column_layout.addWidget(self.control_label)
         # column_layout.addWidget(button_apply_steps)
         form_layout.addRow(column_layout)
 
@@ -145,28 +263,267 @@ class Window(QMainWindow):
             pry.append(temp)
 
         self.robot.update_values(pry, speeds)
-        self.robot.move()
+        if not self.simulation.running:
+            # a single step, while running the new speeds are picked up by the next fixed step
+            self.robot.move()
+            self.simulation.time += 1.0  # the default dt of Robot.move, recorded steps keep distinct times
+            self.simulation.previous = self.simulation.current = self.simulation.pose()
+            self.simulation.record()
         self.ogl_widget.update()
+        self.update_pos_label()
+
+    def button_steps_func(self):
+        for _ in range(0, 10):
+            self.robot.move()
+            self.ogl_widget.update()
+            self.update_pos_label()
+
+    def update_pos_label(self):
         self.pos_label.setText(f"Position: x={round(self.robot.base_link.xyz[0], 2)} "
                                f"y={round(self.robot.base_link.xyz[1], 2)} "
                                f"z={round(self.robot.base_link.xyz[2], 2)} "
                                f"θ={round(self.robot.theta, 2)}")
 
-    def button_steps_func(self):
-        for _ in range(0, 10):
-            self.robot.move()
+    def run_button_func(self, checked):
+        # start or stop stepping the simulation in real time
+        if checked:
+            inp = self.dt_input_field.text()
+            try:
+                if inp != "" and float(inp) > 0:
+                    self.simulation.dt = float(inp)
+            except ValueError:
+                pass
+            self.dt_input_field.setText(f"{self.simulation.dt:.4f}")
+            self.simulation.previous = self.simulation.current = self.simulation.pose()
+            self.simulation.accumulator = 0.0
+            self.simulation.running = True
+            self.last_tick = time.perf_counter()
+            self.set_timer_interval()
+            self.sim_timer.start()
+            self.run_button.setText("Stop")
+        else:
+            self.sim_timer.stop()
+            self.simulation.running = False
+            self.fast_button.setChecked(False)
+            self.simulation.interpolate(1.0)  # show the last simulated state
+            self.run_button.setText("Run")
+            self.ogl_widget.update()
+        self.dt_input_field.setEnabled(not checked)
+
+    def fast_button_func(self, checked):
+        # faster than real time, steps as fast as possible and repaints only once per timer tick
+        self.set_timer_interval()
+        if checked and not self.run_button.isChecked():
+            self.run_button.setChecked(True)
+
+    def set_timer_interval(self):
+        if self.fast_button.isChecked():
+            self.sim_timer.setInterval(0)
+        else:
+            # tick at least twice per step so steps are not late by more than half a step
+            self.sim_timer.setInterval(max(1, int(self.simulation.dt * 1000 / 2)))
+
+    def record_button_func(self, checked):
+        if checked:
+            filepath, _ = QFileDialog.getSaveFileName(self, "Record to log", "run.robotlog",
+                                                      "Robot logs (*.robotlog)")
+            if not filepath:
+                self.record_button.setChecked(False)
+                return
+            try:
+                # the dialog had the user confirm replacing an existing log, so it is not appended to
+                open(filepath, "wb").close()
+                self.simulation.recorder = PoseRecorder(self.robot, filepath, name=self.robot_file)
+            except (OSError, LogError) as e:
+                QMessageBox.warning(self, "Record to log", f"{filepath}: {e}")
+                self.record_button.setChecked(False)
+                return
+            self.simulation.record()  # where the run starts
+            self.record_button.setText("Stop recording")
+        else:
+            self.stop_recording()
+            self.record_button.setText("Record")
+
+    def stop_recording(self):
+        # writes the steps still in memory to the log
+        if self.simulation.recorder is not None:
+            self.simulation.recorder.close()
+            self.simulation.recorder = None
+
+    def replay_button_func(self, checked):
+        if not checked:
+            self.close_replay()
+            return
+        filepath, _ = QFileDialog.getOpenFileName(self, "Replay log", "", "Robot logs (*.robotlog)")
+        if not filepath:
+            self.replay_button.setChecked(False)
+            return
+        try:
+            replay = LogReplay(filepath)
+            if replay.description["wheels"] != [wheel.name for wheel in self.robot.wheels]:
+                raise LogError(f"the log was recorded with wheels {replay.description['wheels']}")
+            if replay.count == 0:
+                raise LogError("the log has no steps")
+        except (OSError, LogError) as e:
+            QMessageBox.warning(self, "Replay log", f"{filepath}: {e}")
+            self.replay_button.setChecked(False)
+            return
+
+        self.run_button.setChecked(False)
+        # restored when the log is closed
+        self.live_state = (self.simulation.pose(), [wheel.angles for wheel in self.robot.wheels],
+                           [wheel.speed for wheel in self.robot.wheels])
+        self.replay = replay
+        self.replay_time = replay.start
+        self.timeline.blockSignals(True)
+        self.timeline.setRange(0, int(replay.duration * 1000))  # milliseconds
+        self.timeline.setValue(0)
+        self.timeline.blockSignals(False)
+        for widget in self.live_widgets:
+            widget.setEnabled(False)
+        self.replay_widgets.show()
+        self.replay_button.setText("Close log")
+        self.show_replay()
+
+    def close_replay(self):
+        if self.replay is None:
+            return
+        self.play_button.setChecked(False)
+        self.replay.close()
+        self.replay = None
+        pose, angles, speeds = self.live_state
+        self.robot.update_values(angles, speeds)
+        self.robot.set_pose(*pose)
+        self.simulation.previous = self.simulation.current = self.simulation.pose()
+        for widget in self.live_widgets:
+            widget.setEnabled(True)
+        self.replay_widgets.hide()
+        self.replay_button.setText("Replay log")
+        self.update_pos_label()
+        self.ogl_widget.update()
+
+    def timeline_func(self, value):
+        # dragged by the user, playback moves it with signals blocked
+        self.replay_time = self.replay.start + value / 1000
+        self.show_replay()
+
+    def play_button_func(self, checked):
+        if checked:
+            if self.replay_time >= self.replay.end:
+                self.replay_time = self.replay.start  # from the beginning again
+            self.replay_tick = time.perf_counter()
+            self.replay_timer.start()
+            self.play_button.setText("Pause")
+        else:
+            self.replay_timer.stop()
+            self.play_button.setText("Play")
+
+    def speed_input_func(self):
+        try:
+            if float(self.speed_input_field.text()) > 0:
+                self.replay_speed = float(self.speed_input_field.text())
+        except ValueError:
+            pass
+        self.speed_input_field.setText(f"{self.replay_speed:g}")
+
+    def replay_timer_func(self):
+        now = time.perf_counter()
+        self.replay_time += (now - self.replay_tick) * self.replay_speed
+        self.replay_tick = now
+        if self.replay_time >= self.replay.end:
+            self.replay_time = self.replay.end
+            self.play_button.setChecked(False)
+        self.timeline.blockSignals(True)
+        self.timeline.setValue(int((self.replay_time - self.replay.start) * 1000))
+        self.timeline.blockSignals(False)
+        self.show_replay()
+
+    def show_replay(self):
+        # robot placed at the step recorded last before the replay time
+        i = self.replay.index_at(self.replay_time)
+        self.replay.apply(self.robot, i)
+        self.simulation.previous = self.simulation.current = self.simulation.pose()
+        self.replay_label.setText(f"{self.replay_time - self.replay.start:.2f} / {self.replay.duration:.2f} s  "
+                                  f"step {i + 1} of {self.replay.count}")
+        self.update_pos_label()
+        self.ogl_widget.update()
+
+    def closeEvent(self, event):
+        self.stop_recording()
+        if self.control_server is not None:
+            self.control_timer.stop()
+            self.control_server.stop()
+        super().closeEvent(event)
+
+    def profiler_button_func(self, checked):
+        self.ogl_widget.profiler.enabled = checked
+        self.profiler_label.setVisible(checked)
+        self.export_button.setVisible(checked)
+        if checked:
+            self.update_profiler_label()
+            self.profiler_timer.start()
+        else:
+            self.profiler_timer.stop()
+        self.ogl_widget.update()
+
+    def update_profiler_label(self):
+        self.profiler_label.setText(self.ogl_widget.profiler.summary())
+
+    def export_button_func(self):
+        filepath, _ = QFileDialog.getSaveFileName(self, "Export profile", "profile.csv", "CSV files (*.csv)")
+        if filepath:
+            self.ogl_widget.profiler.export_csv(filepath)
+
+    def camera_button_func(self, checked):
+        self.camera_label.setVisible(checked)
+        if checked:
+            self.camera_sensor.subscribe(self.show_camera_image)
+        else:
+            self.camera_sensor.unsubscribe(self.show_camera_image)
+
+    def show_camera_image(self, image, stamp):
+        # QImage wraps the sensor's frame, the pixmap is a copy
+        height, width, _ = image.shape
+        qimage = QImage(image.data, width, height, 3 * width, QImage.Format.Format_RGB888)
+        self.camera_label.setPixmap(QPixmap.fromImage(qimage))
+
+    def sim_timer_func(self):
+        now = time.perf_counter()
+        elapsed = now - self.last_tick
+        self.last_tick = now
+        with self.ogl_widget.profiler.stage("sim"):
+            if self.fast_button.isChecked():
+                steps = self.simulation.run_for(1 / 60)
+            else:
+                steps = self.simulation.advance(elapsed)
+        if steps > 0:
+            self.update_pos_label()
+            if self.control_server is not None:
+                self.control_server.publish(self.simulation.time, self.robot)
+        # repaint even without a new step so the interpolation stays smooth
+        self.ogl_widget.update()
+
+    def control_timer_func(self):
+        # commands wait in the server's queue while a log is replayed
+        if self.replay is not None:
+            return
+        if self.control_server.apply(self.robot) > 0:
+            # while stopped only the joints are redrawn, speeds are used by the next step
+            self.control_server.publish(self.simulation.time, self.robot)
             self.ogl_widget.update()
-            self.pos_label.setText(f"Position: x={round(self.robot.base_link.xyz[0], 2)} "
-                                   f"y={round(self.robot.base_link.xyz[1], 2)} "
-                                   f"z={round(self.robot.base_link.xyz[2], 2)} "
-                                   f"θ={round(self.robot.theta, 2)}")
 
 
 class OpenGLWidget(QOpenGLWidget):
-    def __init__(self, robot: Robot):
+    def __init__(self, robot: Robot, assets=None):
         super().__init__()
         self.robot = robot
-        self.cam = Camera()
+        self.renderer = Renderer(robot, assets)
+        self.assets = self.renderer.assets
+        self.profiler = self.renderer.profiler
+        # camera sensors draw on a timer of their own, not when the view repaints
+        self.sensor_timer = QTimer(self)
+        self.sensor_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.sensor_timer.timeout.connect(self.render_sensors)
 
     def initializeGL(self):
         # set OpenGL version and profile
@@ -174,135 +531,40 @@ class OpenGLWidget(QOpenGLWidget):
         self.fmt.setVersion(3, 3)
         self.fmt.setProfile(QSurfaceFormat.OpenGLContextProfile.CoreProfile)
 
-        # create openGL vertex and fragment shader
-        self.shader = self.create_shader("shaders/vertex.txt", "shaders/fragment.txt")
-        glUseProgram(self.shader)
-
-        glClearColor(0.1, 0.45, 0.55, 1)
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-
-        # create perspective projection matrix
-        self.projection = pyrr.matrix44.create_perspective_projection(
-            fovy=45.0, aspect=1280 / 720,
-            near=0.1, far=100.0)
-
-        # view matrix, eye - position of camera cannot be [0, 0, 0], target i am looking at , up vector of the camera
-        camera_position = pyrr.Vector3([0, 0.2, 1])
-        self.look_at = pyrr.matrix44.create_look_at(
-            camera_position,
-            pyrr.Vector3([0, 0, 0]),
-            pyrr.Vector3([0, 1, 0]))
-
-        # get the uniform's location from shader
-        self.projection_location = glGetUniformLocation(self.shader, "projection")
-        self.view_location = glGetUniformLocation(self.shader, "view")
-        self.model_location = glGetUniformLocation(self.shader, "model")
-        self.switch_location = glGetUniformLocation(self.shader, "switchColorToTex")
-
-        # upload the projection & view matrices to the shader
-        glUniformMatrix4fv(self.projection_location, 1, GL_FALSE, self.projection)
-        glUniformMatrix4fv(self.view_location, 1, GL_FALSE, self.cam.look_at)
-
-        self.scene = Scene()
-        glUniform3fv(glGetUniformLocation(self.shader, "lightColor"), 1, self.scene.light.color)
-        glUniform3fv(glGetUniformLocation(self.shader, "lightPos"), 1, self.scene.light.position)
-        glUniform3fv(glGetUniformLocation(self.shader, "viewPos"), 1, self.cam.look_at[0])
-
-        for link in self.robot.links:
-            link.load_mesh()
-
-        self.cam.set_target(self.robot.base_link.xyz)
-        self.cam.move(self.view_location, self.shader)
-
-        self.texture = glGenTextures(1)
-        self.road = load_texture("textures/RoadCityWorn001_COL_3K.jpg", self.texture)
-
-    def create_shader(self, vertexFilepath, fragmentFilepath):
-        # load shaders from files and compile them to be used as a program
-        with open(vertexFilepath, 'r') as f:
-            vertex_src = f.readlines()
-        with open(fragmentFilepath, 'r') as f:
-            fragment_src = f.readlines()
-
-        shader = compileProgram(
-            compileShader(vertex_src, GL_VERTEX_SHADER),
-            compileShader(fragment_src, GL_FRAGMENT_SHADER)
-        )
-        return shader
-
-    def paintGL(self):
-        self.focusWidget()
-        print("painting...")
+        self.renderer.initialize()
 
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)  # refresh screen
-        glUseProgram(self.shader)  # here to make sure the correct one is being used
+        # free GPU resources while the context still exists
+        self.context().aboutToBeDestroyed.connect(self.cleanup)
 
-        # draw light & ground
-        glBindTexture(GL_TEXTURE_2D, self.texture)
-        glUniform1i(self.switch_location, 1)
-        self.scene.draw_scene(self.model_location)
-        glUniform1i(self.switch_location, 0)
+    def cleanup(self):
+        self.makeCurrent()
+        self.renderer.destroy()
+        self.doneCurrent()
 
-        # draw robot
-        self.robot.base_link.draw(self.model_location, pyrr.matrix44.create_identity())
-
-        # move cam
-        self.cam.set_target(self.robot.base_link.xyz)
-        self.cam.move(self.view_location, self.shader)
+    def paintGL(self):
+        self.focusWidget()
+        # repaint until all meshes and textures are loaded
+        if self.renderer.paint():
+            QTimer.singleShot(30, self.update)
 
     def resizeGL(self, w: int, h: int):
-        glViewport(0, 0, w, h)
-        projection_on_resize = pyrr.matrix44.create_perspective_projection(
-            fovy=45.0, aspect=w / h,
-            near=0.1, far=100.0)
-        glUniformMatrix4fv(self.projection_location, 1, GL_FALSE, projection_on_resize)
-
-
-class Scene:
-    def __init__(self):
-        self.ground = ml.MeshLoader("models/plane.obj", [0.5, 0.5, 0.5, 1.0])
-        self.ground_scale = pyrr.matrix44.create_from_scale(pyrr.Vector3([10, 0.0, 7]))
-        self.ground_position = pyrr.matrix44.create_from_translation(pyrr.Vector3([0, 0, 0]))
-        self.ground_model = pyrr.matrix44.multiply(self.ground_scale, self.ground_position)
-
-        self.light = Light([0., 3., 1.], [1., 1., 1.])
-
-    def draw_scene(self, model_location):
-        glUniformMatrix4fv(model_location, 1, GL_FALSE, self.ground_model)
-        glBindVertexArray(self.ground.vao)  # bind the VAO that is being drawn
-        glDrawArrays(GL_TRIANGLES, 0, self.ground.vertex_count)
-
-    def destroy(self):
-        self.ground.destroy()
-
-
-class Light:
-    def __init__(self, position, color):
-        self.position = pyrr.Vector3(position)
-        self.color = pyrr.Vector3(color)
-
-
-class Camera:
-    def __init__(self):
-        self.pos = pyrr.Vector3([0., 2, 3])
-        self.target = pyrr.Vector3([0., 0., 0.])
-        self.up = pyrr.Vector3([0, 1, 0])
-        self.look_at = self.make_look_at()
-        self.deg = 270
-
-    def set_pos(self):
-        #self.pos = pyrr.Vector3([x, y, z])
-        self.look_at = self.make_look_at()
-
-    def set_target(self, xyz):
-        self.target = pyrr.Vector3([xyz[0], xyz[2], xyz[1]])
-        self.look_at = self.make_look_at()
-
-    def make_look_at(self):
-        return pyrr.matrix44.create_look_at(self.pos, self.target, self.up)
-
-    def move(self, view_loc, shader):
-        glUniformMatrix4fv(view_loc, 1, GL_FALSE, self.look_at)
-        glUniform3fv(glGetUniformLocation(shader, "viewPos"), 1, self.pos)
+        self.renderer.resize(w, h)
+
+    def add_sensor(self, sensor):
+        if self.isValid():
+            self.makeCurrent()
+            self.renderer.add_sensor(sensor)
+            self.doneCurrent()
+        else:
+            self.renderer.add_sensor(sensor)  # attached in initializeGL
+        # tick at least twice per frame of the fastest sensor
+        rate = max(sensor.rate for sensor in self.renderer.sensors)
+        self.sensor_timer.setInterval(max(1, int(1000 / rate / 2)))
+        self.sensor_timer.start()
+
+    def render_sensors(self):
+        if not self.isValid() or not any(sensor.active for sensor in self.renderer.sensors):
+            return
+        self.makeCurrent()
+        self.renderer.render_sensors(time.perf_counter())
+        self.doneCurrent()
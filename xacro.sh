@@ -1,10 +1,14 @@
 #!/bin/sh
 
+# xacro.sh file [name:=value ...]
+file=$1
+shift
+
 if [ -f /opt/ros/noetic/bin/xacro ]
 then
-	/opt/ros/noetic/bin/xacro $1
+	/opt/ros/noetic/bin/xacro "$file" "$@"
 elif [ -f /usr/bin/docker ]
-	/usr/bin/docker run -it --name ros-sh --net=host -v "$(pwd)":/app osrf/ros:noetic-desktop-full /opt/ros/noetic/bin/xacro /app/$1
+	/usr/bin/docker run -it --name ros-sh --net=host -v "$(pwd)":/app osrf/ros:noetic-desktop-full /opt/ros/noetic/bin/xacro /app/"$file" "$@"
 then
   pass
 else
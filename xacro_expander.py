@@ -0,0 +1,420 @@
+#!/usr/bin/python3
+
+# expands the subset of xacro used by the robots in data/ without ROS:
+# xacro:property (value and block), ${} expressions, xacro:macro and macro calls, block parameters,
+# xacro:insert_block, xacro:include, xacro:if / xacro:unless, xacro:arg and $(arg ...)
+# anything else raises XacroUnsupported and the caller falls back to the real xacro (xacro.sh)
+#
+# python3 xacro_expander.py data/differential_drive.xacro [name:=value ...]
+# python3 xacro_expander.py data/differential_drive.xacro --compare reference.urdf
+
+import copy
+import math
+import os
+import re
+import sys
+import xml.etree.ElementTree as Et
+
+XACRO_NS = "http://www.ros.org/wiki/xacro"
+XACRO = "{" + XACRO_NS + "}"
+
+# pieces of a text - $${ or $$( escapes, ${expression}, $(extension), plain text
+TOKENS = re.compile(r"\$\$+[{(]|\$\{[^}]*\}|\$\([^)]*\)|[^$]+|\$")
+
+# macro parameter - name, optional := or =, optional ^ or ^| (forward from the caller), default value
+MACRO_PARAM = re.compile(r"\s*([^\s:=]+?)\s*(?::?=\s*(\^\|?)?(\$\{.*?\}|\$\(.*?\)|(?:'.*?'|\".*?\"|[^\s'\"]+)+|))?(?:\s+|$)")
+
+# what ${} expressions can use besides properties
+EXPRESSION_GLOBALS = {name: getattr(math, name) for name in dir(math) if not name.startswith("_")}
+EXPRESSION_GLOBALS.update({"abs": abs, "min": min, "max": max, "round": round, "int": int, "float": float,
+                           "str": str, "len": len, "True": True, "False": False, "__builtins__": {}})
+
+
+class XacroUnsupported(Exception):
+    # construct the in-process expander does not implement
+    pass
+
+
+class XacroError(Exception):
+    # the xacro file itself is wrong
+    pass
+
+
+class Symbols(dict):
+    # properties of one scope, values are evaluated lazily on first use like in xacro
+    def __init__(self, parent=None):
+        super().__init__()
+        self.parent = parent
+        self.unevaluated = set()
+        self.resolving = []
+
+    def define(self, name, value, evaluated=False):
+        super().__setitem__(name, value)
+        if evaluated:
+            self.unevaluated.discard(name)
+        else:
+            self.unevaluated.add(name)
+
+    def __getitem__(self, name):
+        if super().__contains__(name):
+            if name in self.unevaluated:
+                if name in self.resolving:
+                    raise XacroError("circular property definition: " + " -> ".join(self.resolving + [name]))
+                self.resolving.append(name)
+                value = literal(eval_text(super().__getitem__(name), self))
+                self.resolving.pop()
+                super().__setitem__(name, value)
+                self.unevaluated.discard(name)
+            return super().__getitem__(name)
+        if self.parent is not None:
+            return self.parent[name]
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        return super().__contains__(name) or (self.parent is not None and name in self.parent)
+
+    def top(self):
+        return self if self.parent is None else self.parent.top()
+
+
+def literal(value):
+    # property text to number or bool when it is one, like xacro does
+    if not isinstance(value, str):
+        return value
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1]
+    if "_" in value:
+        return value
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    if value in ("true", "True"):
+        return True
+    if value in ("false", "False"):
+        return False
+    return value
+
+
+def boolean(value, condition):
+    # value of xacro:if / xacro:unless
+    if isinstance(value, str):
+        if value in ("true", "True"):
+            return True
+        if value in ("false", "False"):
+            return False
+        try:
+            return bool(int(value))
+        except ValueError:
+            raise XacroError(f"condition \"{condition}\" evaluated to \"{value}\", which is not a boolean")
+    return bool(value)
+
+
+def evaluate(expression, symbols):
+    # python expression of a ${} block, builtins are not available
+    code = compile(expression.strip(), "<expression>", "eval")
+    if any(name.startswith("__") for name in code.co_names):
+        raise XacroError(f"invalid name in expression '{expression}'")
+    try:
+        return eval(code, dict(EXPRESSION_GLOBALS), symbols)
+    except NameError as e:
+        raise XacroError(f"{e} when evaluating expression '{expression}'")
+
+
+def eval_text(text, symbols, args=None):
+    # substitutes ${} and $() in a text, a text that is a single expression keeps its type
+    results = []
+    for token in TOKENS.findall(text):
+        if token.startswith("$$"):
+            results.append(token[1:])
+        elif token.startswith("${"):
+            results.append(evaluate(eval_text(token[2:-1], symbols, args), symbols))
+        elif token.startswith("$("):
+            results.append(extension(eval_text(token[2:-1], symbols, args), symbols, args))
+        else:
+            results.append(token)
+    if len(results) == 1:
+        return results[0]
+    return "".join(str(result) for result in results)
+
+
+def extension(text, symbols, args):
+    # $(arg name), $(env NAME), $(optenv NAME default), $(eval expression)
+    command, _, rest = text.strip().partition(" ")
+    rest = rest.strip()
+    if command == "arg":
+        if args is None or rest not in args:
+            raise XacroError(f"undefined substitution argument {rest}")
+        return args[rest]
+    if command == "env":
+        if rest not in os.environ:
+            raise XacroError(f"environment variable {rest} is not set")
+        return os.environ[rest]
+    if command == "optenv":
+        name, _, default = rest.partition(" ")
+        return os.environ.get(name, default.strip())
+    if command == "eval":
+        return evaluate(rest, symbols)
+    raise XacroUnsupported(f"$({command} ...) is not supported")  # find, dirname, ...
+
+
+class Macro:
+    def __init__(self, element):
+        self.body = element
+        self.params = []
+        self.defaults = {}  # name -> (forward from caller, default text or None)
+        params = element.get("params", "")
+        while params.strip():
+            match = MACRO_PARAM.match(params)
+            if match is None or match.end() == 0:
+                raise XacroError(f"invalid macro parameters '{params}'")
+            name, forward, default = match.groups()
+            self.params.append(name)
+            if forward is not None or default is not None:
+                self.defaults[name] = (forward, default)
+            params = params[match.end():]
+
+
+class Expander:
+    def __init__(self, args=()):
+        # args - "name:=value" like on the xacro command line
+        self.args = {}
+        for arg in args:
+            name, separator, value = arg.partition(":=")
+            if not separator:
+                raise XacroError(f"argument '{arg}' is not in the form name:=value")
+            self.args[name] = value
+        self.macros = {}
+        self.files = []  # every file read, for cache keys
+
+    def expand_file(self, path):
+        # returns the expanded document as an ElementTree root element
+        root = self.parse(path)
+        symbols = Symbols()
+        self.expand_children(root, symbols, self.macros, os.path.dirname(path))
+        self.eval_attributes(root, symbols)
+        return root
+
+    def parse(self, path):
+        self.files.append(os.path.normpath(path))
+        parser = Et.XMLParser(target=Et.TreeBuilder(insert_comments=True))
+        try:
+            return Et.parse(path, parser).getroot()
+        except (OSError, Et.ParseError) as e:
+            raise XacroError(f"can not read {path}: {e}")
+
+    def expand_children(self, element, symbols, macros, directory):
+        # replaces the xacro elements among the children of element with their expansion
+        text = element.text
+        children = []
+        for child in list(element):
+            expanded = self.expand_node(child, symbols, macros, directory)
+            if expanded is None:
+                # dropped node, keep the whitespace after it
+                if children:
+                    children[-1].tail = (children[-1].tail or "") + (child.tail or "")
+                else:
+                    text = (text or "") + (child.tail or "")
+                continue
+            children.extend(expanded)
+        element[:] = children
+        element.text = text
+        if element.text:
+            element.text = str(eval_text(element.text, symbols, self.args))
+
+    def expand_node(self, node, symbols, macros, directory):
+        # list of nodes that replace node, None when it disappears
+        if not isinstance(node.tag, str):
+            return [node]  # comment or processing instruction
+        if node.tail:
+            node.tail = str(eval_text(node.tail, symbols, self.args))
+        if not node.tag.startswith(XACRO):
+            self.eval_attributes(node, symbols, recursive=False)
+            self.expand_children(node, symbols, macros, directory)
+            return [node]
+
+        tag = node.tag[len(XACRO):]
+        if tag == "property":
+            self.define_property(node, symbols)
+            return None
+        if tag == "macro":
+            name = node.get("name")
+            if name.startswith("xacro:"):
+                name = name[len("xacro:"):]
+            macros[name] = Macro(node)
+            return None
+        if tag == "arg":
+            name = node.get("name")
+            if name not in self.args:
+                default = node.get("default")
+                if default is None:
+                    raise XacroError(f"argument {name} has no value and no default")
+                self.args[name] = str(eval_text(default, symbols, self.args))
+            return None
+        if tag in ("if", "unless"):
+            condition = node.get("value")
+            value = boolean(eval_text(condition, symbols, self.args), condition)
+            if value != (tag == "if"):
+                return None
+            return self.expand_block(node, symbols, macros, directory)
+        if tag == "include":
+            return self.include(node, symbols, macros, directory)
+        if tag == "insert_block":
+            block = symbols[str(eval_text(node.get("name"), symbols, self.args))]
+            if isinstance(block, list):
+                nodes = copy.deepcopy(block)
+            else:
+                nodes = [copy.deepcopy(block)]
+            for inserted in nodes:
+                inserted.tail = node.tail
+            return [n for inserted in nodes for n in self.expand_node(inserted, symbols, macros, directory) or []]
+        if tag in macros:
+            return self.call_macro(node, macros[tag], symbols, macros, directory)
+        raise XacroUnsupported(f"xacro:{tag} is not supported")
+
+    def expand_block(self, node, symbols, macros, directory):
+        # expanded children of node, without node itself
+        self.expand_children(node, symbols, macros, directory)
+        children = list(node)
+        if children:
+            children[-1].tail = node.tail
+        return children
+
+    def define_property(self, node, symbols):
+        name = str(eval_text(node.get("name"), symbols, self.args))
+        scope = node.get("scope", "local")
+        if scope == "parent":
+            target = symbols.parent if symbols.parent is not None else symbols
+        elif scope == "global":
+            target = symbols.top()
+        else:
+            target = symbols
+        if node.get("remove") == "true":
+            dict.pop(target, name, None)
+            return
+        if node.get("lazy_eval") == "false":
+            raise XacroUnsupported("lazy_eval is not supported")
+        if "default" in node.attrib:
+            if name not in symbols:
+                target.define(name, node.get("default"))
+            return
+        if "value" in node.attrib:
+            # evaluated in the scope where it is defined, when it is first used
+            target.define(name, node.get("value"))
+            if target is not symbols:
+                target.define(name, literal(eval_text(node.get("value"), symbols, self.args)), evaluated=True)
+        else:
+            # block property, its children are inserted with xacro:insert_block
+            target.define(name, [copy.deepcopy(child) for child in node if isinstance(child.tag, str)],
+                          evaluated=True)
+
+    def include(self, node, symbols, macros, directory):
+        if "ns" in node.attrib:
+            raise XacroUnsupported("namespaced xacro:include is not supported")
+        filename = str(eval_text(node.get("filename"), symbols, self.args))
+        path = filename if os.path.isabs(filename) else os.path.join(directory, filename)
+        root = self.parse(path)
+        self.expand_children(root, symbols, macros, os.path.dirname(path))
+        children = list(root)
+        if children:
+            children[-1].tail = node.tail
+        return children
+
+    def call_macro(self, node, macro, symbols, macros, directory):
+        scope = Symbols(symbols)
+        params = list(macro.params)
+        for name, value in node.attrib.items():
+            if name not in params:
+                raise XacroError(f"invalid parameter \"{name}\" of macro {node.tag[len(XACRO):]}")
+            params.remove(name)
+            scope.define(name, literal(eval_text(value, symbols, self.args)), evaluated=True)
+
+        # block parameters are the child elements of the call, in order
+        self.expand_children(node, symbols, macros, directory)
+        blocks = [child for child in node if isinstance(child.tag, str)]
+        for name in list(params):
+            if name.startswith("**"):
+                if not blocks:
+                    raise XacroError(f"not enough blocks for macro {node.tag[len(XACRO):]}")
+                scope.define(name[2:], list(blocks.pop(0)), evaluated=True)
+                params.remove(name)
+            elif name.startswith("*"):
+                if not blocks:
+                    raise XacroError(f"not enough blocks for macro {node.tag[len(XACRO):]}")
+                scope.define(name[1:], blocks.pop(0), evaluated=True)
+                params.remove(name)
+
+        for name in params:
+            if name not in macro.defaults:
+                raise XacroError(f"undefined parameter \"{name}\" of macro {node.tag[len(XACRO):]}")
+            forward, default = macro.defaults[name]
+            if forward is not None and name in symbols:
+                scope.define(name, symbols[name], evaluated=True)
+            elif default is not None:
+                scope.define(name, literal(eval_text(default, symbols, self.args)), evaluated=True)
+            else:
+                raise XacroError(f"undefined property to forward: {name}")
+
+        body = copy.deepcopy(macro.body)
+        body.tail = node.tail
+        return self.expand_block(body, scope, Macros(macros), directory)
+
+    def eval_attributes(self, element, symbols, recursive=True):
+        elements = element.iter() if recursive else [element]
+        for e in elements:
+            if not isinstance(e.tag, str):
+                continue
+            for name, value in e.attrib.items():
+                if "$" in value:
+                    e.set(name, str(eval_text(value, symbols, self.args)))
+
+
+class Macros(dict):
+    # macros defined inside a macro are only visible there
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+
+    def __contains__(self, name):
+        return super().__contains__(name) or name in self.parent
+
+    def __getitem__(self, name):
+        if super().__contains__(name):
+            return super().__getitem__(name)
+        return self.parent[name]
+
+
+def expand(path, args=()):
+    # expanded URDF of a xacro file as text
+    root = Expander(args).expand_file(path)
+    return Et.tostring(root, encoding="unicode")
+
+
+def canonical(element):
+    # comparable form of an element, ignores comments, whitespace and attribute order
+    children = [canonical(child) for child in element if isinstance(child.tag, str)]
+    return element.tag, sorted(element.attrib.items()), (element.text or "").strip(), children
+
+
+def compare(path, reference, args=()):
+    # True when the expansion of path has the same content as the reference URDF
+    expanded = Et.fromstring(expand(path, args))
+    return canonical(expanded) == canonical(Et.parse(reference).getroot())
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    if not arguments:
+        sys.exit("usage: xacro_expander.py file.xacro [name:=value ...] [--compare reference.urdf]")
+    reference = None
+    if "--compare" in arguments:
+        i = arguments.index("--compare")
+        reference = arguments[i + 1]
+        del arguments[i:i + 2]
+    if reference is None:
+        print(expand(arguments[0], arguments[1:]))
+    elif compare(arguments[0], reference, arguments[1:]):
+        print(f"{arguments[0]}: same as {reference}")
+    else:
+        sys.exit(f"{arguments[0]}: differs from {reference}")